@@ -0,0 +1,183 @@
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import Response, current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+from shared.ttl_cache import TTLCache
+
+# Responses are kept this long for clients retrying with the same Idempotency-Key
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 600))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 4096))
+# Seconds a duplicate waits for the request it repeats before being told to retry
+IDEMPOTENCY_WAIT = float(os.environ.get('IDEMPOTENCY_WAIT', 60))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+FRESH = 'fresh'
+REPLAYED = 'replayed'
+CONFLICT = 'conflict'
+IN_PROGRESS = 'in_progress'
+
+# Headers recomputed for every response rather than replayed
+_SKIPPED_HEADERS = {'content-length', 'set-cookie', 'server-timing'}
+
+
+class IdempotencyStore:
+    """
+    Results of requests by idempotency key
+
+    The first request with a key runs; its result is kept for ttl seconds
+    and returned to any later request with the same key. Requests that
+    arrive while the first one is still running wait for it instead of
+    running a second time. Results that should not be kept (server errors)
+    are dropped, so the next retry runs again.
+
+    Args:
+        ttl (int): Seconds a result is kept
+        maxsize (int): Most results kept
+        wait (float): Seconds a duplicate waits for the running request
+    """
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, maxsize=IDEMPOTENCY_CACHE_SIZE, wait=IDEMPOTENCY_WAIT, clock=time.time):
+        self.results = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self.wait = wait
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._counters = {FRESH: 0, REPLAYED: 0, CONFLICT: 0, IN_PROGRESS: 0, 'waited': 0}
+
+    def run(self, key, fingerprint, handler):
+        """
+        Run handler once per key, or return the result of the run that already happened
+
+        Args:
+            key (str): Idempotency key, scoped to the endpoint and user
+            fingerprint (str): Hash of the request; reusing a key for a
+                different request is a conflict
+            handler (callable): () -> (result, keep)
+
+        Returns:
+            tuple: (result, outcome) with outcome FRESH, REPLAYED, CONFLICT or
+                IN_PROGRESS (the running request did not finish in time);
+                result is None for the last two
+        """
+        while True:
+            stored = self.results.get(key)
+            if stored is not None:
+                outcome = REPLAYED if stored['fingerprint'] == fingerprint else CONFLICT
+                self._count(outcome)
+                return (stored['result'] if outcome == REPLAYED else None), outcome
+
+            with self._lock:
+                call = self._in_flight.get(key)
+                leader = call is None
+                if leader:
+                    call = self._in_flight[key] = {'event': threading.Event(), 'fingerprint': fingerprint}
+
+            if leader:
+                break
+            if call['fingerprint'] != fingerprint:
+                self._count(CONFLICT)
+                return None, CONFLICT
+            self._count('waited')
+            if not call['event'].wait(self.wait):
+                self._count(IN_PROGRESS)
+                return None, IN_PROGRESS
+            # The result is stored now, unless the request failed and this one should run instead
+
+        try:
+            result, keep = handler()
+            if keep:
+                self.results.set(key, {'result': result, 'fingerprint': fingerprint})
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call['event'].set()
+
+        self._count(FRESH)
+        return result, FRESH
+
+    def _count(self, outcome):
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def stats(self):
+        """Return request counts per outcome and the number of stored results."""
+        with self._lock:
+            stats = dict(self._counters)
+        stats['stored'] = len(self.results)
+        return stats
+
+
+# Shared by all endpoints that accept an Idempotency-Key; keys are scoped per endpoint
+idempotency_keys = IdempotencyStore()
+
+
+def _identity():
+    """The JWT identity of the request, if it has been verified."""
+    try:
+        return get_jwt_identity() or ''
+    except RuntimeError:
+        return ''
+
+
+def idempotent(store=idempotency_keys, scope=_identity):
+    """
+    Make a POST view honour the Idempotency-Key header
+
+    Requests without the header run as usual. A repeated key gets the
+    stored response (with ``Idempotent-Replayed: true``), a duplicate that
+    arrives while the first request is running waits for it, and a key
+    reused with a different body is rejected with 422. Server errors and
+    429s are not stored, so a retry runs again. Place it below
+    ``jwt_required`` so keys are scoped per user.
+
+    Args:
+        store (IdempotencyStore): Where responses are kept
+        scope (callable): () -> str naming whose keys these are; defaults
+            to the JWT identity, views without a JWT must pass their own
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key', '').strip()
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                return jsonify({'error': f'Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters'}), 400
+
+            def handle():
+                response = current_app.make_response(view(*args, **kwargs))
+                # Streamed bodies can't be replayed; hand the response through
+                if response.is_streamed:
+                    return {'response': response}, False
+                # Server errors and rate limits are for the retry to get past, not to replay
+                keep = response.status_code < 500 and response.status_code != 429
+                return {
+                    'status': response.status_code,
+                    'body': response.get_data(),
+                    'headers': [(name, value) for name, value in response.headers
+                                if name.lower() not in _SKIPPED_HEADERS]
+                }, keep
+
+            result, outcome = store.run(
+                f"{request.endpoint}:{scope()}:{key}",
+                hashlib.sha256(request.get_data()).hexdigest(),
+                handle
+            )
+
+            if outcome == CONFLICT:
+                return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+            if outcome == IN_PROGRESS:
+                return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409, {'Retry-After': '5'}
+            if 'response' in result:
+                return result['response']
+
+            response = Response(result['body'], status=result['status'], headers=result['headers'])
+            if outcome == REPLAYED:
+                response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        return wrapper
+    return decorator
@@ -464,7 +464,7 @@ def get_user_info():
         # Get user data
         try:
             users_collection = get_users_collection_safely()
-            user = users_collection.find_one({'phone_number': phone_number})
+            user = users_collection.find_one({'phone_number': phone_number}, {'chat_history': 0})
             if not user:
                 return jsonify({'error': 'User not found'}), 404
         except Exception as db_error:
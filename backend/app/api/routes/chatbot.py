@@ -1,15 +1,45 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, url_for
 import os
+import json
+import itertools
+from functools import wraps
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.database import get_users_collection
+from app.database import get_users_collection, get_news_cache_collection, get_chat_jobs_collection
+from app.api.idempotency import idempotency_keys, idempotent
 from datetime import datetime, timedelta
 from openai import OpenAI
 from flask_cors import cross_origin
-import requests
-import time
 
 # Import Plaid client from plaid.py
 from app.api.routes.plaid import client as plaid_client, TransactionsGetRequest, TransactionsGetRequestOptions, standardize_phone_number
+from shared.market_data import MarketDataClient
+from shared.news import NewsClient, dedupe_articles
+from shared.ttl_cache import TTLCache
+from shared.watchlist import user_tickers
+from shared.transaction_table import encode_transactions, token_savings
+from shared.prompt_fragments import PromptFragmentCache, format_news_for_prompt, format_stock_performance
+from app.chat.transaction_index import TransactionRetriever, create_embedding_provider, transaction_key
+from app.chat.fact_sheet import build_fact_sheet, render_fact_sheet
+from app.chat.history import (
+    CHAT_HISTORY_MAX_PAGE_SIZE, CHAT_HISTORY_PAGE_SIZE, USER_PROJECTION, append_chat_turn, get_chat_history
+)
+from app.chat.memory import ConversationMemory, summarize_conversation
+from app.chat.jobs import ChatJobQueue, QueueFullError, job_status
+from app.chat.response_cache import HIT, MISS, BYPASS, SemanticResponseCache, embed_question, is_follow_up
+from app.chat.tools import ToolRegistry, complete_with_tools, stream_with_tools
+from app.chat.transaction_query import QUERY_PARAMETERS, TransactionFrame
+from app.chat.intents import FastPathMatcher
+from app.chat.timing import CHAT_SLOW_REQUEST_MS, LatencyHistograms, StageTimer, timed
+from app.chat.snapshot import ContextSnapshots
+from app.chat.router import ModelRouter
+from app.chat.hedging import RequestHedger
+from app.chat.warmup import WARMING, ContextWarmer
+from app.chat.admission import AdmissionController
+from app.chat.prompt_prefix import CHAT_PREFIX_TOKEN_BUDGET, PromptPrefixCache, compute_data_version
+from app.chat.prompt_budget import (
+    CHAT_PROMPT_TOKEN_BUDGET, MESSAGE_OVERHEAD_TOKENS, KEEP, KEEP_HEAD, KEEP_TAIL, PromptSection, count_tokens,
+    fit_prompt
+)
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
@@ -19,239 +49,686 @@ NEWS_API_KEY = os.environ.get('NEWS_API_KEY')
 ALPHA_VANTAGE_API_KEY = os.environ.get('ALPHA_VANTAGE_API_KEY', 'demo')  # Use 'demo' as fallback
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
-def fetch_ticker_list(phone_number):
-    """Fetch the list of tickers from the database."""
-    # users_collection = get_users_collection()
-    # user = users_collection.find_one({"phone_number": phone_number})
-    # return user.get("tickers", [])
-    return ['AMD', 'TSLA', 'NVDA', 'META']
+# How much transaction history chat can draw on, and how much of it goes in the prompt
+CHAT_TRANSACTION_DAYS = int(os.environ.get('CHAT_TRANSACTION_DAYS', 730))
+CHAT_MAX_TRANSACTIONS = int(os.environ.get('CHAT_MAX_TRANSACTIONS', 1000))
+CHAT_PREFIX_TRANSACTIONS = int(os.environ.get('CHAT_PREFIX_TRANSACTIONS', 10))
+CHAT_RETRIEVAL_TOP_K = int(os.environ.get('CHAT_RETRIEVAL_TOP_K', 30))
+FACT_SHEET_CACHE_SIZE = int(os.environ.get('FACT_SHEET_CACHE_SIZE', 1024))
+FACT_SHEET_CACHE_TTL = int(os.environ.get('FACT_SHEET_CACHE_TTL', 3600))
+# Upper bounds on what a single tool call can pull into the prompt
+CHAT_TOOL_MAX_TICKERS = int(os.environ.get('CHAT_TOOL_MAX_TICKERS', 8))
+CHAT_TOOL_MAX_ARTICLES = int(os.environ.get('CHAT_TOOL_MAX_ARTICLES', 6))
+CHAT_TOOL_RESULT_TOKEN_BUDGET = int(os.environ.get('CHAT_TOOL_RESULT_TOKEN_BUDGET', 1500))
+# Longest a job status request may wait for the job to finish
+CHAT_JOB_MAX_WAIT = int(os.environ.get('CHAT_JOB_MAX_WAIT', 25))
+
+# Quotes and daily series are cached per process and shared by all users
+market_data = MarketDataClient(ALPHA_VANTAGE_API_KEY)
+# News is cached per query and shared with other workers through MongoDB
+news_client = NewsClient(NEWS_API_KEY, store=get_news_cache_collection)
+# Rendered system prompt prefixes, per user and data version
+prompt_prefixes = PromptPrefixCache()
+# Aggregated financial facts, per user and data version
+fact_sheets = TTLCache(maxsize=FACT_SHEET_CACHE_SIZE, ttl=FACT_SHEET_CACHE_TTL)
+# Columnar transactions for the query_transactions tool, per user and data version
+transaction_frames = TTLCache(maxsize=FACT_SHEET_CACHE_SIZE, ttl=FACT_SHEET_CACHE_TTL)
+# Per-user embedding indexes used to pick transactions relevant to a question
+transaction_retriever = TransactionRetriever(create_embedding_provider(openai_client))
+# Running summary of turns older than the verbatim history window
+chat_memory = ConversationMemory(
+    lambda previous, messages: summarize_conversation(openai_client, previous, messages)
+)
+# Answers to repeated questions against unchanged data, per user
+response_cache = SemanticResponseCache(transaction_retriever.provider)
+# Chat requests in async mode are answered by this worker pool instead of the HTTP worker
+chat_jobs = ChatJobQueue(store=get_chat_jobs_collection)
+# Market data and news are only fetched when the model asks for them
+chat_tools = ToolRegistry()
+# Templated spending, budget and balance questions are answered without a model call
+fast_path = FastPathMatcher()
+# Per-stage latency of chat requests
+chat_latency = LatencyHistograms()
+# Picks the model tier and answer length per message, up to the user's model setting
+model_router = ModelRouter()
+# Sends a second request when a chat completion is slower than usual, if enabled
+request_hedger = RequestHedger()
+# Market and news tool results are the same for every user, so they are rendered once per tick
+prompt_fragments = PromptFragmentCache()
+# Per-user rate limits and a concurrency limit on chat requests, shared by the worker processes
+chat_admission = AdmissionController()
+
+def fetch_ticker_list(user):
+    """Return the tickers on the user's watchlist."""
+    return user_tickers(user)
 
 def fetch_stock_performance(tickers):
     """Fetch stock performance data for the given tickers using Alpha Vantage."""
-    try:
-        performance_data = {}
-        
-        for ticker in tickers:
-            # Use Alpha Vantage's Global Quote API to get current stock data
-            url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={ticker}&apikey={ALPHA_VANTAGE_API_KEY}"
-            response = requests.get(url)
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.5)
-            
-            data = response.json()
-            
-            if "Global Quote" not in data or not data["Global Quote"]:
-                performance_data[ticker] = {
-                    "error": f"No data available for {ticker}"
-                }
-                continue
-            
-            quote = data["Global Quote"]
-            
-            # Extract current price and change
-            current_price = float(quote.get("05. price", 0))
-            change_percent = float(quote.get("10. change percent", "0%").replace("%", ""))
-            
-            # Get weekly high/low from the daily adjusted API
-            weekly_url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY_ADJUSTED&symbol={ticker}&outputsize=compact&apikey={ALPHA_VANTAGE_API_KEY}"
-            weekly_response = requests.get(weekly_url)
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.5)
-            
-            weekly_data = weekly_response.json()
-            
-            # Extract weekly high/low if available
-            weekly_high = current_price
-            weekly_low = current_price
-            weekly_volume = 0
-            
-            if "Time Series (Daily)" in weekly_data:
-                # Get the last 5 trading days (approximately a week)
-                time_series = weekly_data["Time Series (Daily)"]
-                dates = list(time_series.keys())[:5]  # Last 5 trading days
-                
-                if dates:
-                    highs = [float(time_series[date]["2. high"]) for date in dates]
-                    lows = [float(time_series[date]["3. low"]) for date in dates]
-                    volumes = [int(float(time_series[date]["6. volume"])) for date in dates]
-                    
-                    weekly_high = max(highs)
-                    weekly_low = min(lows)
-                    weekly_volume = sum(volumes) // len(volumes)  # Average volume
-            
-            performance_data[ticker] = {
-                "current_price": round(current_price, 2),
-                "percent_change": round(change_percent, 2),
-                "high": round(weekly_high, 2),
-                "low": round(weekly_low, 2),
-                "volume_avg": weekly_volume
-            }
-            
-        return performance_data
-    except Exception as e:
-        print(f"Error fetching stock performance: {str(e)}")
-        return {}
+    return market_data.fetch_stock_performance(tickers)
 
 def fetch_market_indices():
     """Fetch performance data for major market indices using Alpha Vantage."""
-    indices = {
-        'SPY': 'S&P 500',
-        'DIA': 'Dow Jones',
-        'QQQ': 'NASDAQ',
-        'IWM': 'Russell 2000'
+    return market_data.fetch_market_indices()
+
+def fetch_news_for_ticker(ticker, limit=2):
+    """Fetch news articles for a specific ticker."""
+    return news_client.fetch_news_for_ticker(ticker, limit=limit)
+
+def fetch_market_news(limit=4):
+    """Fetch general market news."""
+    return news_client.fetch_market_news(limit=limit)
+
+def fit_tool_result(name, text, separator="\n"):
+    """Trim a tool result to its token budget."""
+    section = PromptSection.from_text(name, text, separator=separator)
+    section.priority, section.policy = CHAT_PROMPT_SECTIONS[name]
+    fit_prompt([section], budget=CHAT_TOOL_RESULT_TOKEN_BUDGET)
+    return section.render()
+
+def clean_tickers(tickers):
+    """Normalize ticker symbols requested by the model."""
+    return [ticker.strip().upper() for ticker in tickers if ticker and ticker.strip()][:CHAT_TOOL_MAX_TICKERS]
+
+@chat_tools.tool(
+    'get_stock_performance',
+    "Weekly price performance of stocks: current price, weekly percent change, weekly range and average volume.",
+    {
+        'type': 'object',
+        'properties': {
+            'tickers': {'type': 'array', 'items': {'type': 'string'}, 'description': "Ticker symbols, e.g. ['AAPL']"}
+        },
+        'required': ['tickers']
+    },
+    stage='alpha_vantage'
+)
+def get_stock_performance_tool(tickers):
+    tickers = clean_tickers(tickers)
+
+    def render():
+        performance = fetch_stock_performance(tickers)
+        complete = bool(performance) and not any("error" in data for data in performance.values())
+        return fit_tool_result("performance", format_stock_performance(performance, {})), complete
+
+    return prompt_fragments.get('performance', tickers, render)
+
+@chat_tools.tool(
+    'get_market_indices',
+    "Weekly performance of the major market indices (S&P 500, Dow Jones, NASDAQ).",
+    stage='alpha_vantage'
+)
+def get_market_indices_tool():
+    def render():
+        indices = fetch_market_indices()
+        return fit_tool_result("performance", format_stock_performance({}, indices)), bool(indices)
+
+    return prompt_fragments.get('indices', [], render)
+
+@chat_tools.tool(
+    'get_market_news',
+    "Recent general stock market and business headlines.",
+    {
+        'type': 'object',
+        'properties': {
+            'limit': {'type': 'integer', 'description': "Number of articles (default 4)"}
+        }
+    },
+    stage='newsapi'
+)
+def get_market_news_tool(limit=4):
+    limit = max(1, min(int(limit), CHAT_TOOL_MAX_ARTICLES))
+
+    def render():
+        market_news = fetch_market_news(limit=limit)
+        return fit_tool_result("news", format_news_for_prompt({}, market_news), separator="\n\n"), bool(market_news)
+
+    return prompt_fragments.get(f'market_news:{limit}', [], render)
+
+@chat_tools.tool(
+    'get_ticker_news',
+    "Recent news articles about specific stocks.",
+    {
+        'type': 'object',
+        'properties': {
+            'tickers': {'type': 'array', 'items': {'type': 'string'}, 'description': "Ticker symbols, e.g. ['TSLA']"},
+            'limit': {'type': 'integer', 'description': "Articles per ticker (default 2)"}
+        },
+        'required': ['tickers']
+    },
+    stage='newsapi'
+)
+def get_ticker_news_tool(tickers, limit=2):
+    limit = max(1, min(int(limit), CHAT_TOOL_MAX_ARTICLES))
+    # Sorted, so the same ticker set renders the same fragment whatever order it is asked in
+    tickers = sorted(set(clean_tickers(tickers)))
+
+    def render():
+        seen_articles = set()
+        ticker_news = {
+            ticker: dedupe_articles(fetch_news_for_ticker(ticker, limit=limit), seen_articles)
+            for ticker in tickers
+        }
+        text = format_news_for_prompt(ticker_news, [])
+        # Only the ticker part of the formatted news applies here
+        text = text[text.index("Recent Stock News:"):] if "Recent Stock News:" in text else "No recent news for these tickers."
+        return fit_tool_result("news", text, separator="\n\n"), any(ticker_news.values())
+
+    return prompt_fragments.get(f'ticker_news:{limit}', tickers, render)
+
+@chat_tools.tool(
+    'query_transactions',
+    "Filter, group and aggregate the user's transactions from the last two years. Use it for totals, counts, "
+    "averages or breakdowns (by category, merchant, month, week or day) that the pre-computed facts do not cover.",
+    QUERY_PARAMETERS,
+    with_context=True,
+    stage='query'
+)
+def query_transactions_tool(context, **query):
+    frame = get_transaction_frame(context['phone_number'], context['data_version'], context['transactions'])
+    return frame.query(**query)
+
+# Tools whose results change with the market rather than with the user's data
+LIVE_DATA_TOOLS = {'get_stock_performance', 'get_market_indices', 'get_market_news', 'get_ticker_news'}
+
+NO_BANK_ACCOUNT_RESPONSE = "I don't have access to your transaction history. Please link your bank account first."
+
+CHAT_INSTRUCTIONS = """You are a helpful financial assistant that helps users understand their transaction history and finances.
+You have access to pre-computed financial facts (period totals, spending by category, top merchants and budget status) and the user's most recent transactions. Older transactions relevant to the user's question are provided alongside it.
+Prefer the pre-computed totals over adding up individual transactions yourself. When you need a number they do not cover (a merchant, a date range, an amount threshold, a breakdown), call the query_transactions tool rather than estimating.
+You can also call tools for weekly stock performance, market index performance, market news and news about specific tickers. Only call those when the question is about markets, stocks or investments.
+Use this information to provide personalized financial advice and answer questions.
+Be concise, helpful, and accurate. If you don't know something, say so.
+Do not make up information that is not in the transaction history.
+Some transactions are positive, and some are negative. Positive transactions should be shown as a loss in money, and negative transactions should be shown as a gain in money. AKA a negative transaction is a refund.
+Transactions are given as tables with one row per transaction and columns separated by |. Merchants and categories that repeat are written as aliases such as M1 or C1, defined above the table; always use the full names in your answers."""
+
+# (priority, truncation policy) per prompt section; higher priorities are trimmed first.
+# The stable prefix sections are fitted into their own budget before the volatile ones.
+CHAT_PROMPT_SECTIONS = {
+    'instructions': (0, KEEP),
+    'question': (0, KEEP),
+    'facts': (1, KEEP_HEAD),
+    'transactions': (2, KEEP_HEAD),  # Plaid returns newest first
+    'relevant_transactions': (2, KEEP_HEAD),  # ranked by similarity
+    'summary': (2, KEEP_HEAD),       # already bounded by the summarizer
+    'history': (3, KEEP_TAIL),       # keep the most recent turns
+    'performance': (4, KEEP_HEAD),
+    'news': (5, KEEP_HEAD)
+}
+
+def fetch_transactions(access_token, days=CHAT_TRANSACTION_DAYS, max_count=CHAT_MAX_TRANSACTIONS):
+    """Fetch up to max_count of the user's most recent transactions from Plaid.
+    
+    Returns:
+        tuple: (transactions, accounts with their balances)
+    """
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days)
+    
+    transactions = []
+    accounts = []
+    while len(transactions) < max_count:
+        transactions_request = TransactionsGetRequest(
+            access_token=access_token,
+            start_date=start_date,
+            end_date=end_date,
+            options=TransactionsGetRequestOptions(
+                count=min(500, max_count - len(transactions)),  # Plaid returns at most 500 per page
+                offset=len(transactions)
+            )
+        )
+        transactions_response = plaid_client.transactions_get(transactions_request)
+        page = transactions_response['transactions']
+        transactions.extend(page)
+        # Every page carries the same accounts; keep the first copy
+        accounts = accounts or [
+            account.to_dict() if hasattr(account, 'to_dict') else account
+            for account in transactions_response.get('accounts') or []
+        ]
+        
+        total = transactions_response.get('total_transactions', len(transactions))
+        if not page or len(transactions) >= total:
+            break
+    
+    return transactions, accounts
+
+def format_transactions(transactions):
+    """Keep the transaction fields chat uses."""
+    formatted_transactions = []
+    for tx in transactions:
+        formatted_tx = {
+            'transaction_id': tx.get('transaction_id'),
+            'date': tx['date'],
+            'name': tx['name'],
+            'amount': tx['amount'],
+            'category': tx['category'] if 'category' in tx and tx['category'] else ['Uncategorized']
+        }
+        formatted_transactions.append(formatted_tx)
+    return formatted_transactions
+
+def load_chat_snapshot(phone_number):
+    """Fetch the upstream data of a user's chat context from Plaid."""
+    users_collection = get_users_collection()
+    user = users_collection.find_one({"phone_number": phone_number}, {"plaid_access_token": 1})
+    if not user or "plaid_access_token" not in user:
+        return None
+    
+    transactions, accounts = fetch_transactions(user["plaid_access_token"])
+    print(f"Retrieved {len(transactions)} transactions from Plaid for {phone_number}")
+    formatted_transactions = format_transactions(transactions)
+    version = compute_data_version(formatted_transactions, accounts)
+    
+    # Transactions are embedded here, off the chat request path; dropped ones leave the index
+    try:
+        transaction_retriever.ingest(phone_number, formatted_transactions, version=version)
+    except Exception as e:
+        print(f"Error indexing transactions for {phone_number}: {str(e)}")
+    
+    return {
+        'access_token': user["plaid_access_token"],
+        'transactions': formatted_transactions,
+        'accounts': accounts,
+        'version': version
     }
+
+# Transactions and balances per user, refreshed in the background so chat turns don't wait for Plaid
+context_snapshots = ContextSnapshots(load_chat_snapshot)
+
+def load_chat_data(user, phone_number, timer=None):
+    """Load the user's transactions, accounts, budgets and fact sheet for a chat turn."""
+    # Transactions come from the user's snapshot; a snapshot of another bank link is reloaded
+    with timed(timer, 'snapshot'):
+        snapshot = context_snapshots.get(
+            phone_number,
+            is_current=lambda snapshot: snapshot['access_token'] == user["plaid_access_token"]
+        ) or {'transactions': [], 'accounts': [], 'version': None}
+    formatted_transactions = snapshot['transactions']
+    accounts = snapshot['accounts']
+    
+    # Get user's budget data
+    budget_data = user.get("budgets", {})
+    
+    # Totals, top merchants and budget status are computed once per data version
+    tickers = fetch_ticker_list(user)
+    with timed(timer, 'facts'):
+        data_version = compute_data_version(snapshot['version'], budget_data, tickers, datetime.now().date())
+        facts = fact_sheets.get_or_load(
+            f"{phone_number}:{data_version}",
+            lambda: build_fact_sheet(formatted_transactions, budget_data)
+        )
     
+    return {
+        'transactions': formatted_transactions,
+        'accounts': accounts,
+        'tickers': tickers,
+        'data_version': data_version,
+        'snapshot_version': snapshot['version'],
+        'facts': facts
+    }
+
+def get_transaction_frame(phone_number, data_version, transactions):
+    """Return the columnar transactions of a user for a data version."""
+    return transaction_frames.get_or_load(
+        f"{phone_number}:{data_version}",
+        lambda: TransactionFrame(transactions)
+    )
+
+def try_fast_path(phone_number, user_message, data, enabled=True, timer=None):
+    """Answer a templated question from the user's data, or return None."""
+    if not enabled:
+        return None
     try:
-        indices_data = {}
-        
-        for symbol, name in indices.items():
-            url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}"
-            response = requests.get(url)
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.5)
-            
-            data = response.json()
-            
-            if "Global Quote" not in data or not data["Global Quote"]:
-                continue
-                
-            quote = data["Global Quote"]
-            current_price = float(quote.get("05. price", 0))
-            change_percent = float(quote.get("10. change percent", "0%").replace("%", ""))
-            
-            indices_data[name] = {
-                "current_price": round(current_price, 2),
-                "percent_change": round(change_percent, 2)
-            }
-            
-        return indices_data
+        with timed(timer, 'fast_path'):
+            return fast_path.answer(
+                user_message,
+                data['facts'],
+                lambda: get_transaction_frame(phone_number, data['data_version'], data['transactions']),
+                accounts=data['accounts']
+            )
     except Exception as e:
-        print(f"Error fetching market indices: {str(e)}")
-        return {}
+        current_app.logger.warning(f"Fast path failed, falling back to the model: {str(e)}")
+        return None
 
-def fetch_news_for_ticker(ticker, limit=2):
-    """Fetch news articles for a specific ticker."""
+def get_stable_prefix(phone_number, data, model):
+    """Return the user's rendered prompt prefix for a data version and model."""
+    # The stable prefix (instructions, budgets, transactions) is only re-rendered
+    # when the user's data changes, so its bytes stay identical across turns
+    def render():
+        recent_transactions = data['transactions'][:CHAT_PREFIX_TRANSACTIONS]
+        table = encode_transactions(recent_transactions)
+        savings = token_savings(recent_transactions, table, lambda text: count_tokens(text, model))
+        print(f"Prefix transaction table: {savings['compact_tokens']} tokens, "
+              f"{savings['saved_tokens']} fewer than labelled lines")
+        return render_stable_prefix(render_fact_sheet(data['facts']), table, data['tickers'], model)
+    
+    return prompt_prefixes.get(phone_number, f"{data['data_version']}:{model}", render)
+
+def build_chat_context(user, phone_number, user_message, data=None, timer=None):
+    """Build the OpenAI messages, model settings and prompt token report for a chat turn."""
+    data = data or load_chat_data(user, phone_number, timer)
+    formatted_transactions = data['transactions']
+    data_version = data['data_version']
+    
+    # The most recent transactions are in the stable prefix
+    recent_transactions = formatted_transactions[:CHAT_PREFIX_TRANSACTIONS]
+    
+    # Older transactions are only included when relevant to the question
+    relevant_transactions = []
+    question_vector = None
     try:
-        url = f"https://newsapi.org/v2/everything?q={ticker}+stock&sortBy=publishedAt&pageSize={limit}&apiKey={NEWS_API_KEY}"
-        response = requests.get(url)
-        data = response.json()
-        
-        if response.status_code != 200 or data.get('status') != 'ok':
-            print(f"Error fetching news for {ticker}: {data.get('message', 'Unknown error')}")
-            return []
-        
-        articles = data.get('articles', [])
-        return [
-            {
-                'title': article.get('title'),
-                'description': article.get('description'),
-                'content': article.get('content'),
-                'source': article.get('source', {}).get('name'),
-                'published_at': article.get('publishedAt'),
-                'url': article.get('url')
-            }
-            for article in articles[:limit]
-        ]
+        with timed(timer, 'retrieval'):
+            # Already done when the snapshot was built, unless the index was evicted since
+            transaction_retriever.ingest(phone_number, formatted_transactions, version=data.get('snapshot_version'))
+            # Embedded once; the response cache looks the question up with the same vector
+            question_vector = embed_question(transaction_retriever.provider, user_message)
+            relevant_transactions = transaction_retriever.retrieve(
+                phone_number,
+                user_message,
+                k=CHAT_RETRIEVAL_TOP_K,
+                exclude_ids={transaction_key(tx) for tx in recent_transactions},
+                query_vector=question_vector
+            )
+    except Exception as e:
+        current_app.logger.warning(f"Transaction retrieval failed, using recent transactions only: {str(e)}")
+    
+    # Running summary of older turns plus the most recent messages verbatim
+    with timed(timer, 'mongo'):
+        conversation_summary, chat_history = chat_memory.context(phone_number, user)
+    
+    # Get model settings from the database or use defaults; the model setting is the routing ceiling
+    model = user.get("settings", {}).get("model", "gpt-4o-mini")
+    temperature = user.get("settings", {}).get("temperature", 0.7)
+    
+    with timed(timer, 'prompt'):
+        prefix = get_stable_prefix(phone_number, data, model)
+    
+    # Relevant transactions reuse the prefix's aliases and only define new ones
+    relevant_table = encode_transactions(relevant_transactions, aliases=prefix.get('aliases'))
+    if relevant_transactions:
+        savings = token_savings(relevant_transactions, relevant_table, lambda text: count_tokens(text, model))
+        print(f"Relevant transaction table: {savings['compact_tokens']} tokens, "
+              f"{savings['saved_tokens']} fewer than labelled lines")
+    
+    # Volatile sections share whatever budget the prefix leaves over
+    sections = [
+        PromptSection("question", [user_message], separator="", item_overhead=MESSAGE_OVERHEAD_TOKENS),
+        PromptSection("summary", [conversation_summary] if conversation_summary else [], separator="",
+                      header="Summary of the earlier conversation:\n", item_overhead=MESSAGE_OVERHEAD_TOKENS),
+        PromptSection("history", chat_history, text_of=lambda msg: msg["content"],
+                      item_overhead=MESSAGE_OVERHEAD_TOKENS),
+        PromptSection("relevant_transactions", relevant_table['rows'],
+                      header=f"Other transactions relevant to the question:\n{relevant_table['preamble']}"),
+    ]
+    for section in sections:
+        section.priority, section.policy = CHAT_PROMPT_SECTIONS[section.name]
+    
+    with timed(timer, 'prompt'):
+        plan = fit_prompt(sections, budget=CHAT_PROMPT_TOKEN_BUDGET - prefix['tokens'], model=model)
+    print(f"Prompt budget: prefix {prefix['tokens']} tokens (version {data_version}), volatile {plan.summary()}")
+    
+    question_context = plan.render("relevant_transactions")
+    
+    # Stable prefix first, then history, then the volatile per-question context
+    messages = [{"role": "system", "content": prefix['text']}]
+    
+    if plan.render("summary"):
+        messages.append({"role": "system", "content": plan.render("summary")})
+    
+    # Add chat history to messages
+    for msg in plan.kept("history"):
+        messages.append({"role": msg["role"], "content": msg["content"]})
+    
+    if question_context:
+        messages.append({"role": "system", "content": question_context})
+    
+    # Add the current user message
+    messages.append({"role": "user", "content": user_message})
+    
+    # The prompt is the same for every tier, so only the model and answer length are routed
+    prompt_tokens = prefix['tokens'] + plan.total_tokens
+    route = model_router.route(user_message, prompt_tokens, ceiling=model)
+    
+    return {
+        'messages': messages,
+        'model': route['model'],
+        'max_tokens': route['max_tokens'],
+        'route': route,
+        'temperature': temperature,
+        'data_version': data_version,
+        'question_vector': question_vector,
+        'has_history': bool(conversation_summary or chat_history),
+        'tool_context': {
+            'phone_number': phone_number,
+            'data_version': data_version,
+            'transactions': formatted_transactions
+        },
+        'prompt_tokens': prompt_tokens,
+        'prompt_report': {**prefix['report'], **plan.report}
+    }
+
+def render_stable_prefix(fact_sheet, transaction_table, tickers, model):
+    """Render the per-user system prompt prefix within its own token budget."""
+    instructions = CHAT_INSTRUCTIONS
+    if tickers:
+        instructions += f"\nThe user follows these tickers: {', '.join(tickers)}."
+    sections = [
+        PromptSection("instructions", [instructions], separator=""),
+        PromptSection.from_text("facts", fact_sheet),
+        PromptSection("transactions", transaction_table['rows'],
+                      header=f"Recent transactions:\n{transaction_table['preamble']}")
+    ]
+    for section in sections:
+        section.priority, section.policy = CHAT_PROMPT_SECTIONS[section.name]
+    
+    plan = fit_prompt(sections, budget=CHAT_PREFIX_TOKEN_BUDGET, model=model)
+    text = "\n\n".join(
+        part for part in [instructions, plan.render("facts"), plan.render("transactions")] if part
+    )
+    # Aliases defined in the prefix are reused by the transaction tables of each turn
+    return {'text': text, 'tokens': plan.total_tokens, 'report': plan.report, 'aliases': transaction_table['aliases']}
+
+def sse_event(data, event=None):
+    """Format a payload as a Server-Sent Events message."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def lookup_cached_response(phone_number, user_message, context, use_cache, timer=None):
+    """Look up an earlier answer to the same question against the same data.
+    
+    Returns:
+        tuple: (cached response or None, cache outcome, store callback for a fresh answer)
+    """
+    # Follow-ups ("why?", "and last month?") depend on the conversation, which is not part of the key
+    if not use_cache or (context.get('has_history') and is_follow_up(user_message)):
+        response_cache.record_bypass()
+        return None, BYPASS, lambda response: None
+    
+    key = SemanticResponseCache.cache_key(context['data_version'], context['model'],
+                                          {'temperature': context['temperature']})
+    try:
+        with timed(timer, 'response_cache'):
+            cached, vector = response_cache.lookup(phone_number, user_message, key,
+                                                   vector=context.get('question_vector'))
     except Exception as e:
-        print(f"Exception fetching news for {ticker}: {str(e)}")
-        return []
+        current_app.logger.warning(f"Response cache lookup failed: {str(e)}")
+        return None, BYPASS, lambda response: None
+    
+    def store(response):
+        response_cache.store(phone_number, user_message, vector, response, key)
+    
+    return cached, HIT if cached is not None else MISS, store
 
-def fetch_market_news(limit=4):
-    """Fetch general market news."""
+def answer_chat(phone_number, user_message, use_cache=True, use_fast_path=True, timer=None):
+    """Run one chat turn end to end.
+    
+    Returns:
+        tuple: (assistant response, response cache outcome, fast path intent or None)
+    """
+    timer = timer or StageTimer()
+    
+    # Get user from database
+    users_collection = get_users_collection()
+    with timed(timer, 'mongo'):
+        user = users_collection.find_one({"phone_number": phone_number}, USER_PROJECTION)
+    
+    if not user or "plaid_access_token" not in user:
+        print(f"No plaid_access_token found for user {phone_number}")
+        return NO_BANK_ACCOUNT_RESPONSE, BYPASS, None
+    
+    data = load_chat_data(user, phone_number, timer)
+    
+    fast_answer = try_fast_path(phone_number, user_message, data, use_fast_path, timer)
+    if fast_answer is not None:
+        intent, assistant_response = fast_answer
+        print(f"\n\n===== FAST PATH RESPONSE ({intent}) =====\n{assistant_response}\n===========================\n")
+        with timed(timer, 'mongo'):
+            append_chat_turn(phone_number, user_message, assistant_response)
+        chat_memory.schedule_update(phone_number)
+        return assistant_response, BYPASS, intent
+    
+    context = build_chat_context(user, phone_number, user_message, data, timer)
+    timer.prompt_tokens = context['prompt_tokens']
+    
+    assistant_response, cache_status, store = lookup_cached_response(
+        phone_number, user_message, context, use_cache, timer
+    )
+    if assistant_response is None:
+        print("Calling OpenAI API...")
+        # Market data and news are fetched only if the model calls a tool for them
+        assistant_response, tools_used = complete_with_tools(
+            request_hedger.bind(openai_client),
+            chat_tools,
+            context['messages'],
+            context=context['tool_context'],
+            model=context['model'],
+            temperature=context['temperature'],
+            max_tokens=context['max_tokens'],
+            timer=timer
+        )
+        record_route(context, timer, assistant_response)
+        # Answers built on live market data go stale on their own
+        if not LIVE_DATA_TOOLS.intersection(tools_used):
+            store(assistant_response)
+    print(f"\n\n===== MODEL RESPONSE ({cache_status}) =====\n{assistant_response}\n===========================\n")
+    
+    with timed(timer, 'mongo'):
+        append_chat_turn(phone_number, user_message, assistant_response)
+    chat_memory.schedule_update(phone_number)
+    
+    return assistant_response, cache_status, None
+
+def record_route(context, timer, assistant_response):
+    """Record the model latency of a routed request for tuning the router."""
     try:
-        url = f"https://newsapi.org/v2/top-headlines?category=business&country=us&pageSize={limit}&apiKey={NEWS_API_KEY}"
-        response = requests.get(url)
-        data = response.json()
+        model_router.record(
+            context['route'],
+            timer.breakdown().get('openai', 0.0),
+            count_tokens(assistant_response or "", context['model'])
+        )
+    except Exception as e:
+        current_app.logger.warning(f"Could not record model routing: {str(e)}")
+
+def finish_timing(route, timer):
+    """Record a finished request in the latency histograms and log it if it was slow."""
+    chat_latency.observe_timer(route, timer)
+    total_ms = timer.total_ms()
+    if total_ms >= CHAT_SLOW_REQUEST_MS:
+        stages = ", ".join(f"{name} {ms:.0f} ms" for name, ms in timer.breakdown().items())
+        current_app.logger.warning(
+            f"Slow {route} request: {total_ms:.0f} ms, prompt {timer.prompt_tokens or 0} tokens ({stages})"
+        )
+
+def run_chat_job(app, phone_number, user_message, use_cache, use_fast_path=True):
+    """Answer a queued chat request on a job worker."""
+    with app.app_context():
+        timer = StageTimer()
+        try:
+            assistant_response, _, _ = answer_chat(phone_number, user_message, use_cache, use_fast_path, timer)
+        finally:
+            finish_timing('chat_job', timer)
+        return {'response': assistant_response}
+
+def warm_chat_context(phone_number, app):
+    """Load everything a user's next chat turn reads into the caches."""
+    with app.app_context():
+        user = get_users_collection().find_one({"phone_number": phone_number}, USER_PROJECTION)
+        if not user or "plaid_access_token" not in user:
+            return
         
-        if response.status_code != 200 or data.get('status') != 'ok':
-            print(f"Error fetching market news: {data.get('message', 'Unknown error')}")
-            return []
+        # Transactions and balances, aggregates, the query frame and the prompt prefix
+        data = load_chat_data(user, phone_number)
+        get_transaction_frame(phone_number, data['data_version'], data['transactions'])
+        get_stable_prefix(phone_number, data, user.get("settings", {}).get("model", "gpt-4o-mini"))
+        transaction_retriever.ingest(phone_number, data['transactions'], version=data['snapshot_version'])
         
-        articles = data.get('articles', [])
-        return [
-            {
-                'title': article.get('title'),
-                'description': article.get('description'),
-                'content': article.get('content'),
-                'source': article.get('source', {}).get('name'),
-                'published_at': article.get('publishedAt'),
-                'url': article.get('url')
-            }
-            for article in articles[:limit]
-        ]
-    except Exception as e:
-        print(f"Exception fetching market news: {str(e)}")
-        return []
-
-def format_stock_performance(performance_data, indices_data):
-    """Format stock performance data for inclusion in the prompt."""
-    prompt_text = "Weekly Stock Performance:\n\n"
-    
-    # Add market indices
-    if indices_data:
-        prompt_text += "Market Indices:\n"
-        for index_name, data in indices_data.items():
-            change_symbol = "↑" if data["percent_change"] >= 0 else "↓"
-            prompt_text += f"{index_name}: {data['current_price']} ({change_symbol}{abs(data['percent_change'])}%)\n"
-        prompt_text += "\n"
-    
-    # Add individual stocks
-    if performance_data:
-        prompt_text += "Portfolio Stocks:\n"
-        for ticker, data in performance_data.items():
-            if "error" in data:
-                prompt_text += f"{ticker}: {data['error']}\n"
-                continue
-                
-            change_symbol = "↑" if data["percent_change"] >= 0 else "↓"
-            prompt_text += f"{ticker}: ${data['current_price']} ({change_symbol}{abs(data['percent_change'])}%)\n"
-            prompt_text += f"  Weekly Range: ${data['low']} - ${data['high']}\n"
-            prompt_text += f"  Average Volume: {data['volume_avg']:,}\n"
-    
-    return prompt_text
-
-def format_news_for_prompt(ticker_news, market_news):
-    """Format news articles for inclusion in the prompt."""
-    prompt_text = "Recent Market News:\n\n"
-    
-    # Add market news
-    if market_news:
-        for i, article in enumerate(market_news, 1):
-            prompt_text += f"{i}. {article['title']} - {article['source']}\n"
-            if article.get('description'):
-                prompt_text += f"   {article['description']}\n"
-            if article.get('content'):
-                content = article.get('content', '')
-                # Some APIs limit content with a character count and "[+chars]" suffix
-                if "[+" in content:
-                    content = content.split("[+")[0]
-                prompt_text += f"   Content: {content}\n"
-            prompt_text += f"   Published: {article['published_at']}\n\n"
-    else:
-        prompt_text += "No recent market news available.\n\n"
-    
-    # Add ticker-specific news
-    if ticker_news:
-        prompt_text += "Recent Stock News:\n"
-        for ticker, articles in ticker_news.items():
-            if articles:
-                prompt_text += f"\n{ticker} News:\n"
-                for i, article in enumerate(articles, 1):
-                    prompt_text += f"{i}. {article['title']} - {article['source']}\n"
-                    if article.get('description'):
-                        prompt_text += f"   {article['description']}\n"
-                    prompt_text += f"   Published: {article['published_at']}\n\n"
-    
-    return prompt_text
+        # Market data and news the tools fetch for the user's watchlist, rendered as the tools return them
+        tickers = clean_tickers(data['tickers'])
+        try:
+            get_stock_performance_tool(tickers)
+            get_market_indices_tool()
+            get_market_news_tool(limit=4)
+            get_ticker_news_tool(tickers, limit=2)
+        except Exception as e:
+            print(f"Error warming market data for {phone_number}: {str(e)}")
+
+# Loads a user's chat context in the background when they open the chat page
+chat_warmer = ContextWarmer(warm_chat_context)
+
+def wants_cache(data):
+    """Whether the response cache may answer this request."""
+    if data.get('cache') is False:
+        return False
+    return 'no-cache' not in request.headers.get('Cache-Control', '').lower()
+
+def wants_fast_path(data):
+    """Whether templated questions may be answered without the model."""
+    return data.get('fast_path') is not False
+
+def wants_async(data):
+    """Whether the client asked for the job-based chat mode."""
+    return bool(data.get('async')) or request.headers.get('Prefer', '').lower() == 'respond-async'
+
+def admitted(view):
+    """Refuse chat requests over the user's rate limit or the global concurrency limit.
+    
+    Admitted requests hold a slot until their response has been built, or
+    for streamed responses until the stream has been sent. Place it below
+    ``idempotent`` so replayed responses skip admission.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        admission = chat_admission.admit(standardize_phone_number(get_jwt_identity()))
+        if not admission['admitted']:
+            error = 'Too many chat requests' if admission['status'] == 429 else 'Chat is busy, please retry shortly'
+            return jsonify({'error': error}), admission['status'], {'Retry-After': str(admission['retry_after'])}
+        
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            chat_admission.release(admission['slot'])
+            raise
+        if response.is_streamed:
+            response.call_on_close(lambda: chat_admission.release(admission['slot']))
+        else:
+            chat_admission.release(admission['slot'])
+        return response
+    return wrapper
 
 @chatbot_bp.route('/chat', methods=['POST'])
 @jwt_required()
 @cross_origin()
+@idempotent(idempotency_keys)
+@admitted
 def chat():
-    """Handle chat requests from users."""
+    """Handle chat requests from users.
+    
+    With ``"async": true`` in the body (or a ``Prefer: respond-async``
+    header) the request is queued instead and answered with 202 and a job
+    ID; poll ``/chat/jobs/<job_id>`` for the response. ``"cache": false``
+    (or ``Cache-Control: no-cache``) skips the response cache and
+    ``"fast_path": false`` always sends the question to the model.
+    Retries that repeat the ``Idempotency-Key`` header get the first
+    answer instead of asking (and appending to the history) again.
+    """
     phone_number = get_jwt_identity()
     phone_number = standardize_phone_number(phone_number)
     
@@ -263,160 +740,271 @@ def chat():
     user_message = data['message']
     print(f"\n\n===== USER QUESTION =====\nPhone: {phone_number}\nQuestion: {user_message}\n==========================\n")
     
+    if wants_async(data):
+        try:
+            job = chat_jobs.submit(phone_number, run_chat_job, current_app._get_current_object(),
+                                   phone_number, user_message, wants_cache(data), wants_fast_path(data))
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+        
+        return jsonify({
+            'job_id': job['job_id'],
+            'status': job['status'],
+            'status_url': url_for('chatbot.chat_job', job_id=job['job_id'])
+        }), 202
+    
+    timer = StageTimer()
+    try:
+        assistant_response, cache_status, intent = answer_chat(
+            phone_number, user_message, wants_cache(data), wants_fast_path(data), timer
+        )
+        
+        finish_timing('chat', timer)
+        headers = {'X-Response-Cache': cache_status, 'Server-Timing': timer.server_timing()}
+        if intent:
+            headers['X-Fast-Path'] = intent
+        return jsonify({
+            'response': assistant_response
+        }), 200, headers
+    
+    except Exception as e:
+        current_app.logger.error(f"Error in chatbot: {str(e)}")
+        print(f"\n\n===== ERROR =====\n{str(e)}\n=================\n")
+        finish_timing('chat', timer)
+        return jsonify({'error': str(e)}), 500, {'Server-Timing': timer.server_timing()}
+
+@chatbot_bp.route('/warm', methods=['POST'])
+@jwt_required()
+@cross_origin()
+def warm():
+    """Start loading the user's chat context so their next message finds it cached.
+    
+    Safe to call repeatedly: a running or recent warm-up is not repeated.
+    Answers 202 while warming and 200 once the context is warm.
+    """
+    phone_number = get_jwt_identity()
+    phone_number = standardize_phone_number(phone_number)
+    
+    status = chat_warmer.request(phone_number, current_app._get_current_object())
+    return jsonify({'status': status}), 202 if status == WARMING else 200
+
+@chatbot_bp.route('/chat/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+@cross_origin()
+def chat_job(job_id):
+    """Return the status of a queued chat request.
+    
+    Pass ``wait`` (seconds) to hold the request until the job finishes or
+    the wait runs out, instead of polling in a tight loop.
+    """
+    phone_number = get_jwt_identity()
+    phone_number = standardize_phone_number(phone_number)
+    
     try:
-        # Get user from database
+        wait = min(float(request.args.get('wait', 0)), CHAT_JOB_MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'Invalid wait parameter'}), 400
+    
+    job = chat_jobs.wait(job_id, wait) if wait > 0 else chat_jobs.get(job_id)
+    
+    # Other users' jobs are indistinguishable from missing ones
+    if job is None or job['owner'] != phone_number:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job_status(job))
+
+@chatbot_bp.route('/chat/stream', methods=['POST'])
+@jwt_required()
+@cross_origin()
+@admitted
+def chat_stream():
+    """Handle chat requests, relaying the model's tokens as Server-Sent Events.
+    
+    Each token chunk is sent as a ``data: {"delta": ...}`` message. The stream
+    ends with a ``done`` event carrying the full response, or an ``error``
+    event if the completion fails part-way. The Server-Timing header covers
+    the work up to the first token; the full breakdown is recorded once the
+    stream ends.
+    """
+    phone_number = get_jwt_identity()
+    phone_number = standardize_phone_number(phone_number)
+    
+    data = request.get_json()
+    
+    if not data or 'message' not in data:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    user_message = data['message']
+    print(f"\n\n===== USER QUESTION (STREAM) =====\nPhone: {phone_number}\nQuestion: {user_message}\n==========================\n")
+    
+    timer = StageTimer()
+    try:
+        # Context is built before the stream opens so setup errors are plain JSON
         users_collection = get_users_collection()
-        user = users_collection.find_one({"phone_number": phone_number})
+        with timed(timer, 'mongo'):
+            user = users_collection.find_one({"phone_number": phone_number}, USER_PROJECTION)
         
         if not user or "plaid_access_token" not in user:
             print(f"No plaid_access_token found for user {phone_number}")
             return jsonify({
-                'response': "I don't have access to your transaction history. Please link your bank account first."
+                'response': NO_BANK_ACCOUNT_RESPONSE
             })
         
-        # Get transactions from Plaid
-        access_token = user["plaid_access_token"]
+        chat_data = load_chat_data(user, phone_number, timer)
+        fast_answer = try_fast_path(phone_number, user_message, chat_data, wants_fast_path(data), timer)
         
-        # Set date range for transactions (last 30 days)
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=120)
-        
-        # Create request for transactions
-        transactions_request = TransactionsGetRequest(
-            access_token=access_token,
-            start_date=start_date,
-            end_date=end_date,
-            options=TransactionsGetRequestOptions(
-                count=100,  # Number of transactions to return
-                offset=0
+        if fast_answer is not None:
+            # Answered from the user's data; skip the prompt, the cache and the model
+            intent, cached_response = fast_answer
+            cache_status, store = BYPASS, lambda response: None
+        else:
+            intent = None
+            context = build_chat_context(user, phone_number, user_message, chat_data, timer)
+            timer.prompt_tokens = context['prompt_tokens']
+            cached_response, cache_status, store = lookup_cached_response(
+                phone_number, user_message, context, wants_cache(data), timer
             )
-        )
-        
-        transactions_response = plaid_client.transactions_get(transactions_request)
-        transactions = transactions_response['transactions']
-        print(f"Retrieved {len(transactions)} transactions from Plaid")
-        
-        # Format transactions for the LLM
-        formatted_transactions = []
-        for tx in transactions:
-            formatted_tx = {
-                'date': tx['date'],
-                'name': tx['name'],
-                'amount': tx['amount'],
-                'category': tx['category'] if 'category' in tx and tx['category'] else ['Uncategorized']
-            }
-            formatted_transactions.append(formatted_tx)
         
-        # Convert to string for the prompt
-        transaction_history = "\n".join([
-            f"Date: {tx['date']}, Merchant: {tx['name']}, Amount: ${tx['amount']:.2f}, Category: {', '.join(tx['category'])}"
-            for tx in formatted_transactions
-        ])
-        
-        # Get user's budget data
-        budget_data = user.get("budgets", {})
-        
-        # Format budget data for the prompt
-        budget_info = "Budget Information:\n"
-        if budget_data:
-            budget_info += f"Shopping Budget: ${budget_data.get('shopping', 0):.2f}/month\n"
-            budget_info += f"Food Budget: ${budget_data.get('food', 0):.2f}/month\n"
-            budget_info += f"Entertainment Budget: ${budget_data.get('entertainment', 0):.2f}/month\n"
-            budget_info += f"Target Account Balance: ${budget_data.get('target_balance', 0):.2f}\n"
+        tools_used = []
+        first_delta = None
+        if cached_response is not None:
+            # A cached or fast path answer is sent as a single delta
+            completion = iter([cached_response])
         else:
-            budget_info += "No budget information available.\n"
-        
-        # Fetch news for tickers and market
-        tickers = fetch_ticker_list(phone_number)
-        
-        # Fetch stock performance data
-        stock_performance = fetch_stock_performance(tickers)
-        market_indices = fetch_market_indices()
-        performance_info = format_stock_performance(stock_performance, market_indices)
-        
-        # Fetch news articles
-        ticker_news = {}
-        for ticker in tickers:
-            ticker_news[ticker] = fetch_news_for_ticker(ticker.strip())
-        
-        market_news = fetch_market_news(limit=4)  # Increased to 4 articles
-        
-        # Format news for the prompt
-        news_info = format_news_for_prompt(ticker_news, market_news)
-        
-        # Get chat history from the database or initialize if not exists
-        chat_history = user.get("chat_history", [])
-        
-        # Get model settings from the database or use defaults
-        model = user.get("settings", {}).get("model", "gpt-4o-mini")
-        temperature = user.get("settings", {}).get("temperature", 0.7)
-        
-        # Prepare messages for OpenAI
-        messages = [
-            {
-                "role": "system", 
-                "content": f"""You are a helpful financial assistant that helps users understand their transaction history and finances.
-You have access to the user's transaction history from their bank account and their budget settings.
-You also have access to recent news about the stock market and specific stocks the user is interested in, as well as weekly stock performance data.
-Use this information to provide personalized financial advice and answer questions.
-Be concise, helpful, and accurate. If you don't know something, say so.
-Do not make up information that is not in the transaction history.
-Some transactions are positive, and some are negative. Positive transactions should be shown as a loss in money, and negative transactions should be shown as a gain in money. AKA a negative transaction is a refund.
-
-{budget_info}
-
-{performance_info}
-
-{news_info}
+            print("Calling OpenAI API (streaming)...")
+            completion = stream_with_tools(
+                request_hedger.bind(openai_client),
+                chat_tools,
+                context['messages'],
+                tools_used,
+                context=context['tool_context'],
+                model=context['model'],
+                temperature=context['temperature'],
+                max_tokens=context['max_tokens'],
+                timer=timer
+            )
+            # Open the first stream now so request errors are reported as plain JSON
+            first_delta = next(completion, None)
+    except Exception as e:
+        current_app.logger.error(f"Error in chatbot stream: {str(e)}")
+        print(f"\n\n===== ERROR =====\n{str(e)}\n=================\n")
+        finish_timing('chat_stream', timer)
+        return jsonify({'error': str(e)}), 500, {'Server-Timing': timer.server_timing()}
+    
+    # Taken before the stream is consumed, so it ends at the first token
+    server_timing = timer.server_timing()
+    
+    @stream_with_context
+    def generate():
+        parts = []
+        try:
+            for delta in itertools.chain([first_delta], completion):
+                if delta:
+                    parts.append(delta)
+                    yield sse_event({'delta': delta})
+            
+            assistant_response = "".join(parts)
+            print(f"\n\n===== MODEL RESPONSE (STREAM, {intent or cache_status}) =====\n{assistant_response}\n===========================\n")
+            
+            if cached_response is None:
+                record_route(context, timer, assistant_response)
+            
+            # Persist only completed answers so history never holds half a reply
+            if cached_response is None and not LIVE_DATA_TOOLS.intersection(tools_used):
+                store(assistant_response)
+            with timed(timer, 'mongo'):
+                append_chat_turn(phone_number, user_message, assistant_response)
+            chat_memory.schedule_update(phone_number)
+            yield sse_event({'response': assistant_response}, event='done')
+        except Exception as e:
+            current_app.logger.error(f"Error in chatbot stream: {str(e)}")
+            yield sse_event({'error': str(e)}, event='error')
+        finally:
+            close = getattr(completion, 'close', None)
+            if close:
+                close()
+            finish_timing('chat_stream', timer)
+    
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'X-Response-Cache': cache_status,
+        'Server-Timing': server_timing
+    }
+    if intent:
+        headers['X-Fast-Path'] = intent
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
 
-Transaction history:
-{transaction_history}"""
-            }
-        ]
-        
-        # Add chat history to messages
-        for msg in chat_history:
-            messages.append({"role": msg["role"], "content": msg["content"]})
-        
-        # Add the current user message
-        messages.append({"role": "user", "content": user_message})
-        
-        print("Calling OpenAI API...")
-        # Call OpenAI API with the new format
-        response = openai_client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=500
-        )
-        
-        # Extract the response text with the new format
-        assistant_response = response.choices[0].message.content
-        print(f"\n\n===== MODEL RESPONSE =====\n{assistant_response}\n===========================\n")
-        
-        # Update chat history
-        chat_history.append({"role": "user", "content": user_message})
-        chat_history.append({"role": "assistant", "content": assistant_response})
-        
-        # Keep only the last 20 messages to avoid memory issues
-        if len(chat_history) > 30:
-            chat_history = chat_history[-30:]
-        
-        # Update user in database
-        users_collection.update_one(
-            {"phone_number": phone_number},
-            {"$set": {"chat_history": chat_history}}
-        )
+@chatbot_bp.route('/history', methods=['GET'])
+@jwt_required()
+@cross_origin()
+def chat_history():
+    """Return a page of the user's chat history, newest page first.
+    
+    Pass the ``next_before`` value of a response as ``before`` to load the
+    page of older messages.
+    """
+    phone_number = get_jwt_identity()
+    phone_number = standardize_phone_number(phone_number)
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', CHAT_HISTORY_PAGE_SIZE)), CHAT_HISTORY_MAX_PAGE_SIZE))
+        before = request.args.get('before')
+        before = datetime.fromisoformat(before) if before else None
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or before parameter'}), 400
+    
+    try:
+        messages = get_chat_history(phone_number, limit=limit, before=before)
+        next_before = messages[0]['ts'].isoformat() if len(messages) == limit else None
         
         return jsonify({
-            'response': assistant_response
+            'messages': [
+                {'role': msg['role'], 'content': msg['content'], 'ts': msg['ts'].isoformat()}
+                for msg in messages
+            ],
+            'next_before': next_before
         })
-    
     except Exception as e:
-        current_app.logger.error(f"Error in chatbot: {str(e)}")
-        print(f"\n\n===== ERROR =====\n{str(e)}\n=================\n")
+        current_app.logger.error(f"Error loading chat history: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@chatbot_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def cache_stats():
+    """Return hit rates of the chat caches and the fast path."""
+    return jsonify({
+        'responses': response_cache.stats(),
+        'fast_path': fast_path.stats(),
+        'snapshots': context_snapshots.stats(),
+        'warm_ups': chat_warmer.stats(),
+        'idempotency': idempotency_keys.stats(),
+        'prompt_fragments': prompt_fragments.stats(),
+        'market_data': market_data.cache_stats()
+    })
+
+@chatbot_bp.route('/router/stats', methods=['GET'])
+@jwt_required()
+def router_stats():
+    """Return model routing decisions and the latencies they led to."""
+    return jsonify(model_router.stats())
+
+@chatbot_bp.route('/admission/stats', methods=['GET'])
+@jwt_required()
+def admission_stats():
+    """Return how many chat requests were admitted, queued, rate limited and shed."""
+    return jsonify(chat_admission.stats())
+
+@chatbot_bp.route('/latency/stats', methods=['GET'])
+@jwt_required()
+def latency_stats():
+    """Return latency percentiles of chat requests, in total and per stage, and hedging counters."""
+    return jsonify({
+        'slow_request_ms': CHAT_SLOW_REQUEST_MS,
+        'histograms': chat_latency.snapshot(),
+        'hedging': request_hedger.stats()
+    })
+
 @chatbot_bp.route('/test', methods=['GET'])
 def test():
     """Test route to check if the chatbot API is working."""
@@ -12,6 +12,7 @@ from plaid.model.transactions_get_request_options import TransactionsGetRequestO
 from datetime import datetime, timedelta, date
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.database import get_users_collection
+from app.api.idempotency import idempotency_keys, idempotent
 import re
 import uuid
 
@@ -23,6 +24,8 @@ PLAID_SECRET = os.environ.get('PLAID_SECRET')
 PLAID_ENV = os.environ.get('PLAID_ENV', 'sandbox')
 PLAID_PRODUCTS = os.environ.get('PLAID_PRODUCTS', 'transactions').split(',')
 PLAID_COUNTRY_CODES = os.environ.get('PLAID_COUNTRY_CODES', 'US').split(',')
+# Overrides the API host of PLAID_ENV, e.g. to point at a local stand-in
+PLAID_HOST = os.environ.get('PLAID_HOST')
 
 # Map environment to Plaid API environment
 environment = {
@@ -33,7 +36,7 @@ environment = {
 
 # Configure Plaid client
 configuration = plaid.Configuration(
-    host=environment.get(PLAID_ENV, plaid.Environment.Sandbox),
+    host=PLAID_HOST or environment.get(PLAID_ENV, plaid.Environment.Sandbox),
     api_key={
         'clientId': PLAID_CLIENT_ID,
         'secret': PLAID_SECRET,
@@ -72,6 +75,7 @@ def create_link_token():
 
 @plaid_bp.route('/exchange-public-token', methods=['POST'])
 @jwt_required()
+@idempotent(idempotency_keys)
 def exchange_public_token():
     """Exchange a public token for an access token and item ID."""
     phone_number = get_jwt_identity()
@@ -103,6 +107,7 @@ def exchange_public_token():
             {"phone_number": phone_number},
             {"$set": {"plaid_access_token": access_token, "plaid_item_id": item_id}}
         )
+        refresh_chat_snapshot(phone_number)
         
         return jsonify({
             'access_token': access_token,
@@ -428,7 +433,14 @@ def generate_custom_transactions(accounts):
     # Combine both types of transactions
     return custom_transactions + stock_transactions
 
+def _signup_phone_number():
+    """Scope signup Idempotency-Keys by the phone number signing up, as there is no JWT yet."""
+    data = request.get_json(silent=True)
+    phone_number = data.get('phone_number') if isinstance(data, dict) else None
+    return standardize_phone_number(phone_number) if isinstance(phone_number, str) else ''
+
 @plaid_bp.route('/signup-transactions', methods=['POST'])
+@idempotent(idempotency_keys, scope=_signup_phone_number)
 def signup_transactions():
     """Get transactions during the signup process."""
     data = request.get_json()
@@ -466,6 +478,7 @@ def signup_transactions():
                 "plaid_access_token": access_token,
                 "plaid_item_id": item_id
             })
+        refresh_chat_snapshot(phone_number)
         # Set date range for transactions
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=365)
@@ -565,6 +578,17 @@ def get_accounts():
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+def refresh_chat_snapshot(phone_number):
+    """Rebuild the user's chat context in the background after their bank data changed."""
+    # Imported here to avoid a circular import with the chatbot routes
+    from app.api.routes.chatbot import chat_warmer, context_snapshots
+    try:
+        context_snapshots.schedule_refresh(phone_number)
+        # The next warm-up loads the new data instead of counting as done
+        chat_warmer.invalidate(phone_number)
+    except Exception as e:
+        print(f"Error scheduling chat snapshot refresh: {str(e)}")
+
 def standardize_phone_number(phone_number: str) -> str:
     """Standardize phone number to +1 format."""
     # Remove all non-digit characters
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.database import get_users_collection
+from shared.watchlist import normalize_tickers, user_tickers
 import re
 
 settings_bp = Blueprint('settings', __name__)
@@ -20,7 +21,7 @@ def get_settings():
     
     try:
         users_collection = get_users_collection()
-        user = users_collection.find_one({"phone_number": phone_number})
+        user = users_collection.find_one({"phone_number": phone_number}, {"chat_history": 0})
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -31,10 +32,11 @@ def get_settings():
         # Get budgets or return default if not present
         budgets = user.get("budgets", {})
         
-        # Combine settings and budgets for the response
+        # Combine settings, budgets and the watchlist for the response
         response = {
             'settings': settings,
-            'budgets': budgets
+            'budgets': budgets,
+            'tickers': user_tickers(user)
         }
         
         return jsonify({
@@ -57,7 +59,7 @@ def update_settings():
     
     try:
         users_collection = get_users_collection()
-        user = users_collection.find_one({"phone_number": phone_number})
+        user = users_collection.find_one({"phone_number": phone_number}, {"chat_history": 0})
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -132,3 +134,56 @@ def update_settings():
             })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@settings_bp.route('/tickers', methods=['GET'])
+@jwt_required()
+def get_tickers():
+    """Get the tickers on the user's watchlist."""
+    phone_number = get_jwt_identity()
+    phone_number = standardize_phone_number(phone_number)
+    
+    try:
+        users_collection = get_users_collection()
+        user = users_collection.find_one({"phone_number": phone_number}, {"tickers": 1, "phone_number": 1})
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({'tickers': user_tickers(user)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@settings_bp.route('/tickers', methods=['POST'])
+@jwt_required()
+def update_tickers():
+    """Replace the tickers on the user's watchlist."""
+    phone_number = get_jwt_identity()
+    phone_number = standardize_phone_number(phone_number)
+    data = request.get_json()
+    
+    if not data or 'tickers' not in data:
+        return jsonify({'error': 'tickers is required'}), 400
+    
+    try:
+        tickers = normalize_tickers(data['tickers'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        users_collection = get_users_collection()
+        user = users_collection.find_one({"phone_number": phone_number}, {"phone_number": 1})
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        users_collection.update_one(
+            {"phone_number": phone_number},
+            {"$set": {"tickers": tickers}}
+        )
+        
+        return jsonify({
+            'message': 'Watchlist updated successfully',
+            'tickers': tickers
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
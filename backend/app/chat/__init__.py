@@ -0,0 +1,3 @@
+"""
+Chat pipeline helpers used by the chatbot routes.
+"""
@@ -0,0 +1,237 @@
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Per-user token bucket: requests per minute, and how many may come at once
+CHAT_RATE_LIMIT_PER_MINUTE = float(os.environ.get('CHAT_RATE_LIMIT_PER_MINUTE', 20))
+CHAT_RATE_LIMIT_BURST = int(os.environ.get('CHAT_RATE_LIMIT_BURST', 10))
+# Chat requests running at once across all workers, and how many may queue for a slot
+CHAT_MAX_CONCURRENT = int(os.environ.get('CHAT_MAX_CONCURRENT', 32))
+CHAT_MAX_QUEUE = int(os.environ.get('CHAT_MAX_QUEUE', 64))
+CHAT_QUEUE_TIMEOUT = float(os.environ.get('CHAT_QUEUE_TIMEOUT', 10))
+# Slots of a worker that died are reclaimed after this many seconds
+CHAT_SLOT_LEASE = int(os.environ.get('CHAT_SLOT_LEASE', 300))
+# SQLite file shared by the worker processes of one host; empty keeps the state in this process
+CHAT_ADMISSION_DB = os.environ.get('CHAT_ADMISSION_DB', '')
+
+ADMITTED = 'admitted'
+RATE_LIMITED = 'rate_limited'
+SHED = 'shed'
+TIMED_OUT = 'timed_out'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (user TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS slots (id TEXT PRIMARY KEY, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS waiting (id TEXT PRIMARY KEY, expires REAL NOT NULL);
+"""
+
+
+class AdmissionController:
+    """
+    Admission control for chat requests
+
+    Each user has a token bucket refilled at rate_per_minute up to burst
+    requests; a user with an empty bucket is refused with 429. Other
+    requests then take one of max_concurrent slots shared by every worker,
+    and a token only once they have one. When all slots are taken a request
+    waits in a queue of at most max_queue for queue_timeout seconds;
+    requests that find the queue full, or time out in it, are shed with
+    503 and keep their token. Both carry a retry_after.
+
+    The buckets, slots and queue live in SQLite so the worker processes of
+    a host share them. Slots are leased, so a worker that dies mid-request
+    does not hold its slots for good.
+
+    Args:
+        path (str): SQLite file; '' or ':memory:' keeps the state in this process
+        rate_per_minute (float): Bucket refill rate; 0 disables the rate limit
+        burst (int): Bucket size
+        max_concurrent (int): Slots; 0 disables the concurrency limit
+        max_queue (int): Requests that may wait for a slot
+        queue_timeout (float): Seconds a request waits for a slot
+        lease (int): Seconds after which an unreleased slot is reclaimed
+        poll_interval (float): Seconds between the first checks for a free
+            slot; later checks back off to 16 times as long
+    """
+
+    def __init__(self, path=CHAT_ADMISSION_DB, rate_per_minute=CHAT_RATE_LIMIT_PER_MINUTE,
+                 burst=CHAT_RATE_LIMIT_BURST, max_concurrent=CHAT_MAX_CONCURRENT, max_queue=CHAT_MAX_QUEUE,
+                 queue_timeout=CHAT_QUEUE_TIMEOUT, lease=CHAT_SLOT_LEASE, poll_interval=0.05,
+                 clock=time.time, sleep=time.sleep):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        # Transactions are managed by hand so BEGIN IMMEDIATE locks out other processes
+        self._db = sqlite3.connect(path or ':memory:', timeout=5, isolation_level=None, check_same_thread=False)
+        if path and path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+        # Average seconds a slot is held, for the Retry-After of shed requests
+        self._hold_seconds = 1.0
+        self._held = {}
+        self._counters = {ADMITTED: 0, RATE_LIMITED: 0, SHED: 0, TIMED_OUT: 0, 'queued': 0}
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def admit(self, user):
+        """
+        Decide whether a user's request may run, waiting for a slot if need be
+
+        Args:
+            user (str): Who sent the request
+
+        Returns:
+            dict: 'admitted' (bool); 'slot' to pass to release() when
+                admitted, otherwise 'status' (429 or 503), 'reason' and
+                'retry_after' (whole seconds)
+        """
+        if self.max_concurrent <= 0:
+            with self._transaction() as db:
+                retry_after = self._take_token(db, user, self._clock())
+            if retry_after:
+                return self._reject(RATE_LIMITED, 429, retry_after)
+            return self._admit(None)
+
+        slot = uuid.uuid4().hex
+        with self._transaction() as db:
+            now = self._clock()
+            # The token is only spent once the request gets a slot, so shed requests cost none
+            retry_after = self._take_token(db, user, now, spend=False)
+            if retry_after:
+                return self._reject(RATE_LIMITED, 429, retry_after)
+            self._expire(db, now)
+            active, queued = self._occupancy(db)
+            # Newcomers only skip the queue when nobody is waiting in it
+            if active < self.max_concurrent and queued == 0:
+                self._take_token(db, user, now)
+                db.execute('INSERT INTO slots (id, expires) VALUES (?, ?)', (slot, now + self.lease))
+                return self._admit(slot)
+            if queued >= self.max_queue:
+                return self._reject(SHED, 503, self._estimate_wait(queued))
+            db.execute('INSERT INTO waiting (id, expires) VALUES (?, ?)', (slot, now + self.queue_timeout + self.lease))
+        self._count('queued')
+
+        deadline = self._clock() + self.queue_timeout
+        interval = self.poll_interval
+        while True:
+            # Back off while the slots stay full; jitter keeps waiting workers from polling in step
+            self._sleep(min(interval * random.uniform(0.5, 1.0), max(0, deadline - self._clock())))
+            interval = min(interval * 2, self.poll_interval * 16)
+            # Look for a free slot without the write lock; most polls find none
+            now = self._clock()
+            if now < deadline:
+                with self._lock:
+                    active, _ = self._occupancy(self._db, now)
+                if active >= self.max_concurrent:
+                    continue
+            with self._transaction() as db:
+                now = self._clock()
+                self._expire(db, now)
+                active, queued = self._occupancy(db)
+                if active < self.max_concurrent:
+                    db.execute('DELETE FROM waiting WHERE id = ?', (slot,))
+                    # The user's other requests may have used up the bucket meanwhile
+                    retry_after = self._take_token(db, user, now)
+                    if retry_after:
+                        return self._reject(RATE_LIMITED, 429, retry_after)
+                    db.execute('INSERT INTO slots (id, expires) VALUES (?, ?)', (slot, now + self.lease))
+                    return self._admit(slot)
+                if now >= deadline:
+                    db.execute('DELETE FROM waiting WHERE id = ?', (slot,))
+                    return self._reject(TIMED_OUT, 503, self._estimate_wait(queued))
+
+    def release(self, slot):
+        """Give back the slot of a finished request; releasing twice does nothing."""
+        if slot is None:
+            return
+        with self._transaction() as db:
+            released = db.execute('DELETE FROM slots WHERE id = ?', (slot,)).rowcount
+        with self._counter_lock:
+            started = self._held.pop(slot, None)
+            if released and started is not None:
+                self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (self._clock() - started)
+
+    def _take_token(self, db, user, now, spend=True):
+        """
+        Take a token from the user's bucket inside a transaction
+
+        Returns:
+            int: 0 when a token was available (and taken, if spend), otherwise
+                the seconds until one is
+        """
+        if self.rate <= 0:
+            return 0
+        row = db.execute('SELECT tokens, updated FROM buckets WHERE user = ?', (user,)).fetchone()
+        tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+        if tokens < 1:
+            return max(1, math.ceil((1 - tokens) / self.rate))
+        if spend:
+            db.execute('INSERT OR REPLACE INTO buckets (user, tokens, updated) VALUES (?, ?, ?)', (user, tokens - 1, now))
+        return 0
+
+    def _expire(self, db, now):
+        db.execute('DELETE FROM slots WHERE expires <= ?', (now,))
+        db.execute('DELETE FROM waiting WHERE expires <= ?', (now,))
+
+    def _occupancy(self, db, now=None):
+        """Count slots and waiting requests; with now, leave out expired ones without deleting them."""
+        now = float('-inf') if now is None else now
+        active = db.execute('SELECT COUNT(*) FROM slots WHERE expires > ?', (now,)).fetchone()[0]
+        queued = db.execute('SELECT COUNT(*) FROM waiting WHERE expires > ?', (now,)).fetchone()[0]
+        return active, queued
+
+    def _estimate_wait(self, queued):
+        """Seconds until the queue ahead has drained, at the current hold time per slot."""
+        return max(1, math.ceil(self._hold_seconds * (queued + 1) / max(1, self.max_concurrent)))
+
+    def _admit(self, slot):
+        with self._counter_lock:
+            if slot is not None:
+                self._held[slot] = self._clock()
+        self._count(ADMITTED)
+        return {'admitted': True, 'slot': slot}
+
+    def _reject(self, reason, status, retry_after):
+        self._count(reason)
+        return {'admitted': False, 'status': status, 'reason': reason, 'retry_after': retry_after}
+
+    def _count(self, outcome):
+        with self._counter_lock:
+            self._counters[outcome] += 1
+
+    def stats(self):
+        """Return admission counts of this process and the shared slot and queue occupancy."""
+        with self._counter_lock:
+            stats = dict(self._counters)
+        with self._lock:
+            active, queued = self._occupancy(self._db)
+        stats.update({
+            'active': active,
+            'waiting': queued,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'hold_seconds': round(self._hold_seconds, 3)
+        })
+        return stats
@@ -0,0 +1,145 @@
+import calendar
+from datetime import date, timedelta
+
+import numpy as np
+
+# Plaid primary categories counted against each budget setting
+BUDGET_CATEGORIES = {
+    'food': ['Food and Drink'],
+    'shopping': ['Shops'],
+    'entertainment': ['Recreation', 'Arts and Entertainment']
+}
+
+TOP_MERCHANTS = 5
+
+
+def _period_bounds(today):
+    month_start = today.replace(day=1)
+    last_month_end = month_start - timedelta(days=1)
+    return {
+        'mtd': (month_start, today),
+        'last_month': (last_month_end.replace(day=1), last_month_end),
+        'last_30d': (today - timedelta(days=30), today),
+        'last_90d': (today - timedelta(days=90), today)
+    }
+
+
+def build_fact_sheet(transactions, budgets=None, today=None):
+    """
+    Aggregate a user's transactions into a compact set of financial facts
+
+    Every aggregate is computed from one set of NumPy arrays: per-period masks
+    combined with bincounts over category and merchant codes. Positive amounts
+    are spending and negative amounts are income, as in Plaid.
+
+    Args:
+        transactions (list): Transactions with date, name, amount and category
+        budgets (dict, optional): The user's budget settings
+        today (date, optional): Reference date (defaults to today)
+
+    Returns:
+        dict: Period totals, per-category spend, top merchants and budget status
+    """
+    today = today or date.today()
+    budgets = budgets or {}
+    periods = _period_bounds(today)
+
+    dates = np.array([str(tx['date'])[:10] for tx in transactions], dtype='datetime64[D]')
+    amounts = np.array([float(tx['amount']) for tx in transactions], dtype=np.float64)
+    categories, category_codes = np.unique(
+        np.array([(tx.get('category') or ['Uncategorized'])[0] for tx in transactions], dtype=object),
+        return_inverse=True
+    )
+    merchants, merchant_codes = np.unique(
+        np.array([tx.get('name') or 'Unknown' for tx in transactions], dtype=object),
+        return_inverse=True
+    )
+
+    spend = np.where(amounts > 0, amounts, 0.0)
+    income = np.where(amounts < 0, -amounts, 0.0)
+
+    facts = {'as_of': today.isoformat(), 'transaction_count': len(transactions), 'periods': {}, 'categories': {}}
+
+    for name, (start, end) in periods.items():
+        mask = (dates >= np.datetime64(start)) & (dates <= np.datetime64(end))
+        by_category = np.bincount(category_codes, weights=spend * mask, minlength=len(categories))
+        facts['periods'][name] = {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'spend': round(float((spend * mask).sum()), 2),
+            'income': round(float((income * mask).sum()), 2),
+            'count': int(mask.sum())
+        }
+        for code in np.flatnonzero(by_category):
+            facts['categories'].setdefault(str(categories[code]), {})[name] = round(float(by_category[code]), 2)
+
+    # Top merchants by spend over the trailing 90 days
+    start, end = periods['last_90d']
+    mask = (dates >= np.datetime64(start)) & (dates <= np.datetime64(end)) & (amounts > 0)
+    merchant_spend = np.bincount(merchant_codes, weights=spend * mask, minlength=len(merchants))
+    merchant_counts = np.bincount(merchant_codes, weights=mask.astype(np.float64), minlength=len(merchants))
+    top = [code for code in np.argsort(-merchant_spend)[:TOP_MERCHANTS] if merchant_spend[code] > 0]
+    facts['top_merchants'] = [
+        {'name': str(merchants[code]), 'spend': round(float(merchant_spend[code]), 2), 'count': int(merchant_counts[code])}
+        for code in top
+    ]
+
+    # Month-to-date spend against each monthly budget
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    facts['budgets'] = {}
+    for budget_name, budget_categories in BUDGET_CATEGORIES.items():
+        if budget_name not in budgets:
+            continue
+        limit = float(budgets[budget_name] or 0)
+        spent = sum(facts['categories'].get(category, {}).get('mtd', 0.0) for category in budget_categories)
+        facts['budgets'][budget_name] = {
+            'budget': round(limit, 2),
+            'spent': round(spent, 2),
+            'remaining': round(limit - spent, 2),
+            'percent_used': round(spent / limit * 100, 1) if limit else None,
+            'projected': round(spent / today.day * days_in_month, 2)
+        }
+    if 'target_balance' in budgets:
+        facts['target_balance'] = round(float(budgets['target_balance'] or 0), 2)
+
+    return facts
+
+
+def render_fact_sheet(facts):
+    """Render a fact sheet as a compact block of prompt text."""
+    periods = facts['periods']
+    lines = [f"Financial facts as of {facts['as_of']} (USD, from {facts['transaction_count']} transactions):"]
+
+    lines.append("Totals: " + "; ".join(
+        f"{name} ({period['start']}..{period['end']}) spent {period['spend']:.2f}, income {period['income']:.2f}"
+        for name, period in periods.items()
+    ))
+
+    if facts['categories']:
+        lines.append("Spend by category (mtd/last_month/last_90d):")
+        ranked = sorted(facts['categories'].items(), key=lambda item: -item[1].get('last_90d', 0.0))
+        for category, totals in ranked:
+            lines.append(
+                f"- {category}: {totals.get('mtd', 0.0):.2f}/{totals.get('last_month', 0.0):.2f}/{totals.get('last_90d', 0.0):.2f}"
+            )
+
+    if facts['top_merchants']:
+        lines.append("Top merchants (last_90d): " + "; ".join(
+            f"{merchant['name']} {merchant['spend']:.2f} ({merchant['count']} tx)" for merchant in facts['top_merchants']
+        ))
+
+    if facts['budgets']:
+        lines.append("Monthly budgets (mtd):")
+        for name, status in facts['budgets'].items():
+            used = f"{status['percent_used']:.0f}% used, " if status['percent_used'] is not None else ""
+            lines.append(
+                f"- {name}: spent {status['spent']:.2f} of {status['budget']:.2f} "
+                f"({used}{status['remaining']:.2f} left, projected {status['projected']:.2f})"
+            )
+    else:
+        lines.append("No budget information available.")
+
+    if 'target_balance' in facts:
+        lines.append(f"Target account balance: {facts['target_balance']:.2f}")
+
+    return "\n".join(lines)
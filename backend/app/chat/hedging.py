@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from types import SimpleNamespace
+
+from app.chat.admission import CHAT_MAX_CONCURRENT
+from app.chat.jobs import CHAT_JOB_WORKERS
+
+# Hedging sends a second OpenAI request when the first is slower than usual
+CHAT_HEDGE_ENABLED = os.environ.get('CHAT_HEDGE_ENABLED', 'false').lower() == 'true'
+# Percentile of recent latencies after which the hedge is sent
+CHAT_HEDGE_PERCENTILE = float(os.environ.get('CHAT_HEDGE_PERCENTILE', 95))
+# Delay used until enough latencies were observed, and the shortest delay allowed
+CHAT_HEDGE_DEFAULT_DELAY_MS = float(os.environ.get('CHAT_HEDGE_DEFAULT_DELAY_MS', 3000))
+CHAT_HEDGE_MIN_DELAY_MS = float(os.environ.get('CHAT_HEDGE_MIN_DELAY_MS', 250))
+CHAT_HEDGE_MIN_SAMPLES = int(os.environ.get('CHAT_HEDGE_MIN_SAMPLES', 20))
+# Most requests hedged, as a fraction of the last CHAT_HEDGE_WINDOW requests
+CHAT_HEDGE_MAX_RATE = float(os.environ.get('CHAT_HEDGE_MAX_RATE', 0.05))
+CHAT_HEDGE_WINDOW = int(os.environ.get('CHAT_HEDGE_WINDOW', 200))
+# Every chat request the admission limit lets run, and every job worker, may have a
+# primary and a hedge in flight; a smaller pool would queue primaries and trigger hedges
+CHAT_HEDGE_WORKERS = int(os.environ.get('CHAT_HEDGE_WORKERS', 2 * ((CHAT_MAX_CONCURRENT or 32) + CHAT_JOB_WORKERS)))
+
+
+_END = object()
+
+
+def _close(stream):
+    close = getattr(stream, 'close', None)
+    if close:
+        close()
+
+
+class _HedgedStream:
+    """The winning stream, with the chunk that was read to pick it put back in front."""
+
+    def __init__(self, stream, iterator, first):
+        self._stream = stream
+        self._iterator = iterator
+        self._first = first
+
+    def __iter__(self):
+        if self._first is not _END:
+            yield self._first
+            yield from self._iterator
+
+    def close(self):
+        _close(self._stream)
+
+
+class RequestHedger:
+    """
+    Hedged chat completion requests
+
+    A request that has not finished (or, when streaming, not produced its
+    first chunk) after the given percentile of recent latencies for the
+    same model is sent a second time, and whichever answers first is used.
+    A losing stream is closed, which drops its connection; a losing
+    request that is still waiting for its response cannot be interrupted,
+    so its result is discarded when it arrives. Hedges are capped at
+    max_rate of the most recent requests so that a slow upstream does not
+    double the load on it.
+
+    Args:
+        enabled (bool): Send hedges at all
+        percentile (float): Percentile of recent latencies used as the hedge delay
+        default_delay_ms (float): Delay until min_samples latencies were observed
+        min_delay_ms (float): Shortest hedge delay
+        min_samples (int): Latencies needed before the percentile is used
+        max_rate (float): Most hedged requests, as a fraction of the window
+        window (int): Requests the hedge rate and latencies are computed over
+        executor (Executor, optional): Runs the requests (defaults to a thread pool)
+    """
+
+    def __init__(self, enabled=CHAT_HEDGE_ENABLED, percentile=CHAT_HEDGE_PERCENTILE,
+                 default_delay_ms=CHAT_HEDGE_DEFAULT_DELAY_MS, min_delay_ms=CHAT_HEDGE_MIN_DELAY_MS,
+                 min_samples=CHAT_HEDGE_MIN_SAMPLES, max_rate=CHAT_HEDGE_MAX_RATE, window=CHAT_HEDGE_WINDOW,
+                 executor=None):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.default_delay_ms = default_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self.window = window
+        self.executor = executor or ThreadPoolExecutor(max_workers=CHAT_HEDGE_WORKERS, thread_name_prefix='chat-hedge')
+        self._latencies = {}
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.cancelled = 0
+        self.skipped = 0
+
+    def bind(self, client):
+        """Return an object with client's chat.completions.create, hedged when enabled."""
+        if not self.enabled:
+            return client
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=partial(self.create, client))))
+
+    def delay_ms(self, key):
+        """Hedge delay for a (model, stream) key from its recent latencies."""
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay_ms
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay_ms, samples[index])
+
+    def _observe(self, key, ms):
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=self.window)).append(ms)
+
+    def _allow_hedge(self, entry):
+        """Whether a request may be hedged; entry is its own slot in the window of recent requests."""
+        with self._lock:
+            if sum(hedged for hedged, in self._recent) + 1 > self.max_rate * self.window:
+                self.skipped += 1
+                return False
+            entry[0] = True
+            self.hedged += 1
+            return True
+
+    def _attempt(self, client, kwargs):
+        started = time.perf_counter()
+        result = client.chat.completions.create(**kwargs)
+        if kwargs.get('stream'):
+            # A stream is ready once its first chunk arrived
+            iterator = iter(result)
+            first = next(iterator, _END)
+            result = _HedgedStream(result, iterator, first)
+        return result, (time.perf_counter() - started) * 1000
+
+    def _discard(self, future):
+        if future.cancel():
+            with self._lock:
+                self.cancelled += 1
+            return
+
+        def close_loser(done):
+            if done.cancelled() or done.exception() is not None:
+                return
+            with self._lock:
+                self.cancelled += 1
+            result, _ = done.result()
+            if isinstance(result, _HedgedStream):
+                result.close()
+        future.add_done_callback(close_loser)
+
+    def create(self, client, **kwargs):
+        """
+        Run chat.completions.create, hedging it if it is slow
+
+        Args:
+            client (OpenAI): OpenAI client
+            **kwargs: Passed to chat.completions.create
+
+        Returns:
+            The completion, or an iterable stream with close() when stream=True
+        """
+        key = (kwargs.get('model'), bool(kwargs.get('stream')))
+        delay = self.delay_ms(key)
+        # Concurrent requests each mark their own entry when they are hedged
+        entry = [False]
+        with self._lock:
+            self.requests += 1
+            self._recent.append(entry)
+
+        started = time.perf_counter()
+        primary = self.executor.submit(self._attempt, client, kwargs)
+        done, _ = wait([primary], timeout=delay / 1000)
+        if done or not self._allow_hedge(entry):
+            result, ms = primary.result()
+            self._observe(key, ms)
+            return result
+
+        print(f"Hedging {key[0]} request after {delay:.0f} ms")
+        hedge = self.executor.submit(self._attempt, client, kwargs)
+        pending, errors = {primary, hedge}, []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+                for loser in (primary, hedge):
+                    if loser is not future:
+                        self._discard(loser)
+                result, ms = future.result()
+                self._observe(key, ms)
+                if future is hedge:
+                    # The primary took at least this long; leaving it out would drag the delay down
+                    self._observe(key, (time.perf_counter() - started) * 1000)
+                    with self._lock:
+                        self.hedge_wins += 1
+                return result
+        raise errors[0]
+
+    def stats(self):
+        """Return request, hedge and cancellation counters and the current delays."""
+        with self._lock:
+            keys = list(self._latencies)
+            stats = {
+                'enabled': self.enabled,
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_rate': round(self.hedged / self.requests, 4) if self.requests else 0.0,
+                'hedge_wins': self.hedge_wins,
+                'cancelled': self.cancelled,
+                'skipped': self.skipped
+            }
+        stats['delay_ms'] = {
+            f"{model}{' stream' if stream else ''}": round(self.delay_ms((model, stream)), 1)
+            for model, stream in keys
+        }
+        return stats
@@ -0,0 +1,142 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from app.database import get_chat_messages_collection, get_users_collection
+
+# Number of most recent messages offered to the prompt as conversation history
+CHAT_HISTORY_MESSAGES = int(os.environ.get('CHAT_HISTORY_MESSAGES', 30))
+CHAT_HISTORY_PAGE_SIZE = int(os.environ.get('CHAT_HISTORY_PAGE_SIZE', 20))
+CHAT_HISTORY_MAX_PAGE_SIZE = 100
+# Older messages beyond this many per user are deleted (0 keeps everything)
+CHAT_MESSAGES_PER_USER = int(os.environ.get('CHAT_MESSAGES_PER_USER', 1000))
+
+# Only what the prompt and the history endpoint need
+MESSAGE_PROJECTION = {'_id': 0, 'role': 1, 'content': 1, 'ts': 1}
+
+# Loads a user document without the legacy embedded history
+USER_PROJECTION = {'chat_history': 0}
+
+
+_clock_lock = threading.Lock()
+_last_ts = datetime.min
+
+
+def _now():
+    """Return a strictly increasing UTC timestamp with millisecond precision.
+
+    MongoDB stores datetimes in milliseconds; messages saved within the same
+    millisecond would otherwise tie and page in an arbitrary order.
+    """
+    global _last_ts
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    with _clock_lock:
+        _last_ts = max(now, _last_ts + timedelta(milliseconds=1))
+        return _last_ts
+
+
+def append_chat_turn(phone_number, user_message, assistant_response):
+    """
+    Record a completed question/answer pair
+
+    Each message is its own document, so concurrent turns are independent
+    inserts instead of rewrites of a shared array.
+
+    Args:
+        phone_number (str): The user's phone number
+        user_message (str): The question
+        assistant_response (str): The answer
+    """
+    # Both timestamps are taken at save time so turns never interleave
+    asked_at = _now()
+    answered_at = _now()
+    get_chat_messages_collection().insert_many([
+        {'phone_number': phone_number, 'role': 'user', 'content': user_message, 'ts': asked_at},
+        {'phone_number': phone_number, 'role': 'assistant', 'content': assistant_response, 'ts': answered_at}
+    ])
+    trim_chat_history(phone_number)
+
+
+def trim_chat_history(phone_number, keep=None):
+    """
+    Delete a user's messages older than their newest keep messages
+
+    Args:
+        phone_number (str): The user's phone number
+        keep (int, optional): Messages to keep (defaults to CHAT_MESSAGES_PER_USER); 0 keeps everything
+    """
+    keep = CHAT_MESSAGES_PER_USER if keep is None else keep
+    if keep <= 0:
+        return
+    collection = get_chat_messages_collection()
+    # The oldest message to keep, found on the (phone_number, ts) index
+    oldest_kept = list(collection.find(
+        {'phone_number': phone_number}, {'_id': 0, 'ts': 1}, sort=[('ts', -1)], skip=keep - 1, limit=1
+    ))
+    if oldest_kept:
+        collection.delete_many({'phone_number': phone_number, 'ts': {'$lt': oldest_kept[0]['ts']}})
+
+
+def get_chat_history(phone_number, limit=CHAT_HISTORY_PAGE_SIZE, before=None, after=None, oldest_first=False):
+    """
+    Read one page of a user's chat history
+
+    Args:
+        phone_number (str): The user's phone number
+        limit (int): Maximum number of messages
+        before (datetime, optional): Only return messages older than this
+        after (datetime, optional): Only return messages newer than this
+        oldest_first (bool): Page from the oldest matching message instead of the newest
+
+    Returns:
+        list: Messages with role, content and ts, oldest first
+    """
+    query = {'phone_number': phone_number}
+    if before is not None or after is not None:
+        query['ts'] = {}
+        if before is not None:
+            query['ts']['$lt'] = before
+        if after is not None:
+            query['ts']['$gt'] = after
+    messages = list(get_chat_messages_collection().find(
+        query, MESSAGE_PROJECTION, sort=[('ts', 1 if oldest_first else -1)], limit=limit
+    ))
+    return messages if oldest_first else messages[::-1]
+
+
+def load_recent_messages(phone_number, limit=CHAT_HISTORY_MESSAGES, after=None):
+    """Return the user's most recent messages for the prompt, oldest first."""
+    messages = get_chat_history(phone_number, limit=limit, after=after)
+    if not messages and after is None:
+        messages = migrate_legacy_history(phone_number)[-limit:]
+    return [{'role': msg['role'], 'content': msg['content']} for msg in messages]
+
+
+def migrate_legacy_history(phone_number):
+    """
+    Move a chat_history array from the user document into chat_messages
+
+    Returns:
+        list: The migrated messages, oldest first
+    """
+    # Unsetting and reading in one step means only one request migrates
+    user = get_users_collection().find_one_and_update(
+        {'phone_number': phone_number, 'chat_history': {'$exists': True}},
+        {'$unset': {'chat_history': ''}},
+        projection={'chat_history': 1}
+    )
+    legacy = (user or {}).get('chat_history') or []
+    if not legacy:
+        return []
+
+    # Legacy messages carry no timestamps; space them out so their order is kept
+    start = _now() - timedelta(milliseconds=len(legacy))
+    messages = [
+        {'phone_number': phone_number, 'role': msg['role'], 'content': msg['content'],
+         'ts': start + timedelta(milliseconds=i)}
+        for i, msg in enumerate(legacy)
+    ]
+    get_chat_messages_collection().insert_many(messages)
+    print(f"Migrated {len(messages)} chat messages for {phone_number}")
+    return messages
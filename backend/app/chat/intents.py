@@ -0,0 +1,252 @@
+import re
+import threading
+from datetime import date, timedelta
+
+from app.chat.fact_sheet import BUDGET_CATEGORIES
+from app.chat.transaction_index import infer_filters
+
+# Time phrases a templated question may end with
+_PERIOD_RE = re.compile(
+    r"\s+(?P<period>(?:so far )?this (?:month|week|year)|last (?:month|week|year)|today|yesterday"
+    r"|(?:in |over |during )?(?:the )?(?:last|past) \d+ days"
+    r"|(?:in|during) (?:january|february|march|april|may|june|july|august|september|october|november|december))$"
+)
+
+_SPEND_PATTERNS = [
+    re.compile(r"^(?:how much|what) (?:did|have|do) i (?:spend|spent)(?: in total| total| altogether)?"
+               r"(?: (?:on|at|for) (?P<target>.+?))?$"),
+    re.compile(r"^(?:what is |what was )?(?:my )?total (?:spending|spend|spent)(?: (?:on|at|for) (?P<target>.+?))?$"),
+    re.compile(r"^how much (?:money )?(?:went to|did i pay|have i paid) (?:to )?(?P<target>.+?)$")
+]
+
+_BUDGET_PATTERNS = [
+    re.compile(r"^how much (?:do i have |is |have i got )?(?:left|remaining) (?:in|on|for|of) (?:my )?(?P<name>\w+)"
+               r"(?: budget)?(?: this month)?$"),
+    re.compile(r"^(?:what is |how is )?(?:my )?(?P<name>\w+) budget(?: status| left| remaining| looking)?(?: this month)?$"),
+    re.compile(r"^(?:how are |what are |show )?(?:my )?(?P<all>budgets?)(?: status| doing| looking)?(?: this month)?$"),
+    re.compile(r"^how am i doing on (?:my )?(?P<all>budgets?)(?: this month)?$")
+]
+
+_BALANCE_PATTERNS = [
+    re.compile(r"^(?:what is |show |show me |tell me )?(?:my )?(?:current |available |account |bank )*balances?"
+               r"(?: right now| now| today)?$"),
+    re.compile(r"^how much (?:money )?(?:do i have|is there) (?:in my (?:accounts?|bank(?: accounts?)?))?"
+               r"(?: right now| now)?$")
+]
+
+# Depository accounts make up the balance the user usually means
+_CASH_ACCOUNT_TYPES = {'depository'}
+
+
+def normalize(question):
+    """Lowercase a question and strip punctuation that does not change its meaning."""
+    text = question.lower().replace("’", "'")
+    text = re.sub(r"\b(what|how|where|that)'s\b", r"\1 is", text)
+    text = re.sub(r"[?!,;:\"]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip(" .")
+    return re.sub(r"^(?:hey |hi )?(?:finn )?(?:please )?(?:can you tell me |tell me )?", "", text)
+
+
+def _money(value):
+    return f"${value:,.2f}"
+
+
+def _period(text, today):
+    """Split a trailing time phrase off a question and resolve it to dates."""
+    match = _PERIOD_RE.search(text)
+    if not match:
+        return text, None
+    phrase = match.group('period')
+    if phrase == 'today':
+        start = end = today
+    elif phrase == 'yesterday':
+        start = end = today - timedelta(days=1)
+    else:
+        filters = infer_filters(phrase, [], today=today)
+        start, end = filters['start_date'], filters['end_date']
+        if start is None:
+            return text, None
+    return text[:match.start()], (phrase.replace("so far ", ""), start, end)
+
+
+class FastPathMatcher:
+    """
+    Answers templated finance questions from aggregated data without a model call
+
+    Recognizes spending over a period (in total, per category or per
+    merchant), remaining budget and account balance questions. Questions
+    must match a template completely; anything else, including templated
+    questions about unknown categories or merchants, falls through to the
+    model.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.intents = {}
+        self._lock = threading.Lock()
+
+    def answer(self, question, facts, frame, accounts=None, today=None):
+        """
+        Answer a question if it matches a template
+
+        Args:
+            question (str): The user's question
+            facts (dict): Fact sheet from build_fact_sheet
+            frame (callable): Returns the user's TransactionFrame
+            accounts (list, optional): Plaid accounts with balances
+            today (date, optional): Reference date
+
+        Returns:
+            tuple: (intent name, answer text), or None to fall back to the model
+        """
+        today = today or date.today()
+        text = normalize(question)
+
+        result = (
+            self._spending(text, frame, today)
+            or self._budget(text, facts)
+            or self._balance(text, accounts, facts)
+        )
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.intents[result[0]] = self.intents.get(result[0], 0) + 1
+        return result
+
+    def _spending(self, text, frame, today):
+        rest, period = _period(text, today)
+        for pattern in _SPEND_PATTERNS:
+            match = pattern.match(rest)
+            if match:
+                break
+        else:
+            return None
+
+        label, start, end = period or ("this month", today.replace(day=1), today)
+        frame = frame()
+        query = {'start_date': start.isoformat(), 'end_date': end.isoformat()}
+        target = (match.group('target') or "").strip()
+        target = re.sub(r"^(?:my |the )", "", target)
+
+        if target:
+            resolved = self._resolve_target(target, frame)
+            if resolved is None:
+                return None
+            description, filters = resolved
+            query.update(filters)
+        else:
+            description = None
+
+        result = frame.query(**query)
+        dates = f"{start:%b} {start.day} – {end:%b} {end.day}, {end.year}"
+        if not result['count']:
+            subject = f" on {description}" if description else ""
+            return 'spending', f"I don't see any spending{subject} {label} ({dates})."
+
+        subject = f" on {description}" if description else " in total"
+        plural = "s" if result['count'] != 1 else ""
+        return 'spending', (
+            f"You spent {_money(result['total'])}{subject} {label} ({dates}), "
+            f"across {result['count']} transaction{plural}."
+        )
+
+    @staticmethod
+    def _resolve_target(target, frame):
+        """Map the object of a spending question to transaction filters."""
+        if target in BUDGET_CATEGORIES:
+            categories = BUDGET_CATEGORIES[target]
+            return target, {'categories': categories}
+
+        for label in frame.paths:
+            levels = [level.lower() for level in str(label).split(" > ")]
+            if target in levels:
+                return target, {'categories': [target]}
+
+        singular = target[:-1] if target.endswith('s') else target
+        for label in frame.paths:
+            if singular and singular in [level.lower() for level in str(label).split(" > ")]:
+                return target, {'categories': [singular]}
+
+        if any(target in str(merchant).lower() for merchant in frame.merchants):
+            return target.title() if target.islower() else target, {'merchants': [target]}
+        return None
+
+    @staticmethod
+    def _budget(text, facts):
+        for pattern in _BUDGET_PATTERNS:
+            match = pattern.match(text)
+            if match:
+                break
+        else:
+            return None
+
+        budgets = facts.get('budgets') or {}
+        if 'all' in match.groupdict() and match.group('all'):
+            names = list(budgets)
+        else:
+            names = [match.group('name')] if match.group('name') in budgets else []
+        if not names:
+            return None
+
+        lines = []
+        for name in names:
+            status = budgets[name]
+            if status['remaining'] >= 0:
+                position = f"{_money(status['remaining'])} left"
+            else:
+                position = f"{_money(-status['remaining'])} over"
+            used = f", {status['percent_used']:.0f}% used" if status['percent_used'] is not None else ""
+            lines.append(
+                f"{name.capitalize()}: {_money(status['spent'])} of {_money(status['budget'])} spent this month "
+                f"({position}{used}); on pace for about {_money(status['projected'])} by month end."
+            )
+        return 'budget', "\n".join(lines)
+
+    @staticmethod
+    def _balance(text, accounts, facts):
+        if not accounts or not any(pattern.match(text) for pattern in _BALANCE_PATTERNS):
+            return None
+
+        lines, total = [], 0.0
+        for account in accounts:
+            balances = account.get('balances') or {}
+            current = balances.get('current')
+            available = balances.get('available')
+            if current is None and available is None:
+                continue
+            name = account.get('name') or 'Account'
+            if account.get('mask'):
+                name += f" (…{account['mask']})"
+            parts = []
+            if available is not None:
+                parts.append(f"{_money(available)} available")
+            if current is not None:
+                parts.append(f"{_money(current)} current")
+            lines.append(f"- {name}: {', '.join(parts)}")
+            if str(account.get('type')) in _CASH_ACCOUNT_TYPES:
+                total += available if available is not None else current
+        if not lines:
+            return None
+
+        text = "Your account balances:\n" + "\n".join(lines)
+        if total:
+            text += f"\nCash across checking and savings: {_money(total)}."
+            if facts.get('target_balance'):
+                gap = total - facts['target_balance']
+                relation = "above" if gap >= 0 else "below"
+                text += f" That's {_money(abs(gap))} {relation} your {_money(facts['target_balance'])} target."
+        return 'balance', text
+
+    def stats(self):
+        """Return hit and miss counters, per-intent hits and the hit rate."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'intents': dict(self.intents)
+            }
@@ -0,0 +1,212 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from shared.ttl_cache import TTLCache
+
+CHAT_JOB_WORKERS = int(os.environ.get('CHAT_JOB_WORKERS', 4))
+CHAT_JOB_QUEUE_SIZE = int(os.environ.get('CHAT_JOB_QUEUE_SIZE', 100))
+# How long finished jobs can still be polled
+CHAT_JOB_TTL = int(os.environ.get('CHAT_JOB_TTL', 600))
+# Interval for polling job status that is only visible through the shared store
+CHAT_JOB_POLL_INTERVAL = 0.25
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class ChatJobQueue:
+    """
+    Bounded queue of chat jobs processed by a pool of worker threads
+
+    HTTP workers only enqueue a job and return its ID, so the number of
+    slow model calls in flight is set by the worker pool rather than by
+    the web server's concurrency. Job state is kept in process and, when
+    a store is given, mirrored to MongoDB so any API process can answer
+    status polls.
+
+    Args:
+        store (Collection or callable, optional): chat_jobs collection, or a
+            function returning it (or None without MongoDB)
+        workers (int): Number of worker threads
+        maxsize (int): Most jobs waiting to run
+        ttl (int): Seconds a job stays available after it is created
+    """
+
+    def __init__(self, store=None, workers=CHAT_JOB_WORKERS, maxsize=CHAT_JOB_QUEUE_SIZE, ttl=CHAT_JOB_TTL,
+                 clock=time.time):
+        self._store = store
+        self.workers = workers
+        self.ttl = ttl
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.jobs = TTLCache(maxsize=max(maxsize * 10, 1000), ttl=ttl, clock=clock)
+        self._events = {}
+        self._threads = []
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        return self._store() if callable(self._store) else self._store
+
+    def _start_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'chat-job-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, owner, handler, *args):
+        """
+        Enqueue a job
+
+        Args:
+            owner (str): Phone number of the user the job belongs to
+            handler (callable): Called with args on a worker; returns a JSON-serializable dict
+            *args: Arguments for the handler
+
+        Returns:
+            dict: The queued job
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+        """
+        now = datetime.utcnow()
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'owner': owner,
+            'status': QUEUED,
+            'created_at': now,
+            'expires_at': now + timedelta(seconds=self.ttl)
+        }
+        # A worker may take the job as soon as it is queued, so it must be saved first
+        self._events[job['job_id']] = threading.Event()
+        self._save(job)
+        try:
+            self.queue.put_nowait((job['job_id'], handler, args))
+        except queue.Full:
+            self._discard(job['job_id'])
+            raise QueueFullError('Chat queue is full')
+
+        self._start_workers()
+        return job
+
+    def get(self, job_id):
+        """Return a job by ID, or None if it is unknown or expired."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+
+        store = self.store
+        if store is None:
+            return None
+        try:
+            doc = store.find_one({'_id': job_id})
+        except Exception as e:
+            print(f"Error reading chat job {job_id}: {str(e)}")
+            return None
+        if doc is None:
+            return None
+        doc = dict(doc)
+        doc['job_id'] = doc.pop('_id')
+        return doc
+
+    def wait(self, job_id, timeout):
+        """
+        Wait up to timeout seconds for a job to finish
+
+        Returns:
+            dict: The job in its latest state, or None if it is unknown
+        """
+        event = self._events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+            return self.get(job_id)
+
+        # Running in another process; poll the shared store
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] in (QUEUED, RUNNING) and time.monotonic() < deadline:
+            time.sleep(CHAT_JOB_POLL_INTERVAL)
+            job = self.get(job_id)
+        return job
+
+    def run_next(self, timeout=None):
+        """
+        Take one job off the queue and run it
+
+        Returns:
+            bool: Whether a job was run
+        """
+        try:
+            job_id, handler, args = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+
+        try:
+            job = self.get(job_id)
+            if job is None:
+                return True
+            job = {**job, 'status': RUNNING, 'started_at': datetime.utcnow()}
+            self._save(job)
+            try:
+                job.update({'status': DONE, 'result': handler(*args)})
+            except Exception as e:
+                print(f"Error in chat job {job_id}: {str(e)}")
+                job.update({'status': ERROR, 'error': str(e)})
+            job['finished_at'] = datetime.utcnow()
+            self._save(job)
+        finally:
+            event = self._events.pop(job_id, None)
+            if event is not None:
+                event.set()
+            self.queue.task_done()
+        return True
+
+    def _work(self):
+        while True:
+            self.run_next()
+
+    def _discard(self, job_id):
+        """Forget a job that never made it onto the queue."""
+        self._events.pop(job_id, None)
+        self.jobs.invalidate(job_id)
+        store = self.store
+        if store is None:
+            return
+        try:
+            store.delete_one({'_id': job_id})
+        except Exception as e:
+            print(f"Error deleting chat job {job_id}: {str(e)}")
+
+    def _save(self, job):
+        self.jobs.set(job['job_id'], job)
+        store = self.store
+        if store is None:
+            return
+        try:
+            doc = {key: value for key, value in job.items() if key != 'job_id'}
+            store.replace_one({'_id': job['job_id']}, doc, upsert=True)
+        except Exception as e:
+            # Polls served by this process still see the job
+            print(f"Error saving chat job {job['job_id']}: {str(e)}")
+
+
+def job_status(job):
+    """Return the public fields of a job."""
+    status = {'job_id': job['job_id'], 'status': job['status']}
+    if job['status'] == DONE:
+        status.update(job.get('result') or {})
+    elif job['status'] == ERROR:
+        status['error'] = job.get('error')
+    return status
@@ -0,0 +1,147 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.database import get_users_collection
+from app.chat.history import get_chat_history, load_recent_messages
+
+# Messages kept verbatim in the prompt; anything older is folded into the summary
+CHAT_MEMORY_WINDOW = int(os.environ.get('CHAT_MEMORY_WINDOW', 10))
+# Most messages folded into the summary by one update
+CHAT_SUMMARY_BATCH = int(os.environ.get('CHAT_SUMMARY_BATCH', 40))
+CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', 300))
+CHAT_SUMMARY_MODEL = os.environ.get('CHAT_SUMMARY_MODEL', 'gpt-4o-mini')
+CHAT_MEMORY_WORKERS = int(os.environ.get('CHAT_MEMORY_WORKERS', 2))
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain the running memory of a conversation between a user and Finn, a personal "
+    "finance assistant. Merge the new messages into the existing summary. Keep facts the user "
+    "shared, amounts and dates, goals, preferences, advice already given and open questions. "
+    "Drop greetings and small talk. Write plain prose in the third person, at most 200 words."
+)
+
+
+def summarize_conversation(client, previous_summary, messages, model=CHAT_SUMMARY_MODEL):
+    """
+    Fold messages into a running conversation summary
+
+    Args:
+        client (OpenAI): OpenAI client
+        previous_summary (str): The summary so far (may be empty)
+        messages (list): Messages with role and content, oldest first
+        model (str): Model used for summarization
+
+    Returns:
+        str: The updated summary
+    """
+    transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": (
+                f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+            )}
+        ],
+        temperature=0.2,
+        max_tokens=CHAT_SUMMARY_MAX_TOKENS
+    )
+    return response.choices[0].message.content.strip()
+
+
+class ConversationMemory:
+    """
+    Bounded conversation memory: a running summary plus a window of recent messages
+
+    The summary is stored on the user document as ``chat_summary`` together
+    with the timestamp of the last message it covers. After each turn,
+    messages that fall out of the verbatim window are summarized on a
+    background thread, so the response never waits for it.
+
+    Args:
+        summarize (callable): (previous_summary, messages) -> new summary
+        window (int): Number of recent messages kept verbatim
+        batch (int): Most messages folded into the summary per update
+        executor (Executor, optional): Runs updates (defaults to a thread pool)
+    """
+
+    def __init__(self, summarize, window=CHAT_MEMORY_WINDOW, batch=CHAT_SUMMARY_BATCH, executor=None):
+        self.summarize = summarize
+        self.window = window
+        self.batch = batch
+        self.executor = executor or ThreadPoolExecutor(max_workers=CHAT_MEMORY_WORKERS,
+                                                       thread_name_prefix='chat-memory')
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def context(self, phone_number, user):
+        """
+        Return the summary and the verbatim messages for the next prompt
+
+        Messages that left the window but are not summarized yet (the
+        update is running, failed or is catching up) are included too, up
+        to one batch beyond the window, so they are not lost from the prompt.
+
+        Returns:
+            tuple: (summary text or "", unsummarized messages oldest first)
+        """
+        summary = user.get('chat_summary') or {}
+        messages = load_recent_messages(phone_number, limit=self.window + self.batch,
+                                        after=summary.get('through_ts'))
+        return summary.get('text', ''), messages
+
+    def schedule_update(self, phone_number):
+        """Summarize messages that left the window, in the background."""
+        with self._lock:
+            if phone_number in self._in_flight:
+                return
+            self._in_flight.add(phone_number)
+        try:
+            self.executor.submit(self._run_update, phone_number)
+        except RuntimeError as e:
+            # The executor is shutting down
+            print(f"Could not schedule chat summary for {phone_number}: {str(e)}")
+            self._release(phone_number)
+
+    def _run_update(self, phone_number):
+        try:
+            self.update(phone_number)
+        except Exception as e:
+            print(f"Error updating chat summary for {phone_number}: {str(e)}")
+        finally:
+            self._release(phone_number)
+
+    def _release(self, phone_number):
+        with self._lock:
+            self._in_flight.discard(phone_number)
+
+    def update(self, phone_number):
+        """
+        Fold messages older than the window into the stored summary
+
+        Returns:
+            int: Number of messages summarized
+        """
+        users_collection = get_users_collection()
+        user = users_collection.find_one({'phone_number': phone_number}, {'chat_summary': 1}) or {}
+        summary = user.get('chat_summary') or {}
+        through_ts = summary.get('through_ts')
+
+        # The oldest message still in the window marks where summarizing stops
+        recent = get_chat_history(phone_number, limit=self.window, after=through_ts)
+        if len(recent) < self.window:
+            return 0
+        pending = get_chat_history(phone_number, limit=self.batch, before=recent[0]['ts'], after=through_ts,
+                                   oldest_first=True)
+        if not pending:
+            return 0
+
+        text = self.summarize(summary.get('text', ''), pending)
+        users_collection.update_one({'phone_number': phone_number}, {'$set': {'chat_summary': {
+            'text': text,
+            'through_ts': pending[-1]['ts'],
+            'messages': summary.get('messages', 0) + len(pending),
+            'updated_at': datetime.utcnow()
+        }}})
+        return len(pending)
@@ -0,0 +1,207 @@
+import os
+import threading
+
+import tiktoken
+
+# Total prompt size (system prompt + history + question) we aim to stay under
+CHAT_PROMPT_TOKEN_BUDGET = int(os.environ.get('CHAT_PROMPT_TOKEN_BUDGET', 6000))
+
+# Truncation policies
+KEEP = 'keep'            # never truncated
+KEEP_HEAD = 'keep_head'  # drop items from the end (e.g. oldest transactions)
+KEEP_TAIL = 'keep_tail'  # drop items from the start (e.g. oldest chat messages)
+DROP = 'drop'            # removed entirely if it does not fit
+
+# Approximate per-message framing cost of the chat completions format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def _get_encoding(model):
+    """Return the tiktoken encoding for a model, or None if it cannot be loaded."""
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding('o200k_base')
+        except Exception as e:
+            # Encodings are downloaded on first use; fall back to an estimate offline
+            print(f"Could not load tiktoken encoding for {model}, estimating tokens: {str(e)}")
+            encoding = None
+
+        _encodings[model] = encoding
+        return encoding
+
+
+def count_tokens(text, model='gpt-4o-mini'):
+    """Count the tokens in text for the given model."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        # Roughly four characters per token for English text
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class PromptSection:
+    """A named part of the prompt made of items that can be dropped one by one.
+
+    Args:
+        name (str): Section name used in the token report
+        items (list): Strings, or objects rendered to text by text_of
+        priority (int): Lower numbers are more important and truncated last
+        policy (str): One of KEEP, KEEP_HEAD, KEEP_TAIL or DROP
+        separator (str): Joins items when the section is rendered
+        header (str): Text placed before the items, counted with the section
+        text_of (callable): Returns the text of an item (defaults to str)
+        item_overhead (int): Extra tokens charged per item
+    """
+
+    def __init__(self, name, items, priority=0, policy=KEEP, separator="\n", header="",
+                 text_of=str, item_overhead=0):
+        self.name = name
+        self.items = list(items)
+        self.priority = priority
+        self.policy = policy
+        self.separator = separator
+        self.header = header
+        self.text_of = text_of
+        self.item_overhead = item_overhead
+        self.kept = list(self.items)
+
+    @classmethod
+    def from_text(cls, name, text, separator="\n", **kwargs):
+        """Build a section whose items are the separator-delimited parts of text."""
+        items = [part for part in text.split(separator) if part.strip()] if text else []
+        return cls(name, items, separator=separator, **kwargs)
+
+    def render(self):
+        """Render the kept items, including the header."""
+        body = self.separator.join(self.text_of(item) for item in self.kept)
+        if self.header and body:
+            return f"{self.header}{body}"
+        return body
+
+
+class PromptPlan:
+    """The result of fitting sections into a budget."""
+
+    def __init__(self, sections, budget):
+        self.sections = {section.name: section for section in sections}
+        self.budget = budget
+        self.report = {}
+
+    @property
+    def total_tokens(self):
+        return sum(entry['tokens'] for entry in self.report.values())
+
+    def render(self, name):
+        """Render a section by name, or an empty string if it is unknown."""
+        section = self.sections.get(name)
+        return section.render() if section else ""
+
+    def kept(self, name):
+        """Return the kept items of a section by name."""
+        section = self.sections.get(name)
+        return section.kept if section else []
+
+    def summary(self):
+        """Return a compact one-line description of the token report."""
+        parts = [
+            f"{name}={entry['tokens']}" + (f"/{entry['original_tokens']}" if entry['truncated'] else "")
+            for name, entry in self.report.items()
+        ]
+        return f"{self.total_tokens}/{self.budget} tokens ({', '.join(parts)})"
+
+
+def _item_costs(section, counter):
+    separator_cost = counter(section.separator) if len(section.items) > 1 else 0
+    return [counter(section.text_of(item)) + section.item_overhead + separator_cost for item in section.items]
+
+
+def fit_prompt(sections, budget=CHAT_PROMPT_TOKEN_BUDGET, model='gpt-4o-mini', counter=None):
+    """
+    Fit prompt sections into a token budget
+
+    Sections are measured item by item. While the total is over budget, the
+    least important section (highest priority number) that can still shrink
+    is truncated according to its policy. KEEP sections are never touched, so
+    the result can still exceed the budget if they alone are too large.
+
+    Args:
+        sections (list): PromptSection objects
+        budget (int): Maximum number of tokens for all sections combined
+        model (str): Model name used to pick the tokenizer
+        counter (callable, optional): Token counter overriding tiktoken
+
+    Returns:
+        PromptPlan: Kept items per section and a per-section token report
+    """
+    if counter is None:
+        counter = lambda text: count_tokens(text, model)
+
+    costs = {}
+    header_costs = {}
+    for section in sections:
+        costs[section.name] = _item_costs(section, counter)
+        header_costs[section.name] = counter(section.header) if section.items else 0
+
+    original = {name: sum(item_costs) + header_costs[name] for name, item_costs in costs.items()}
+    kept_counts = {section.name: len(section.items) for section in sections}
+
+    def section_tokens(section):
+        count = kept_counts[section.name]
+        if count == 0:
+            return 0
+        item_costs = costs[section.name]
+        kept_costs = item_costs[:count] if section.policy != KEEP_TAIL else item_costs[len(item_costs) - count:]
+        return sum(kept_costs) + header_costs[section.name]
+
+    total = sum(section_tokens(section) for section in sections)
+    overflow = total - budget
+
+    # Least important sections are truncated first
+    for section in sorted(sections, key=lambda s: s.priority, reverse=True):
+        if overflow <= 0:
+            break
+        if section.policy == KEEP or kept_counts[section.name] == 0:
+            continue
+
+        before = section_tokens(section)
+        if section.policy == DROP:
+            kept_counts[section.name] = 0
+        else:
+            item_costs = costs[section.name]
+            removed = 0
+            while kept_counts[section.name] > 0 and overflow - removed > 0:
+                count = kept_counts[section.name]
+                # KEEP_TAIL drops from the front, KEEP_HEAD from the back
+                index = len(item_costs) - count if section.policy == KEEP_TAIL else count - 1
+                removed += item_costs[index]
+                kept_counts[section.name] = count - 1
+        overflow -= before - section_tokens(section)
+
+    plan = PromptPlan(sections, budget)
+    for section in sections:
+        count = kept_counts[section.name]
+        if section.policy == KEEP_TAIL:
+            section.kept = section.items[len(section.items) - count:] if count else []
+        else:
+            section.kept = section.items[:count]
+
+        plan.report[section.name] = {
+            'tokens': section_tokens(section),
+            'original_tokens': original[section.name],
+            'items': count,
+            'original_items': len(section.items),
+            'truncated': count < len(section.items)
+        }
+
+    return plan
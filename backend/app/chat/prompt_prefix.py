@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+
+from shared.ttl_cache import TTLCache
+
+# Token share of the prompt reserved for the stable per-user prefix
+CHAT_PREFIX_TOKEN_BUDGET = int(os.environ.get('CHAT_PREFIX_TOKEN_BUDGET', 4000))
+PROMPT_PREFIX_CACHE_SIZE = int(os.environ.get('PROMPT_PREFIX_CACHE_SIZE', 1024))
+PROMPT_PREFIX_CACHE_TTL = int(os.environ.get('PROMPT_PREFIX_CACHE_TTL', 3600))
+
+
+def compute_data_version(*parts):
+    """
+    Return a short fingerprint of the data a prompt prefix is rendered from
+
+    Args:
+        *parts: JSON-serializable values (transactions, budgets, settings...)
+
+    Returns:
+        str: Hex digest that changes whenever any part changes
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class PromptPrefixCache:
+    """
+    Per-user cache of rendered, versioned prompt prefixes
+
+    OpenAI reuses computation for prompts that start with the same bytes as a
+    recent request. Keeping the stable part of the prompt byte-identical across
+    turns (and only re-rendering it when the user's data version changes) lets
+    multi-turn conversations hit that cache.
+    """
+
+    def __init__(self, maxsize=PROMPT_PREFIX_CACHE_SIZE, ttl=PROMPT_PREFIX_CACHE_TTL):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.renders = 0
+
+    def get(self, user_key, version, render):
+        """
+        Return the prefix for a user, rendering it only if the version changed
+
+        Args:
+            user_key (str): Identifies the user (phone number)
+            version (str): Data version the prefix must match
+            render (callable): Builds the prefix entry when needed
+
+        Returns:
+            dict: The entry returned by render, with its version attached
+        """
+        entry = self.cache.get(user_key)
+        if entry is not None and entry['version'] == version:
+            return entry
+
+        entry = {**render(), 'version': version}
+        self.renders += 1
+        self.cache.set(user_key, entry)
+        return entry
+
+    def invalidate(self, user_key):
+        """Drop the cached prefix for a user."""
+        self.cache.invalidate(user_key)
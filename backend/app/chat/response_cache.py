@@ -0,0 +1,190 @@
+import calendar
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from shared.ttl_cache import TTLCache
+
+CHAT_RESPONSE_CACHE_THRESHOLD = float(os.environ.get('CHAT_RESPONSE_CACHE_THRESHOLD', 0.95))
+CHAT_RESPONSE_CACHE_USERS = int(os.environ.get('CHAT_RESPONSE_CACHE_USERS', 1024))
+CHAT_RESPONSE_CACHE_PER_USER = int(os.environ.get('CHAT_RESPONSE_CACHE_PER_USER', 50))
+CHAT_RESPONSE_CACHE_TTL = int(os.environ.get('CHAT_RESPONSE_CACHE_TTL', 6 * 3600))
+
+# Cache outcomes reported per request
+HIT = 'hit'
+MISS = 'miss'
+BYPASS = 'bypass'
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s$%.]")
+_SPACE_RE = re.compile(r"\s+")
+# Numbers, dates and period words; questions that differ in any of them ask about different data
+_QUALIFIER_RE = re.compile(
+    r"\$?\d+(?:[.,/-]\d+)*%?"
+    r"|\b(?:in|during|for|since) may\b"
+    r"|\b(?:today|yesterday|tonight|week|weekend|month|quarter|year|days?|weeks|months|years"
+    r"|daily|weekly|monthly|quarterly|yearly|annual|this|last|past|next|previous|since|before|after|"
+    + "|".join(name.lower() for name in calendar.month_name if name and name != 'May')
+    + r"|jan|feb|mar|apr|jun|jul|aug|sept?|oct|nov|dec)\b"
+)
+# Questions that lean on the conversation before them
+_FOLLOW_UP_RE = re.compile(
+    r"^(?:and|but|so|also|then|why|how come|what about|how about|same|compared)\b"
+    r"|\b(?:it|its|that|those|these|them|they|the same|above|instead)\b"
+)
+
+
+def normalize_question(question):
+    """Lowercase a question and strip punctuation and extra whitespace."""
+    text = _PUNCTUATION_RE.sub(" ", question.lower())
+    return _SPACE_RE.sub(" ", text).strip(" .")
+
+
+def question_qualifiers(question):
+    """Return the numbers, dates and period words of a question, in order."""
+    return tuple(_QUALIFIER_RE.findall(normalize_question(question)))
+
+
+def is_follow_up(question):
+    """Whether a question only makes sense after the conversation before it."""
+    text = normalize_question(question)
+    return len(text.split()) < 3 or bool(_FOLLOW_UP_RE.search(text))
+
+
+def embed_question(provider, question):
+    """Return the unit-length float32 embedding of a normalized question."""
+    vector = provider.embed([normalize_question(question)])[0].astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _UserResponses:
+    """Cached answers of one user for one (data version, model, settings) key."""
+
+    def __init__(self, key):
+        self.key = key
+        self.questions = []
+        self.qualifiers = []
+        self.responses = []
+        self.matrix = None
+
+    def best(self, vector, qualifiers):
+        """Return the most similar cached question with the same qualifiers, and its score."""
+        candidates = [i for i, cached in enumerate(self.qualifiers) if cached == qualifiers]
+        if self.matrix is None or not candidates:
+            return None, 0.0
+        scores = self.matrix[candidates] @ vector
+        best = int(np.argmax(scores))
+        return candidates[best], float(scores[best])
+
+    def add(self, question, vector, response, limit):
+        self.questions.append(question)
+        self.qualifiers.append(question_qualifiers(question))
+        self.responses.append(response)
+        matrix = vector[None, :] if self.matrix is None else np.vstack([self.matrix, vector])
+        # Oldest answers are dropped first
+        if len(self.responses) > limit:
+            self.questions = self.questions[-limit:]
+            self.qualifiers = self.qualifiers[-limit:]
+            self.responses = self.responses[-limit:]
+            matrix = matrix[-limit:]
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+
+class SemanticResponseCache:
+    """
+    Per-user cache of chat answers looked up by question similarity
+
+    Answers are keyed by the user's data version together with the model and
+    its settings. New transactions or budgets change the data version, so
+    answers computed from older data are discarded on the next lookup rather
+    than served. Within a key, a question is a hit when the cosine similarity
+    of its normalized embedding to a cached question reaches the threshold
+    and both mention the same numbers, dates and periods: "the past 30 days"
+    and "the past 90 days" embed almost alike but ask for different totals.
+
+    Args:
+        provider: Embedding provider with an embed(texts) method
+        threshold (float): Minimum cosine similarity for a hit
+        max_users (int): Most users with cached answers
+        per_user (int): Most cached answers per user
+        ttl (int): Seconds a user's cached answers are kept
+    """
+
+    def __init__(self, provider, threshold=CHAT_RESPONSE_CACHE_THRESHOLD, max_users=CHAT_RESPONSE_CACHE_USERS,
+                 per_user=CHAT_RESPONSE_CACHE_PER_USER, ttl=CHAT_RESPONSE_CACHE_TTL):
+        self.provider = provider
+        self.threshold = threshold
+        self.per_user = per_user
+        self.users = TTLCache(maxsize=max_users, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(data_version, model, settings):
+        """Combine the data version, model and model settings into one key."""
+        return f"{data_version}:{model}:{json.dumps(settings, sort_keys=True, default=str)}"
+
+    def lookup(self, user_key, question, key, vector=None):
+        """
+        Return a cached answer to a similar question, or None
+
+        Args:
+            user_key (str): Identifies the user (phone number)
+            question (str): The user's question
+            key (str): Result of cache_key for the current request
+            vector (np.ndarray, optional): Result of embed_question for the
+                question, if it was already embedded (e.g. for retrieval)
+
+        Returns:
+            tuple: (response or None, embedding of the question for store())
+        """
+        vector = embed_question(self.provider, question) if vector is None else vector
+        with self._lock:
+            entry = self.users.get(user_key)
+            if entry is None or entry.key != key:
+                self.misses += 1
+                return None, vector
+
+            index, score = entry.best(vector, question_qualifiers(question))
+            if index is None or score < self.threshold:
+                self.misses += 1
+                return None, vector
+
+            self.hits += 1
+            print(f"Response cache hit for {user_key} (similarity {score:.3f}): {entry.questions[index]!r}")
+            return entry.responses[index], vector
+
+    def store(self, user_key, question, vector, response, key):
+        """Cache an answer; answers under any other key for the user are dropped."""
+        with self._lock:
+            entry = self.users.get(user_key)
+            if entry is None or entry.key != key:
+                entry = _UserResponses(key)
+                self.users.set(user_key, entry)
+            entry.add(question, vector, response, self.per_user)
+
+    def record_bypass(self):
+        """Count a request that skipped the cache."""
+        with self._lock:
+            self.bypasses += 1
+
+    def invalidate(self, user_key):
+        """Drop all cached answers of a user."""
+        self.users.invalidate(user_key)
+
+    def stats(self):
+        """Return hit, miss and bypass counters and the hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'users': len(self.users)
+            }
@@ -0,0 +1,198 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# Model tiers from fastest to strongest; a user's model setting is the highest tier they get
+CHAT_ROUTER_TIERS = [
+    model.strip() for model in os.environ.get('CHAT_ROUTER_TIERS', 'gpt-4o-mini,gpt-4o').split(',') if model.strip()
+]
+# Target latency of a model call; slower tiers and longer answers are avoided to meet it
+CHAT_LATENCY_SLO_MS = float(os.environ.get('CHAT_LATENCY_SLO_MS', 8000))
+CHAT_ROUTER_MIN_TOKENS = int(os.environ.get('CHAT_ROUTER_MIN_TOKENS', 150))
+CHAT_ROUTER_LOG_SIZE = int(os.environ.get('CHAT_ROUTER_LOG_SIZE', 500))
+
+SIMPLE = 'simple'
+MODERATE = 'moderate'
+COMPLEX = 'complex'
+
+# Answer length allowed per complexity class
+MAX_TOKENS = {SIMPLE: 200, MODERATE: 400, COMPLEX: 700}
+
+# Prior latency model per model: (fixed ms, ms per 1k prompt tokens, ms per output token).
+# Observed latencies scale these per model as requests complete.
+LATENCY_PRIORS = {
+    'gpt-4o-mini': (350, 60, 10),
+    'gpt-4o': (500, 120, 22)
+}
+DEFAULT_LATENCY_PRIOR = (500, 120, 22)
+
+# Weight of the newest observation in the per-model latency scale
+_SCALE_ALPHA = 0.2
+
+_ANALYSIS_RE = re.compile(
+    r"\b(why|explain|compare|comparison|analy[sz]e|analysis|plan|planning|strategy|should i|advice|advise|"
+    r"recommend|forecast|predict|projection|trend|optimi[sz]e|afford|invest|investing|portfolio|save more|"
+    r"cut back|reduce|pay off|debt|retire|retirement)\b"
+)
+_SMALL_TALK_RE = re.compile(r"^(hi|hello|hey|thanks|thank you|ok|okay|cool|great|got it)\b")
+
+
+def classify_message(message, prompt_tokens=0):
+    """
+    Estimate how demanding a question is from its wording and the prompt size
+
+    Args:
+        message (str): The user's question
+        prompt_tokens (int): Size of the assembled prompt
+
+    Returns:
+        tuple: (complexity class, score)
+    """
+    text = message.lower().strip()
+    if _SMALL_TALK_RE.match(text) and len(text.split()) <= 4:
+        return SIMPLE, 0
+
+    words = len(text.split())
+    score = 0
+    score += (words > 25) + (words > 60)
+    score += min(3, len(_ANALYSIS_RE.findall(text)))
+    score += text.count('?') > 1
+    score += prompt_tokens > 3000
+
+    if score == 0:
+        return SIMPLE, score
+    return (MODERATE if score <= 2 else COMPLEX), score
+
+
+class ModelRouter:
+    """
+    Picks a model tier and answer length per chat message
+
+    Messages are classified locally (no model call). Simple questions go to
+    the fastest tier with a short answer budget, complex ones to the
+    strongest tier the user's model setting allows. If the latency expected
+    for that choice exceeds the SLO, the router steps down a tier and then
+    shortens the answer budget. Expected latency comes from per-model
+    priors scaled by the latencies observed so far.
+
+    Args:
+        tiers (list): Models from fastest to strongest
+        slo_ms (float): Target model latency in milliseconds
+        log_size (int): Most recent routing decisions kept for stats
+    """
+
+    def __init__(self, tiers=None, slo_ms=CHAT_LATENCY_SLO_MS, log_size=CHAT_ROUTER_LOG_SIZE, clock=time.time):
+        self.tiers = list(tiers if tiers is not None else CHAT_ROUTER_TIERS)
+        self.slo_ms = slo_ms
+        self.decisions = deque(maxlen=log_size)
+        self._clock = clock
+        self._scales = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def estimate_ms(self, model, prompt_tokens, max_tokens):
+        """Expected latency of a completion with the given prompt and answer size."""
+        fixed, per_1k_prompt, per_output = LATENCY_PRIORS.get(model, DEFAULT_LATENCY_PRIOR)
+        prior = fixed + per_1k_prompt * prompt_tokens / 1000 + per_output * max_tokens
+        with self._lock:
+            return prior * self._scales.get(model, 1.0)
+
+    def route(self, message, prompt_tokens, ceiling):
+        """
+        Choose the model and max_tokens for a message
+
+        Args:
+            message (str): The user's question
+            prompt_tokens (int): Size of the assembled prompt
+            ceiling (str): The user's model setting; never exceeded
+
+        Returns:
+            dict: Routing decision with model, max_tokens and the inputs it was based on
+        """
+        complexity, score = classify_message(message, prompt_tokens)
+        max_tokens = MAX_TOKENS[complexity]
+
+        if ceiling in self.tiers:
+            allowed = self.tiers[:self.tiers.index(ceiling) + 1]
+            wanted = {SIMPLE: 0, MODERATE: (len(allowed) - 1) // 2, COMPLEX: len(allowed) - 1}[complexity]
+            tier = min(wanted, len(allowed) - 1)
+            while tier > 0 and self.estimate_ms(allowed[tier], prompt_tokens, max_tokens) > self.slo_ms:
+                tier -= 1
+            model = allowed[tier]
+        else:
+            # Models outside the tiers are used as configured; only the answer length is routed
+            model = ceiling
+
+        estimated = self.estimate_ms(model, prompt_tokens, max_tokens)
+        if estimated > self.slo_ms:
+            per_token = self.estimate_ms(model, prompt_tokens, max_tokens + 1) - estimated
+            fits = int((self.slo_ms - self.estimate_ms(model, prompt_tokens, 0)) / per_token) if per_token > 0 else 0
+            max_tokens = max(CHAT_ROUTER_MIN_TOKENS, min(max_tokens, fits))
+            estimated = self.estimate_ms(model, prompt_tokens, max_tokens)
+
+        return {
+            'complexity': complexity,
+            'score': score,
+            'ceiling': ceiling,
+            'model': model,
+            'max_tokens': max_tokens,
+            'prompt_tokens': prompt_tokens,
+            'estimated_ms': round(estimated),
+            'slo_ms': self.slo_ms
+        }
+
+    def record(self, decision, observed_ms, completion_tokens):
+        """
+        Record the latency a routed request actually took
+
+        Args:
+            decision (dict): Result of route()
+            observed_ms (float): Time spent in the model call(s)
+            completion_tokens (int): Length of the answer
+        """
+        model = decision['model']
+        fixed, per_1k_prompt, per_output = LATENCY_PRIORS.get(model, DEFAULT_LATENCY_PRIOR)
+        prior = fixed + per_1k_prompt * decision['prompt_tokens'] / 1000 + per_output * completion_tokens
+        ratio = min(max(observed_ms / prior, 0.2), 10.0)
+
+        entry = {
+            **decision,
+            'observed_ms': round(observed_ms),
+            'completion_tokens': completion_tokens,
+            'slo_met': observed_ms <= self.slo_ms,
+            'ts': self._clock()
+        }
+        with self._lock:
+            scale = self._scales.get(model)
+            self._scales[model] = ratio if scale is None else (1 - _SCALE_ALPHA) * scale + _SCALE_ALPHA * ratio
+            totals = self._models.setdefault(model, {'requests': 0, 'total_ms': 0.0, 'slo_misses': 0})
+            totals['requests'] += 1
+            totals['total_ms'] += observed_ms
+            totals['slo_misses'] += not entry['slo_met']
+            self.decisions.append(entry)
+        print(f"Routed {decision['complexity']} message to {model} (max_tokens {decision['max_tokens']}): "
+              f"estimated {decision['estimated_ms']} ms, observed {entry['observed_ms']} ms")
+
+    def stats(self, recent=20):
+        """Return per-model latency totals, complexity counts and the most recent decisions."""
+        with self._lock:
+            complexity = {}
+            for entry in self.decisions:
+                complexity[entry['complexity']] = complexity.get(entry['complexity'], 0) + 1
+            return {
+                'tiers': self.tiers,
+                'slo_ms': self.slo_ms,
+                'models': {
+                    model: {
+                        'requests': totals['requests'],
+                        'mean_ms': round(totals['total_ms'] / totals['requests'], 1),
+                        'slo_miss_rate': round(totals['slo_misses'] / totals['requests'], 4),
+                        'latency_scale': round(self._scales.get(model, 1.0), 3)
+                    }
+                    for model, totals in self._models.items()
+                },
+                'complexity': complexity,
+                'recent': list(self.decisions)[-recent:]
+            }
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.ttl_cache import TTLCache
+
+# Snapshots older than this are served but refreshed in the background
+CHAT_SNAPSHOT_MAX_AGE = int(os.environ.get('CHAT_SNAPSHOT_MAX_AGE', 900))
+# Users who chatted within this window are kept fresh by the periodic refresh
+CHAT_SNAPSHOT_ACTIVE_WINDOW = int(os.environ.get('CHAT_SNAPSHOT_ACTIVE_WINDOW', 24 * 3600))
+CHAT_SNAPSHOT_REFRESH_INTERVAL = int(os.environ.get('CHAT_SNAPSHOT_REFRESH_INTERVAL', 600))
+CHAT_SNAPSHOT_USERS = int(os.environ.get('CHAT_SNAPSHOT_USERS', 1024))
+CHAT_SNAPSHOT_WORKERS = int(os.environ.get('CHAT_SNAPSHOT_WORKERS', 2))
+
+
+class ContextSnapshots:
+    """
+    Per-user snapshots of the upstream data a chat turn is built from
+
+    A snapshot holds what is expensive to fetch (the user's transactions
+    and account balances from Plaid) together with a version of it. Chat
+    turns read the snapshot instead of calling Plaid; snapshots are
+    refreshed on a background thread when a data sync is reported, when
+    they are older than max_age, and periodically for users who chatted
+    recently. Only a user's first turn, or the first after their bank
+    link changed, waits for Plaid.
+
+    Args:
+        load (callable): phone_number -> snapshot dict with a 'version' key,
+            or None if the user has no data to snapshot
+        max_age (int): Seconds after which a served snapshot is refreshed
+        active_window (int): Seconds a user stays in the periodic refresh
+        refresh_interval (int): Seconds between periodic refreshes (0 disables them)
+        maxsize (int): Most users with a snapshot
+        executor (Executor, optional): Runs refreshes (defaults to a thread pool)
+    """
+
+    def __init__(self, load, max_age=CHAT_SNAPSHOT_MAX_AGE, active_window=CHAT_SNAPSHOT_ACTIVE_WINDOW,
+                 refresh_interval=CHAT_SNAPSHOT_REFRESH_INTERVAL, maxsize=CHAT_SNAPSHOT_USERS, executor=None,
+                 clock=time.time):
+        self.load = load
+        self.max_age = max_age
+        self.active_window = active_window
+        self.refresh_interval = refresh_interval
+        self.snapshots = TTLCache(maxsize=maxsize, ttl=active_window, clock=clock)
+        self.executor = executor or ThreadPoolExecutor(max_workers=CHAT_SNAPSHOT_WORKERS,
+                                                       thread_name_prefix='chat-snapshot')
+        self._clock = clock
+        self._active = {}
+        self._in_flight = set()
+        self._refresher = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def get(self, phone_number, is_current=None):
+        """
+        Return the snapshot of a user, loading it on the spot only if there is none
+
+        Args:
+            phone_number (str): The user's phone number
+            is_current (callable, optional): snapshot -> bool; a snapshot it
+                rejects is reloaded before it is used
+
+        Returns:
+            dict: The snapshot, or None if the loader had nothing
+        """
+        now = self._clock()
+        with self._lock:
+            self._active[phone_number] = now
+        self._start_refresher()
+
+        snapshot = self.snapshots.get(phone_number)
+        if snapshot is not None and (is_current is None or is_current(snapshot)):
+            with self._lock:
+                self.hits += 1
+            if now - snapshot['built_at'] >= self.max_age:
+                self.schedule_refresh(phone_number)
+            return snapshot
+
+        with self._lock:
+            self.misses += 1
+        return self.refresh(phone_number)
+
+    def refresh(self, phone_number):
+        """Load and store a fresh snapshot; on failure the previous one is kept."""
+        snapshot = self.load(phone_number)
+        with self._lock:
+            self.refreshes += 1
+        if snapshot is None:
+            self.snapshots.invalidate(phone_number)
+            return None
+        snapshot = {**snapshot, 'built_at': self._clock()}
+        self.snapshots.set(phone_number, snapshot)
+        return snapshot
+
+    def schedule_refresh(self, phone_number):
+        """Refresh a user's snapshot in the background, e.g. after a data sync."""
+        with self._lock:
+            if phone_number in self._in_flight:
+                return
+            self._in_flight.add(phone_number)
+        try:
+            self.executor.submit(self._run_refresh, phone_number)
+        except RuntimeError as e:
+            # The executor is shutting down
+            print(f"Could not schedule chat snapshot refresh for {phone_number}: {str(e)}")
+            self._release(phone_number)
+
+    def _run_refresh(self, phone_number):
+        try:
+            self.refresh(phone_number)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"Error refreshing chat snapshot for {phone_number}: {str(e)}")
+        finally:
+            self._release(phone_number)
+
+    def _release(self, phone_number):
+        with self._lock:
+            self._in_flight.discard(phone_number)
+
+    def active_users(self):
+        """Return users who chatted within the active window, dropping the others."""
+        cutoff = self._clock() - self.active_window
+        with self._lock:
+            self._active = {phone: seen for phone, seen in self._active.items() if seen > cutoff}
+            return list(self._active)
+
+    def refresh_active(self):
+        """Schedule a refresh for every active user."""
+        users = self.active_users()
+        for phone_number in users:
+            self.schedule_refresh(phone_number)
+        return len(users)
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is not None or self.refresh_interval <= 0:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name='chat-snapshot-refresher',
+                                               daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh_active()
+            except Exception as e:
+                print(f"Error in chat snapshot refresher: {str(e)}")
+
+    def invalidate(self, phone_number):
+        """Drop a user's snapshot."""
+        self.snapshots.invalidate(phone_number)
+
+    def stats(self):
+        """Return hit, miss, refresh and error counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'refreshes': self.refreshes,
+                'errors': self.errors,
+                'active_users': len(self._active),
+                'users': len(self.snapshots)
+            }
@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Requests slower than this are logged with their stage breakdown
+CHAT_SLOW_REQUEST_MS = float(os.environ.get('CHAT_SLOW_REQUEST_MS', 5000))
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_METRIC_NAME_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+class StageTimer:
+    """
+    Accumulates the time one request spends in each stage of the chat pipeline
+
+    A stage can be entered several times (one OpenAI call per tool round)
+    and from several threads at once (concurrent tool calls); its time is
+    the sum of all of them, so stages can add up to more than the total.
+
+    Attributes:
+        prompt_tokens (int): Prompt size of the request, when a prompt was built
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._started = clock()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.prompt_tokens = None
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as part of a stage."""
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.add(name, self._clock() - start)
+
+    def add(self, name, seconds):
+        """Add seconds to a stage."""
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total_ms(self):
+        """Milliseconds since the timer was created."""
+        return (self._clock() - self._started) * 1000
+
+    def breakdown(self):
+        """Return milliseconds per stage, in the order the stages were first entered."""
+        with self._lock:
+            return {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()}
+
+    def server_timing(self):
+        """Format the stages and the total as a Server-Timing header value."""
+        metrics = [f"{_METRIC_NAME_RE.sub('_', name)};dur={ms}" for name, ms in self.breakdown().items()]
+        metrics.append(f"total;dur={round(self.total_ms(), 1)}")
+        return ", ".join(metrics)
+
+
+def timed(timer, name):
+    """Return a context manager timing a stage, or a no-op one without a timer."""
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+class LatencyHistograms:
+    """
+    Bucketed latency histograms per route and stage
+
+    Percentiles are estimated as the upper bound of the bucket they fall
+    in, which is enough to see which stage dominates without keeping every
+    sample.
+
+    Args:
+        buckets (tuple): Ascending bucket upper bounds in milliseconds
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, ms):
+        """Record one latency sample."""
+        index = next((i for i, bound in enumerate(self.buckets) if ms <= bound), len(self.buckets))
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = {
+                    'counts': [0] * (len(self.buckets) + 1), 'count': 0, 'sum': 0.0, 'max': 0.0
+                }
+            histogram['counts'][index] += 1
+            histogram['count'] += 1
+            histogram['sum'] += ms
+            histogram['max'] = max(histogram['max'], ms)
+
+    def observe_timer(self, route, timer):
+        """Record the total and every stage of a finished request."""
+        self.observe(f"{route}.total", timer.total_ms())
+        for stage, ms in timer.breakdown().items():
+            self.observe(f"{route}.{stage}", ms)
+
+    def _percentile(self, histogram, fraction):
+        rank = fraction * histogram['count']
+        seen = 0
+        for bound, count in zip(self.buckets, histogram['counts']):
+            seen += count
+            if seen >= rank:
+                return bound
+        return round(histogram['max'], 1)
+
+    def snapshot(self):
+        """Return count, mean, max and p50/p95/p99 per histogram."""
+        with self._lock:
+            return {
+                name: {
+                    'count': histogram['count'],
+                    'mean_ms': round(histogram['sum'] / histogram['count'], 1),
+                    'max_ms': round(histogram['max'], 1),
+                    'p50_ms': self._percentile(histogram, 0.50),
+                    'p95_ms': self._percentile(histogram, 0.95),
+                    'p99_ms': self._percentile(histogram, 0.99)
+                }
+                for name, histogram in sorted(self._histograms.items())
+            }
@@ -0,0 +1,209 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.chat.timing import timed
+
+# Most tool round trips per chat turn before the model must answer
+CHAT_MAX_TOOL_ROUNDS = int(os.environ.get('CHAT_MAX_TOOL_ROUNDS', 3))
+CHAT_TOOL_WORKERS = int(os.environ.get('CHAT_TOOL_WORKERS', 8))
+
+
+class ToolRegistry:
+    """
+    Functions the model can call through OpenAI function calling
+
+    Tools are registered with a JSON schema for their arguments. All tool
+    calls the model makes in one response are executed concurrently, so a
+    turn that needs quotes and news waits for the slowest upstream rather
+    than for the sum of them.
+    """
+
+    def __init__(self, workers=CHAT_TOOL_WORKERS):
+        self.tools = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-tool')
+
+    def tool(self, name, description, parameters=None, with_context=False, stage=None):
+        """
+        Decorator registering a function as a tool
+
+        Args:
+            name (str): Tool name shown to the model
+            description (str): What the tool returns, for the model
+            parameters (dict, optional): JSON schema of the arguments
+            with_context (bool): Pass the per-request context as the first argument
+            stage (str, optional): Timing stage of the tool's calls (defaults to the name)
+        """
+        def register(fn):
+            self.tools[name] = {
+                'fn': fn,
+                'with_context': with_context,
+                'stage': stage or name,
+                'spec': {
+                    'type': 'function',
+                    'function': {
+                        'name': name,
+                        'description': description,
+                        'parameters': parameters or {'type': 'object', 'properties': {}}
+                    }
+                }
+            }
+            return fn
+        return register
+
+    def specs(self):
+        """Return the tool definitions in the chat completions format."""
+        return [tool['spec'] for tool in self.tools.values()]
+
+    def _call(self, name, arguments, context, timer=None):
+        tool = self.tools.get(name)
+        if tool is None:
+            return json.dumps({'error': f'Unknown tool {name}'})
+        try:
+            kwargs = json.loads(arguments) if arguments else {}
+            with timed(timer, tool['stage']):
+                result = tool['fn'](context, **kwargs) if tool['with_context'] else tool['fn'](**kwargs)
+        except Exception as e:
+            # The model sees the error and can answer without the data
+            print(f"Error in chat tool {name}: {str(e)}")
+            return json.dumps({'error': str(e)})
+        return result if isinstance(result, str) else json.dumps(result, default=str)
+
+    def run(self, tool_calls, context=None, timer=None):
+        """
+        Execute tool calls concurrently
+
+        Args:
+            tool_calls (list): Dicts with id, name and arguments (a JSON string)
+            context (optional): Per-request data for tools registered with_context
+            timer (StageTimer, optional): Receives the time spent in each tool's stage
+
+        Returns:
+            list: Tool messages, in the order of the calls
+        """
+        futures = [
+            self.executor.submit(self._call, call['name'], call['arguments'], context, timer)
+            for call in tool_calls
+        ]
+        return [
+            {'role': 'tool', 'tool_call_id': call['id'], 'content': future.result()}
+            for call, future in zip(tool_calls, futures)
+        ]
+
+
+def _assistant_tool_message(content, tool_calls):
+    return {
+        'role': 'assistant',
+        'content': content or None,
+        'tool_calls': [
+            {'id': call['id'], 'type': 'function', 'function': {'name': call['name'], 'arguments': call['arguments']}}
+            for call in tool_calls
+        ]
+    }
+
+
+def complete_with_tools(client, registry, messages, context=None, max_rounds=CHAT_MAX_TOOL_ROUNDS, timer=None,
+                        **kwargs):
+    """
+    Run a chat completion, executing any tool calls the model makes
+
+    Args:
+        client (OpenAI): OpenAI client
+        registry (ToolRegistry): Available tools
+        messages (list): Prompt messages (not modified)
+        context (optional): Per-request data for tools registered with_context
+        max_rounds (int): Most rounds of tool calls
+        timer (StageTimer, optional): Receives the time spent in OpenAI and in tools
+        **kwargs: Passed to chat.completions.create (model, temperature, ...)
+
+    Returns:
+        tuple: (response text, names of the tools that were called)
+    """
+    messages = list(messages)
+    used = []
+    for round_number in range(max_rounds + 1):
+        tool_kwargs = {'tools': registry.specs()} if registry.tools else {}
+        if tool_kwargs and round_number == max_rounds:
+            tool_kwargs['tool_choice'] = 'none'
+
+        with timed(timer, 'openai'):
+            response = client.chat.completions.create(messages=messages, **tool_kwargs, **kwargs)
+        message = response.choices[0].message
+        tool_calls = [
+            {'id': call.id, 'name': call.function.name, 'arguments': call.function.arguments}
+            for call in (getattr(message, 'tool_calls', None) or [])
+        ]
+        if not tool_calls:
+            return message.content, used
+
+        print(f"Model called tools: {', '.join(call['name'] for call in tool_calls)}")
+        used.extend(call['name'] for call in tool_calls)
+        messages.append(_assistant_tool_message(message.content, tool_calls))
+        messages.extend(registry.run(tool_calls, context, timer))
+
+    return message.content or "", used
+
+
+def stream_with_tools(client, registry, messages, used, context=None, max_rounds=CHAT_MAX_TOOL_ROUNDS, timer=None,
+                      **kwargs):
+    """
+    Stream a chat completion, executing any tool calls the model makes
+
+    Text deltas are yielded as they arrive. Tool call deltas are assembled
+    until the stream ends, then the tools run and a new stream continues
+    the answer. With a timer, the time to the first text delta is recorded
+    as the openai_first_token stage and each stream's duration as openai.
+
+    Args:
+        used (list): Receives the names of the tools that were called
+        (other arguments as for complete_with_tools)
+
+    Yields:
+        str: Response text deltas
+    """
+    messages = list(messages)
+    started = time.perf_counter()
+    first_token = True
+    for round_number in range(max_rounds + 1):
+        tool_kwargs = {'tools': registry.specs()} if registry.tools else {}
+        if tool_kwargs and round_number == max_rounds:
+            tool_kwargs['tool_choice'] = 'none'
+
+        round_started = time.perf_counter()
+        stream = client.chat.completions.create(messages=messages, stream=True, **tool_kwargs, **kwargs)
+        content, calls = [], {}
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    if first_token and timer is not None:
+                        timer.add('openai_first_token', time.perf_counter() - started)
+                    first_token = False
+                    content.append(delta.content)
+                    yield delta.content
+                for call in getattr(delta, 'tool_calls', None) or []:
+                    entry = calls.setdefault(call.index, {'id': None, 'name': '', 'arguments': ''})
+                    if call.id:
+                        entry['id'] = call.id
+                    if call.function and call.function.name:
+                        entry['name'] += call.function.name
+                    if call.function and call.function.arguments:
+                        entry['arguments'] += call.function.arguments
+        finally:
+            if timer is not None:
+                timer.add('openai', time.perf_counter() - round_started)
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+
+        if not calls:
+            return
+
+        tool_calls = [calls[index] for index in sorted(calls)]
+        print(f"Model called tools: {', '.join(call['name'] for call in tool_calls)}")
+        used.extend(call['name'] for call in tool_calls)
+        messages.append(_assistant_tool_message("".join(content), tool_calls))
+        messages.extend(registry.run(tool_calls, context, timer))
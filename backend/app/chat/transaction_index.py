@@ -0,0 +1,331 @@
+import calendar
+import os
+import re
+import threading
+import zlib
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from shared.ttl_cache import TTLCache
+
+EMBEDDING_PROVIDER = os.environ.get('EMBEDDING_PROVIDER', 'openai')
+EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'text-embedding-3-small')
+TRANSACTION_INDEX_USERS = int(os.environ.get('TRANSACTION_INDEX_USERS', 256))
+TRANSACTION_INDEX_TTL = int(os.environ.get('TRANSACTION_INDEX_TTL', 24 * 3600))
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+
+
+def transaction_text(tx):
+    """Return the text a transaction is embedded from."""
+    category = tx.get('category') or ['Uncategorized']
+    return f"{tx.get('name', '')} | {', '.join(category)} | ${tx.get('amount', 0):.2f} | {tx.get('date', '')}"
+
+
+def transaction_key(tx):
+    """Return the key a transaction is indexed under."""
+    return tx.get('transaction_id') or transaction_text(tx)
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+class HashingEmbeddingProvider:
+    """
+    Deterministic local embeddings built by hashing words and character trigrams
+
+    Needs no network or model download, which makes it suitable for tests and
+    offline development. Similarity is lexical rather than semantic.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _features(self, text):
+        for word in _WORD_RE.findall(text.lower()):
+            yield word
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def embed(self, texts):
+        """Return a float32 matrix with one row per text."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        return vectors
+
+
+class OpenAIEmbeddingProvider:
+    """Embeddings from the OpenAI embeddings endpoint."""
+
+    def __init__(self, client, model=EMBEDDING_MODEL, batch_size=256):
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        """Return a float32 matrix with one row per text."""
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            rows.extend(item.embedding for item in response.data)
+        return np.asarray(rows, dtype=np.float32)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class TransactionIndex:
+    """
+    Embedding index over one user's transactions
+
+    Vectors are L2-normalized and kept in a single contiguous float32 matrix,
+    so cosine similarity against a query is one matrix-vector product. Dates and
+    primary categories are kept in parallel arrays for prefiltering.
+    """
+
+    def __init__(self):
+        self.transactions = []
+        self.matrix = None
+        self.dates = np.array([], dtype='datetime64[D]')
+        self.categories = np.array([], dtype=object)
+        self._positions = {}
+        self._lock = threading.Lock()
+        # Version of the transactions last synced into the index
+        self.version = None
+
+    def __len__(self):
+        return len(self.transactions)
+
+    def add(self, transactions, provider):
+        """
+        Embed and add transactions that are not indexed yet
+
+        Returns:
+            int: Number of newly embedded transactions
+        """
+        with self._lock:
+            return self._add(transactions, provider)
+
+    def sync(self, transactions, provider, version=None):
+        """
+        Make the index hold exactly the given transactions
+
+        Indexed transactions that are no longer among them (removed by the
+        bank, or re-issued under a new ID once they posted) are dropped and
+        new ones are embedded. An index already synced to version is left as is.
+
+        Returns:
+            int: Number of newly embedded transactions
+        """
+        with self._lock:
+            if version is not None and version == self.version:
+                return 0
+            current = {transaction_key(tx) for tx in transactions}
+            keep = [i for i, tx in enumerate(self.transactions) if transaction_key(tx) in current]
+            if len(keep) < len(self.transactions):
+                self._keep(keep)
+            added = self._add(transactions, provider)
+            self.version = version
+            return added
+
+    def _keep(self, positions):
+        """Drop every row but the ones at positions."""
+        rows = np.array(positions, dtype=int)
+        self.transactions = [self.transactions[i] for i in positions]
+        self.matrix = np.ascontiguousarray(self.matrix[rows], dtype=np.float32) if positions else None
+        self.dates = self.dates[rows]
+        self.categories = self.categories[rows]
+        self._positions = {transaction_key(tx): i for i, tx in enumerate(self.transactions)}
+
+    def _add(self, transactions, provider):
+        """Embed and append transactions that are not indexed yet."""
+        new, new_ids = [], {}
+        for tx in transactions:
+            tx_id = transaction_key(tx)
+            if tx_id not in self._positions and tx_id not in new_ids:
+                new_ids[tx_id] = len(self.transactions) + len(new)
+                new.append(tx)
+        if not new:
+            return 0
+
+        vectors = _normalize(provider.embed([transaction_text(tx) for tx in new]).astype(np.float32))
+        self._positions.update(new_ids)
+        matrix = vectors if self.matrix is None else np.vstack([self.matrix, vectors])
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.dates = np.concatenate([
+            self.dates, np.array([_to_date(tx['date']) for tx in new], dtype='datetime64[D]')
+        ])
+        self.categories = np.concatenate([
+            self.categories, np.array([(tx.get('category') or ['Uncategorized'])[0] for tx in new], dtype=object)
+        ])
+        self.transactions.extend(new)
+        return len(new)
+
+    def search(self, query_vector, k=20, start_date=None, end_date=None, categories=None, exclude_ids=None):
+        """
+        Return the k transactions most similar to the query vector
+
+        Args:
+            query_vector (np.ndarray): Embedding of the question
+            k (int): Maximum number of results
+            start_date (date, optional): Only include transactions on or after this date
+            end_date (date, optional): Only include transactions on or before this date
+            categories (list, optional): Only include these primary categories
+            exclude_ids (set, optional): Transaction IDs to leave out
+
+        Returns:
+            list: (transaction, score) pairs, most similar first
+        """
+        with self._lock:
+            if self.matrix is None or not len(self.transactions):
+                return []
+
+            mask = np.ones(len(self.transactions), dtype=bool)
+            if start_date is not None:
+                mask &= self.dates >= np.datetime64(start_date, 'D')
+            if end_date is not None:
+                mask &= self.dates <= np.datetime64(end_date, 'D')
+            if categories:
+                mask &= np.isin(self.categories, list(categories))
+            if exclude_ids:
+                for tx_id in exclude_ids:
+                    position = self._positions.get(tx_id)
+                    if position is not None:
+                        mask[position] = False
+
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+
+            query = query_vector.astype(np.float32).ravel()
+            norm = np.linalg.norm(query)
+            if norm:
+                query = query / norm
+            scores = self.matrix[candidates] @ query
+
+            k = min(k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.transactions[candidates[i]], float(scores[i])) for i in top]
+
+
+def infer_filters(question, known_categories, today=None):
+    """
+    Derive date and category prefilters from the wording of a question
+
+    Recognizes phrases such as "this month", "last week", "past 30 days",
+    "this year" or a month name, and any known primary category mentioned.
+
+    Returns:
+        dict: start_date, end_date and categories (each may be None)
+    """
+    today = today or date.today()
+    text = question.lower()
+    start_date = end_date = None
+
+    days_match = re.search(r"(?:last|past)\s+(\d+)\s+days?", text)
+    if days_match:
+        start_date, end_date = today - timedelta(days=int(days_match.group(1))), today
+    elif "this month" in text:
+        start_date, end_date = today.replace(day=1), today
+    elif "last month" in text:
+        end_date = today.replace(day=1) - timedelta(days=1)
+        start_date = end_date.replace(day=1)
+    elif "this week" in text:
+        start_date, end_date = today - timedelta(days=today.weekday()), today
+    elif "last week" in text:
+        end_date = today - timedelta(days=today.weekday() + 1)
+        start_date = end_date - timedelta(days=6)
+    elif "this year" in text:
+        start_date, end_date = today.replace(month=1, day=1), today
+    elif "last year" in text:
+        start_date, end_date = date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    else:
+        month_match = re.search(r"\b(?:in|during|for)\s+(" + "|".join(_MONTHS) + r")\b", text)
+        if month_match:
+            month = _MONTHS[month_match.group(1)]
+            year = today.year if month <= today.month else today.year - 1
+            start_date = date(year, month, 1)
+            end_date = date(year, month, calendar.monthrange(year, month)[1])
+
+    words = set(_WORD_RE.findall(text))
+    categories = [
+        category for category in known_categories
+        if words & set(_WORD_RE.findall(category.lower())) - {'and', 'of', 'the'}
+    ]
+
+    return {'start_date': start_date, 'end_date': end_date, 'categories': categories or None}
+
+
+class TransactionRetriever:
+    """Keeps a bounded set of per-user transaction indexes and queries them."""
+
+    def __init__(self, provider, max_users=TRANSACTION_INDEX_USERS, ttl=TRANSACTION_INDEX_TTL):
+        self.provider = provider
+        self.indexes = TTLCache(maxsize=max_users, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def index_for(self, user_key):
+        """Return the index for a user, creating an empty one if needed."""
+        with self._lock:
+            index = self.indexes.get(user_key)
+            if index is None:
+                index = TransactionIndex()
+                self.indexes.set(user_key, index)
+            return index
+
+    def ingest(self, user_key, transactions, version=None):
+        """
+        Sync the user's index to their current transactions
+
+        Args:
+            user_key (str): The user
+            transactions (list): All of the user's current transactions
+            version (optional): Version of the transactions; an index already
+                at this version is not touched
+
+        Returns:
+            int: Number of newly embedded transactions
+        """
+        return self.index_for(user_key).sync(transactions, self.provider, version=version)
+
+    def retrieve(self, user_key, question, k=20, exclude_ids=None, today=None, query_vector=None):
+        """
+        Return the user's transactions most relevant to a question
+
+        Date and category filters inferred from the question are applied
+        first; if nothing matches them, the search falls back to all
+        transactions. Pass query_vector if the question is already embedded.
+        """
+        index = self.index_for(user_key)
+        if not len(index):
+            return []
+
+        if query_vector is None:
+            query_vector = self.provider.embed([question])[0]
+        filters = infer_filters(question, set(index.categories.tolist()), today=today)
+        results = index.search(query_vector, k=k, exclude_ids=exclude_ids, **filters)
+        if not results and (filters['start_date'] or filters['categories']):
+            results = index.search(query_vector, k=k, exclude_ids=exclude_ids)
+        return [tx for tx, _ in results]
+
+
+def create_embedding_provider(openai_client=None):
+    """Build the embedding provider selected by EMBEDDING_PROVIDER."""
+    if EMBEDDING_PROVIDER == 'openai' and openai_client is not None:
+        return OpenAIEmbeddingProvider(openai_client)
+    return HashingEmbeddingProvider()
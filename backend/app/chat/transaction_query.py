@@ -0,0 +1,194 @@
+from datetime import datetime
+
+import numpy as np
+
+GROUP_BY = ('category', 'subcategory', 'merchant', 'month', 'week', 'day')
+AGGREGATES = ('sum', 'count', 'avg', 'min', 'max')
+KINDS = ('spending', 'income', 'net')
+MAX_GROUPS = 25
+MAX_ROWS = 20
+
+# JSON schema of the query arguments, as exposed to the model
+QUERY_PARAMETERS = {
+    'type': 'object',
+    'properties': {
+        'start_date': {'type': 'string', 'description': "Earliest date, YYYY-MM-DD (inclusive)"},
+        'end_date': {'type': 'string', 'description': "Latest date, YYYY-MM-DD (inclusive)"},
+        'categories': {'type': 'array', 'items': {'type': 'string'},
+                       'description': "Only these categories (case-insensitive, matches any level, e.g. 'Restaurants')"},
+        'merchants': {'type': 'array', 'items': {'type': 'string'},
+                      'description': "Only merchants whose name contains one of these strings (case-insensitive)"},
+        'min_amount': {'type': 'number', 'description': "Smallest absolute amount"},
+        'max_amount': {'type': 'number', 'description': "Largest absolute amount"},
+        'kind': {'type': 'string', 'enum': list(KINDS),
+                 'description': "spending (default), income, or net (spending minus income)"},
+        'group_by': {'type': 'string', 'enum': list(GROUP_BY), 'description': "Break the result down by this field"},
+        'aggregate': {'type': 'string', 'enum': list(AGGREGATES), 'description': "Aggregate per group (default sum)"},
+        'limit': {'type': 'integer', 'description': f"Most groups to return, largest first (default 10, max {MAX_GROUPS})"},
+        'include_transactions': {'type': 'integer',
+                                 'description': f"Also return up to this many matching transactions, largest first (max {MAX_ROWS})"}
+    }
+}
+
+
+def _parse_date(value, name):
+    try:
+        return np.datetime64(datetime.strptime(value, '%Y-%m-%d').date(), 'D')
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+
+
+class TransactionFrame:
+    """
+    Column-oriented copy of a user's transactions for local queries
+
+    Text columns are dictionary-encoded: each distinct merchant and category
+    is stored once and rows hold integer codes, so filters on text are
+    evaluated per distinct value and then broadcast to rows.
+    """
+
+    def __init__(self, transactions):
+        self.size = len(transactions)
+        self.dates = np.array([str(tx['date'])[:10] for tx in transactions], dtype='datetime64[D]')
+        self.amounts = np.array([float(tx['amount']) for tx in transactions], dtype=np.float64)
+        categories = [tx.get('category') or ['Uncategorized'] for tx in transactions]
+        self.primary, self.primary_codes = self._encode([category[0] for category in categories])
+        self.paths, self.path_codes = self._encode([" > ".join(category) for category in categories])
+        self.merchants, self.merchant_codes = self._encode([tx.get('name') or 'Unknown' for tx in transactions])
+
+    @staticmethod
+    def _encode(values):
+        labels, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+        return labels, codes.astype(np.int64)
+
+    def _match(self, labels, codes, needles, exact=False):
+        needles = [needle.lower().strip() for needle in needles if needle and needle.strip()]
+        if not needles:
+            return np.ones(self.size, dtype=bool)
+        lowered = [label.lower() for label in labels]
+        if exact:
+            hits = np.array([any(needle in label.split(" > ") for needle in needles) for label in lowered], dtype=bool)
+        else:
+            hits = np.array([any(needle in label for needle in needles) for label in lowered], dtype=bool)
+        return hits[codes] if len(hits) else np.zeros(self.size, dtype=bool)
+
+    def _group_keys(self, group_by):
+        if group_by == 'category':
+            return self.primary_codes, self.primary.astype(str)
+        if group_by == 'subcategory':
+            return self.path_codes, self.paths.astype(str)
+        if group_by == 'merchant':
+            return self.merchant_codes, self.merchants.astype(str)
+
+        if group_by == 'month':
+            buckets = self.dates.astype('datetime64[M]')
+        elif group_by == 'week':
+            # Weeks start on Monday; day 0 of the epoch was a Thursday
+            days = self.dates.astype(np.int64)
+            buckets = (days - (days + 3) % 7).astype('datetime64[D]')
+        else:
+            buckets = self.dates
+        labels, codes = np.unique(buckets, return_inverse=True)
+        return codes, labels.astype(str)
+
+    def query(self, start_date=None, end_date=None, categories=None, merchants=None, min_amount=None,
+              max_amount=None, kind='spending', group_by=None, aggregate='sum', limit=10, include_transactions=0):
+        """
+        Filter, group and aggregate transactions
+
+        Amounts follow Plaid: positive is money spent, negative is money
+        received. Spending sums positive amounts, income sums the size of
+        negative amounts and net sums spending minus income.
+
+        Returns:
+            dict: Compact result with totals, optional groups and transactions
+        """
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        if group_by is not None and group_by not in GROUP_BY:
+            raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {', '.join(AGGREGATES)}")
+
+        mask = np.ones(self.size, dtype=bool)
+        if start_date:
+            mask &= self.dates >= _parse_date(start_date, 'start_date')
+        if end_date:
+            mask &= self.dates <= _parse_date(end_date, 'end_date')
+        if categories:
+            mask &= self._match(self.paths, self.path_codes, categories, exact=True)
+        if merchants:
+            mask &= self._match(self.merchants, self.merchant_codes, merchants)
+        if min_amount is not None:
+            mask &= np.abs(self.amounts) >= float(min_amount)
+        if max_amount is not None:
+            mask &= np.abs(self.amounts) <= float(max_amount)
+
+        if kind == 'spending':
+            mask &= self.amounts > 0
+            values = self.amounts
+        elif kind == 'income':
+            mask &= self.amounts < 0
+            values = -self.amounts
+        else:
+            values = self.amounts
+
+        selected = np.flatnonzero(mask)
+        result = {
+            'kind': kind,
+            'count': int(len(selected)),
+            'total': round(float(values[selected].sum()), 2)
+        }
+        if len(selected):
+            result['first_date'] = str(self.dates[selected].min())
+            result['last_date'] = str(self.dates[selected].max())
+
+        if group_by and len(selected):
+            result['group_columns'] = [group_by, aggregate, 'count']
+            result['groups'], result['other_groups'] = self._aggregate(
+                selected, values, group_by, aggregate, max(1, min(int(limit), MAX_GROUPS))
+            )
+
+        rows = max(0, min(int(include_transactions or 0), MAX_ROWS))
+        if rows and len(selected):
+            result['transaction_columns'] = ['date', 'merchant', 'amount', 'category']
+            top = selected[np.argsort(-np.abs(values[selected]), kind='stable')[:rows]]
+            result['transactions'] = [
+                [str(self.dates[i]), str(self.merchants[self.merchant_codes[i]]), round(float(self.amounts[i]), 2),
+                 str(self.paths[self.path_codes[i]])]
+                for i in top
+            ]
+        return result
+
+    def _aggregate(self, selected, values, group_by, aggregate, limit):
+        codes, labels = self._group_keys(group_by)
+        group_codes = codes[selected]
+        group_values = values[selected]
+        size = len(labels)
+
+        counts = np.bincount(group_codes, minlength=size)
+        if aggregate in ('sum', 'avg'):
+            totals = np.bincount(group_codes, weights=group_values, minlength=size)
+            stats = totals / np.maximum(counts, 1) if aggregate == 'avg' else totals
+        elif aggregate == 'count':
+            stats = counts.astype(np.float64)
+        elif aggregate == 'max':
+            stats = np.full(size, -np.inf)
+            np.maximum.at(stats, group_codes, group_values)
+        else:
+            stats = np.full(size, np.inf)
+            np.minimum.at(stats, group_codes, group_values)
+
+        present = np.flatnonzero(counts)
+        if group_by in ('month', 'week', 'day'):
+            # Time buckets read best in order
+            order = present[-limit:]
+        else:
+            order = present[np.argsort(-stats[present], kind='stable')][:limit]
+
+        groups = [
+            [str(labels[code]), int(stats[code]) if aggregate == 'count' else round(float(stats[code]), 2),
+             int(counts[code])]
+            for code in order
+        ]
+        return groups, int(len(present) - len(order))
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.ttl_cache import TTLCache
+
+# A user whose context was warmed this recently is not warmed again
+CHAT_WARM_TTL = int(os.environ.get('CHAT_WARM_TTL', 300))
+CHAT_WARM_USERS = int(os.environ.get('CHAT_WARM_USERS', 1024))
+CHAT_WARM_WORKERS = int(os.environ.get('CHAT_WARM_WORKERS', 2))
+
+WARM = 'warm'
+WARMING = 'warming'
+
+
+class ContextWarmer:
+    """
+    Loads a user's chat context in the background before their first message
+
+    Warming the same user again while a warm-up is running, or within ttl
+    seconds of the last one, does nothing, so clients can call it whenever
+    the chat page is opened.
+
+    Args:
+        warm (callable): key -> None; loads everything a chat turn needs
+        ttl (int): Seconds a finished warm-up counts as current
+        maxsize (int): Most users remembered as warm
+        executor (Executor, optional): Runs warm-ups (defaults to a thread pool)
+    """
+
+    def __init__(self, warm, ttl=CHAT_WARM_TTL, maxsize=CHAT_WARM_USERS, executor=None, clock=time.time):
+        self.warm = warm
+        self.warmed = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self.executor = executor or ThreadPoolExecutor(max_workers=CHAT_WARM_WORKERS, thread_name_prefix='chat-warm')
+        self._clock = clock
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.started = 0
+        self.errors = 0
+
+    def request(self, key, *args):
+        """
+        Start a warm-up unless one is running or finished recently
+
+        Args:
+            key (str): The user to warm
+            *args: Passed to warm after the key
+
+        Returns:
+            str: WARM if the context was warmed recently, otherwise WARMING
+        """
+        with self._lock:
+            self.requests += 1
+            if key in self._in_flight:
+                return WARMING
+            if self.warmed.get(key) is not None:
+                return WARM
+            self._in_flight.add(key)
+            self.started += 1
+        try:
+            self.executor.submit(self._run, key, *args)
+        except RuntimeError as e:
+            # The executor is shutting down
+            print(f"Could not schedule chat warm-up for {key}: {str(e)}")
+            self._release(key)
+        return WARMING
+
+    def _run(self, key, *args):
+        try:
+            self.warm(key, *args)
+            self.warmed.set(key, self._clock())
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"Error warming chat context for {key}: {str(e)}")
+        finally:
+            self._release(key)
+
+    def _release(self, key):
+        with self._lock:
+            self._in_flight.discard(key)
+
+    def invalidate(self, key):
+        """Forget that a user was warmed, e.g. after their data changed."""
+        self.warmed.invalidate(key)
+
+    def stats(self):
+        """Return request, warm-up and error counters."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'started': self.started,
+                'errors': self.errors,
+                'in_flight': len(self._in_flight),
+                'warm_users': len(self.warmed)
+            }
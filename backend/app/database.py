@@ -36,6 +36,13 @@ def init_db(app: Flask) -> None:
         
         # Create indexes if needed
         db.users.create_index("phone_number", unique=True)
+        # Shared news cache entries are removed by MongoDB once they expire
+        db.news_cache.create_index("expires_at", expireAfterSeconds=0)
+        # Chat history is read newest first, one user at a time, and trimmed to
+        # CHAT_MESSAGES_PER_USER per user as turns are added
+        db.chat_messages.create_index([("phone_number", 1), ("ts", -1)])
+        # Finished chat jobs are only kept long enough to be polled
+        db.chat_jobs.create_index("expires_at", expireAfterSeconds=0)
         
     except Exception as e:
         app.logger.error(f"Failed to connect to MongoDB: {e}")
@@ -50,16 +57,46 @@ def get_users_collection() -> Collection:
         # Return a simple in-memory implementation if MongoDB is not available
         return SimpleUsersCollection()
 
+def get_news_cache_collection():
+    """Get the shared news cache collection, or None without MongoDB."""
+    if db is not None:
+        return db.news_cache
+    # The in-process cache still applies; there is just nothing to share with
+    return None
+
+def get_chat_jobs_collection():
+    """Get the chat jobs collection, or None without MongoDB."""
+    if db is not None:
+        return db.chat_jobs
+    # Jobs are then only visible to the process that queued them
+    return None
+
+def get_chat_messages_collection():
+    """Get the chat messages collection."""
+    if db is not None:
+        return db.chat_messages
+    return SimpleChatMessagesCollection()
+
+def _project(document, projection):
+    """Apply a MongoDB-style inclusion or exclusion projection to a document."""
+    if not projection:
+        return document
+    if any(projection.values()):
+        return {key: value for key, value in document.items() if projection.get(key)}
+    return {key: value for key, value in document.items() if key not in projection}
+
 # Simple in-memory storage as fallback
 users_db = {}
+chat_messages_db = {}
 
 class SimpleUsersCollection:
     """A simple in-memory collection for users."""
     
-    def find_one(self, query):
+    def find_one(self, query, projection=None):
         """Find a user by phone number."""
         if 'phone_number' in query:
-            return users_db.get(query['phone_number'])
+            user = users_db.get(query['phone_number'])
+            return _project(user, projection) if user is not None else None
         return None
     
     def insert_one(self, document):
@@ -77,9 +114,58 @@ class SimpleUsersCollection:
                 if '$set' in update:
                     for key, value in update['$set'].items():
                         users_db[phone_number][key] = value
+                if '$unset' in update:
+                    for key in update['$unset']:
+                        users_db[phone_number].pop(key, None)
                 return True
         return False
     
+    def find_one_and_update(self, query, update, projection=None):
+        """Update a user document and return it as it was before the update."""
+        user = users_db.get(query.get('phone_number'))
+        if user is None:
+            return None
+        for key, condition in query.items():
+            if isinstance(condition, dict) and '$exists' in condition and (key in user) != condition['$exists']:
+                return None
+        before = _project(dict(user), projection)
+        self.update_one({'phone_number': query['phone_number']}, update)
+        return before
+    
     def count_documents(self, query):
         """Count documents."""
-        return len(users_db) 
\ No newline at end of file
+        return len(users_db)
+
+class SimpleChatMessagesCollection:
+    """A simple in-memory collection for chat messages."""
+    
+    def insert_many(self, documents):
+        """Append messages to their users' histories."""
+        for document in documents:
+            chat_messages_db.setdefault(document['phone_number'], []).append(dict(document))
+        return True
+    
+    def find(self, query, projection=None, sort=None, limit=0, skip=0):
+        """Find a user's messages, optionally within a ts range ($gt/$lt)."""
+        messages = chat_messages_db.get(query.get('phone_number'), [])
+        before = query.get('ts', {}).get('$lt')
+        if before is not None:
+            messages = [message for message in messages if message['ts'] < before]
+        after = query.get('ts', {}).get('$gt')
+        if after is not None:
+            messages = [message for message in messages if message['ts'] > after]
+        messages = sorted(messages, key=lambda message: message['ts'])
+        if sort and sort[0][1] < 0:
+            # Ties keep insertion order, newest last, as with an index scan
+            messages = messages[::-1]
+        messages = messages[skip:]
+        if limit:
+            messages = messages[:limit]
+        return [_project(message, projection) for message in messages]
+    
+    def delete_many(self, query):
+        """Delete a user's messages older than query['ts']['$lt']."""
+        before = query['ts']['$lt']
+        messages = chat_messages_db.get(query.get('phone_number'), [])
+        chat_messages_db[query.get('phone_number')] = [message for message in messages if message['ts'] >= before]
+        return True
@@ -1,6 +1,10 @@
 import os
+import sys
 from dotenv import load_dotenv
 
+# Make the shared backend helpers importable when running from this directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 # Load environment variables from .env file
 load_dotenv()
 
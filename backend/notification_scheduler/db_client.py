@@ -8,6 +8,8 @@ class DatabaseClient:
         self.client = MongoClient(MONGODB_URI)
         self.db = self.client['finn_ai']
         self.collection = self.db['users']
+        # Shared with the API so news fetched by either process is reused
+        self.news_cache = self.db['news_cache']
     
     def get_users_for_notification(self, reference_time=None):
         """
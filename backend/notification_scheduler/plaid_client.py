@@ -3,15 +3,23 @@ from plaid.api import plaid_api
 from plaid.model.transactions_get_request import TransactionsGetRequest
 from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
 from datetime import datetime, timedelta
-import requests
-import time
 from config import PLAID_CLIENT_ID, PLAID_SECRET, PLAID_ENV, NEWS_API_KEY, ALPHA_VANTAGE_API_KEY
+from shared.market_data import MarketDataClient
+from shared.news import NewsClient, dedupe_articles
+from shared.prompt_fragments import PromptFragmentCache, format_news_for_prompt, format_stock_performance
+from shared.watchlist import user_tickers
 import logging
 
 logger = logging.getLogger("notification_scheduler")
 
+# Quotes and daily series are cached for the lifetime of the scheduler process,
+# so users notified in the same minute share the same upstream fetches
+market_data = MarketDataClient(ALPHA_VANTAGE_API_KEY)
+# Rendered market and news prompt text, built once per tick for every user with the same tickers
+prompt_fragments = PromptFragmentCache()
+
 class PlaidClient:
-    def __init__(self):
+    def __init__(self, news_store=None):
         # Configure Plaid client
         configuration = plaid.Configuration(
             host=self._get_plaid_host(),
@@ -22,6 +30,9 @@ class PlaidClient:
         )
         api_client = plaid.ApiClient(configuration)
         self.client = plaid_api.PlaidApi(api_client)
+        
+        # News is cached per query, optionally shared with the API via MongoDB
+        self.news_client = NewsClient(NEWS_API_KEY, store=news_store)
     
     def _get_plaid_host(self):
         """Get the appropriate Plaid API host based on environment"""
@@ -126,19 +137,29 @@ class PlaidClient:
             "transactions": transactions
         }
     
-    def fetch_ticker_list(self, user_id=None):
+    def fetch_ticker_list(self, user):
         """
         Fetch the list of tickers to track
         
         Args:
-            user_id (str): User ID to fetch tickers for (not used currently)
+            user (dict): User document
             
         Returns:
-            list: List of ticker symbols
+            list: Ticker symbols on the user's watchlist
+        """
+        return user_tickers(user)
+    
+    def prefetch_market_data(self, tickers, news_limit=2):
         """
-        # In a real implementation, this would fetch from the database
-        # For now, return a default list
-        return ['AMD', 'TSLA', 'NVDA', 'META']
+        Warm the market data and news caches once per distinct ticker
+        
+        Args:
+            tickers (list): Distinct ticker symbols across the users about to be notified
+            news_limit (int): Articles per ticker, as requested for each user
+        """
+        market_data.fetch_stock_performance(tickers)
+        for ticker in tickers:
+            self.news_client.fetch_news_for_ticker(ticker, limit=news_limit)
     
     def fetch_stock_performance(self, tickers):
         """
@@ -150,71 +171,7 @@ class PlaidClient:
         Returns:
             dict: Performance data for each ticker
         """
-        try:
-            performance_data = {}
-            
-            for ticker in tickers:
-                # Use Alpha Vantage's Global Quote API to get current stock data
-                url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={ticker}&apikey={ALPHA_VANTAGE_API_KEY}"
-                response = requests.get(url)
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(0.5)
-                
-                data = response.json()
-                
-                if "Global Quote" not in data or not data["Global Quote"]:
-                    performance_data[ticker] = {
-                        "error": f"No data available for {ticker}"
-                    }
-                    continue
-                
-                quote = data["Global Quote"]
-                
-                # Extract current price and change
-                current_price = float(quote.get("05. price", 0))
-                change_percent = float(quote.get("10. change percent", "0%").replace("%", ""))
-                
-                # Get weekly high/low from the daily adjusted API
-                weekly_url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY_ADJUSTED&symbol={ticker}&outputsize=compact&apikey={ALPHA_VANTAGE_API_KEY}"
-                weekly_response = requests.get(weekly_url)
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(0.5)
-                
-                weekly_data = weekly_response.json()
-                
-                # Extract weekly high/low if available
-                weekly_high = current_price
-                weekly_low = current_price
-                weekly_volume = 0
-                
-                if "Time Series (Daily)" in weekly_data:
-                    # Get the last 5 trading days (approximately a week)
-                    time_series = weekly_data["Time Series (Daily)"]
-                    dates = list(time_series.keys())[:5]  # Last 5 trading days
-                    
-                    if dates:
-                        highs = [float(time_series[date]["2. high"]) for date in dates]
-                        lows = [float(time_series[date]["3. low"]) for date in dates]
-                        volumes = [int(float(time_series[date]["6. volume"])) for date in dates]
-                        
-                        weekly_high = max(highs)
-                        weekly_low = min(lows)
-                        weekly_volume = sum(volumes) // len(volumes)  # Average volume
-                
-                performance_data[ticker] = {
-                    "current_price": round(current_price, 2),
-                    "percent_change": round(change_percent, 2),
-                    "high": round(weekly_high, 2),
-                    "low": round(weekly_low, 2),
-                    "volume_avg": weekly_volume
-                }
-                
-            return performance_data
-        except Exception as e:
-            logger.error(f"Error fetching stock performance: {str(e)}")
-            return {}
+        return market_data.fetch_stock_performance(tickers)
     
     def fetch_market_indices(self):
         """
@@ -223,41 +180,7 @@ class PlaidClient:
         Returns:
             dict: Performance data for major market indices
         """
-        indices = {
-            'SPY': 'S&P 500',
-            'DIA': 'Dow Jones',
-            'QQQ': 'NASDAQ',
-            'IWM': 'Russell 2000'
-        }
-        
-        try:
-            indices_data = {}
-            
-            for symbol, name in indices.items():
-                url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={ALPHA_VANTAGE_API_KEY}"
-                response = requests.get(url)
-                
-                # Add a small delay to avoid rate limiting
-                time.sleep(0.5)
-                
-                data = response.json()
-                
-                if "Global Quote" not in data or not data["Global Quote"]:
-                    continue
-                    
-                quote = data["Global Quote"]
-                current_price = float(quote.get("05. price", 0))
-                change_percent = float(quote.get("10. change percent", "0%").replace("%", ""))
-                
-                indices_data[name] = {
-                    "current_price": round(current_price, 2),
-                    "percent_change": round(change_percent, 2)
-                }
-                
-            return indices_data
-        except Exception as e:
-            logger.error(f"Error fetching market indices: {str(e)}")
-            return {}
+        return market_data.fetch_market_indices()
     
     def fetch_news_for_ticker(self, ticker, limit=2):
         """
@@ -270,34 +193,7 @@ class PlaidClient:
         Returns:
             list: List of news articles
         """
-        try:
-            if not NEWS_API_KEY:
-                logger.warning("NEWS_API_KEY not set, skipping news fetch")
-                return []
-                
-            url = f"https://newsapi.org/v2/everything?q={ticker}+stock&sortBy=publishedAt&pageSize={limit}&apiKey={NEWS_API_KEY}"
-            response = requests.get(url)
-            data = response.json()
-            
-            if response.status_code != 200 or data.get('status') != 'ok':
-                logger.error(f"Error fetching news for {ticker}: {data.get('message', 'Unknown error')}")
-                return []
-            
-            articles = data.get('articles', [])
-            return [
-                {
-                    'title': article.get('title'),
-                    'description': article.get('description'),
-                    'content': article.get('content'),
-                    'source': article.get('source', {}).get('name'),
-                    'published_at': article.get('publishedAt'),
-                    'url': article.get('url')
-                }
-                for article in articles[:limit]
-            ]
-        except Exception as e:
-            logger.error(f"Exception fetching news for {ticker}: {str(e)}")
-            return []
+        return self.news_client.fetch_news_for_ticker(ticker, limit=limit)
     
     def fetch_market_news(self, limit=4):
         """
@@ -309,31 +205,49 @@ class PlaidClient:
         Returns:
             list: List of news articles
         """
-        try:
-            if not NEWS_API_KEY:
-                logger.warning("NEWS_API_KEY not set, skipping market news fetch")
-                return []
-                
-            url = f"https://newsapi.org/v2/top-headlines?category=business&country=us&pageSize={limit}&apiKey={NEWS_API_KEY}"
-            response = requests.get(url)
-            data = response.json()
+        return self.news_client.fetch_market_news(limit=limit)
+    
+    def market_fragment(self, tickers):
+        """
+        Render the weekly stock performance of the tickers and the market indices
+        
+        Args:
+            tickers (list): Ticker symbols on the user's watchlist
             
-            if response.status_code != 200 or data.get('status') != 'ok':
-                logger.error(f"Error fetching market news: {data.get('message', 'Unknown error')}")
-                return []
+        Returns:
+            str: Prompt text, shared by all users with the same tickers in the same
+                tick; empty when no performance data could be fetched
+        """
+        def render():
+            performance = market_data.fetch_stock_performance(tickers)
+            if not performance:
+                return "", False
+            indices = market_data.fetch_market_indices()
+            complete = bool(performance) and bool(indices) and not any("error" in data for data in performance.values())
+            return format_stock_performance(performance, indices), complete
+        
+        return prompt_fragments.get('performance+indices', tickers, render)
+    
+    def news_fragment(self, tickers, market_limit=2, ticker_limit=2):
+        """
+        Render market headlines and news for the tickers, without repeating articles
+        
+        Args:
+            tickers (list): Ticker symbols on the user's watchlist
+            market_limit (int): Market headlines to include
+            ticker_limit (int): Articles per ticker
             
-            articles = data.get('articles', [])
-            return [
-                {
-                    'title': article.get('title'),
-                    'description': article.get('description'),
-                    'content': article.get('content'),
-                    'source': article.get('source', {}).get('name'),
-                    'published_at': article.get('publishedAt'),
-                    'url': article.get('url')
-                }
-                for article in articles[:limit]
-            ]
-        except Exception as e:
-            logger.error(f"Exception fetching market news: {str(e)}")
-            return [] 
\ No newline at end of file
+        Returns:
+            str: Prompt text, shared by all users with the same tickers in the same tick
+        """
+        def render():
+            market_news = self.news_client.fetch_market_news(limit=market_limit)
+            # Skip ticker articles that already appear in the market headlines
+            seen_articles = {article['id'] for article in market_news}
+            ticker_news = {
+                ticker: dedupe_articles(self.news_client.fetch_news_for_ticker(ticker, limit=ticker_limit), seen_articles)
+                for ticker in sorted(set(tickers))
+            }
+            return format_news_for_prompt(ticker_news, market_news), bool(market_news)
+        
+        return prompt_fragments.get(f'news:{market_limit}:{ticker_limit}', tickers, render)
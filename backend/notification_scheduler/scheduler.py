@@ -8,6 +8,7 @@ from db_client import DatabaseClient
 from plaid_client import PlaidClient
 from telegram_client import TelegramClient
 from config import CHANNEL_ID
+from shared.watchlist import build_ticker_index
 
 # Configure logging
 logging.basicConfig(
@@ -35,7 +36,7 @@ def round_to_nearest_minute(dt):
 class NotificationScheduler:
     def __init__(self):
         self.db_client = DatabaseClient()
-        self.plaid_client = PlaidClient()
+        self.plaid_client = PlaidClient(news_store=self.db_client.news_cache)
         self.telegram_client = TelegramClient()
     
     def check_notifications(self):
@@ -57,6 +58,15 @@ class NotificationScheduler:
             
             logger.info(f"Found {len(users)} users scheduled for notifications")
             
+            # Fetch market data once per distinct ticker rather than once per user
+            ticker_index = build_ticker_index(users, key="_id")
+            logger.info(f"Prefetching market data for {len(ticker_index)} distinct tickers")
+            try:
+                self.plaid_client.prefetch_market_data(list(ticker_index))
+            except Exception as e:
+                # Each user's summary fetches what it still needs
+                logger.error(f"Error prefetching market data: {str(e)}")
+            
             # Process each user
             for user in users:
                 self.process_user_notification(user)
@@ -98,26 +108,14 @@ class NotificationScheduler:
             
             # Fetch stock portfolio data
             logger.info("Fetching stock portfolio data")
-            tickers = self.plaid_client.fetch_ticker_list(user_id)
-            
-            # Fetch stock performance data
-            stock_performance = self.plaid_client.fetch_stock_performance(tickers)
-            market_indices = self.plaid_client.fetch_market_indices()
-            
-            # Add stock data to summary
-            summary["stock_performance"] = stock_performance
-            summary["market_indices"] = market_indices
-            
-            # Fetch news articles
-            ticker_news = {}
-            for ticker in tickers:
-                ticker_news[ticker] = self.plaid_client.fetch_news_for_ticker(ticker.strip())
-            
-            market_news = self.plaid_client.fetch_market_news(limit=2)  # Limit to 2 articles for brevity
-            
-            # Add news to summary
-            summary["ticker_news"] = ticker_news
-            summary["market_news"] = market_news
+            tickers = self.plaid_client.fetch_ticker_list(user)
+            
+            # Market and news text is rendered once per tick for everyone with the same tickers
+            if tickers:
+                summary["market_fragment"] = self.plaid_client.market_fragment(tickers)
+            summary["news_fragment"] = self.plaid_client.news_fragment(
+                [ticker.strip() for ticker in tickers], market_limit=2  # Limit to 2 articles for brevity
+            )
             
             # Format message
             message = self.telegram_client.format_transaction_summary(user_name, summary)
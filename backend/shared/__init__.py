@@ -0,0 +1,6 @@
+"""
+Helpers shared by the Flask API and the notification scheduler.
+
+Modules in this package must not depend on Flask so that the scheduler,
+which runs as a separate process, can import them as well.
+"""
@@ -0,0 +1,217 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import requests
+
+from shared.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ALPHA_VANTAGE_URL = os.environ.get('ALPHA_VANTAGE_URL', "https://www.alphavantage.co/query")
+
+# Major market indices tracked through their ETFs
+MARKET_INDICES = {
+    'SPY': 'S&P 500',
+    'DIA': 'Dow Jones',
+    'QQQ': 'NASDAQ',
+    'IWM': 'Russell 2000'
+}
+
+# Cache tuning, overridable from the environment
+QUOTE_CACHE_TTL = int(os.environ.get('QUOTE_CACHE_TTL', 300))
+QUOTE_CACHE_SIZE = int(os.environ.get('QUOTE_CACHE_SIZE', 256))
+DAILY_SERIES_CACHE_SIZE = int(os.environ.get('DAILY_SERIES_CACHE_SIZE', 128))
+
+MARKET_TIMEZONE = ZoneInfo('America/New_York')
+# Daily bars are published a little after the 16:00 close
+MARKET_CLOSE_HOUR = 16
+MARKET_CLOSE_MINUTE = 15
+
+
+def next_market_close(now=None):
+    """
+    Get the next time the daily series for US equities rolls over
+
+    Args:
+        now (datetime, optional): Reference time (defaults to the current time)
+
+    Returns:
+        datetime: Timezone-aware datetime of the next weekday close
+    """
+    if now is None:
+        now = datetime.now(MARKET_TIMEZONE)
+    elif now.tzinfo is None:
+        now = now.replace(tzinfo=MARKET_TIMEZONE)
+    else:
+        now = now.astimezone(MARKET_TIMEZONE)
+
+    close = now.replace(hour=MARKET_CLOSE_HOUR, minute=MARKET_CLOSE_MINUTE, second=0, microsecond=0)
+    if close <= now:
+        close += timedelta(days=1)
+    # Skip Saturday (5) and Sunday (6)
+    while close.weekday() >= 5:
+        close += timedelta(days=1)
+    return close
+
+
+class MarketDataClient:
+    """
+    Alpha Vantage client with shared quote and daily-series caches
+
+    Quotes are cached for a short TTL. Daily series only change once per
+    trading day, so they are cached until the next market close. Both caches
+    are LRU-bounded and collapse concurrent misses for the same symbol into a
+    single upstream request.
+    """
+
+    def __init__(self, api_key, quote_ttl=QUOTE_CACHE_TTL, quote_cache_size=QUOTE_CACHE_SIZE,
+                 series_cache_size=DAILY_SERIES_CACHE_SIZE, request_delay=0.5, session=None,
+                 clock=time.time):
+        self.api_key = api_key
+        self.request_delay = request_delay
+        self.session = session or requests
+        self._clock = clock
+        self.quotes = TTLCache(maxsize=quote_cache_size, ttl=quote_ttl, clock=clock)
+        self.daily_series = TTLCache(maxsize=series_cache_size, clock=clock)
+
+    def _query(self, params):
+        """Call the Alpha Vantage query endpoint and return the JSON body."""
+        response = self.session.get(ALPHA_VANTAGE_URL, params={**params, 'apikey': self.api_key})
+
+        # Add a small delay to avoid rate limiting
+        if self.request_delay:
+            time.sleep(self.request_delay)
+
+        return response.json()
+
+    def _load_quote(self, symbol):
+        data = self._query({'function': 'GLOBAL_QUOTE', 'symbol': symbol})
+        quote = data.get("Global Quote")
+        if not quote:
+            # Rate-limit notes and unknown symbols are not cached
+            logger.warning(f"No quote returned for {symbol}: {data.get('Note') or data.get('Information') or 'empty response'}")
+            return None
+
+        return {
+            "current_price": float(quote.get("05. price", 0)),
+            "change_percent": float(quote.get("10. change percent", "0%").replace("%", ""))
+        }
+
+    def _load_daily_series(self, symbol):
+        data = self._query({'function': 'TIME_SERIES_DAILY_ADJUSTED', 'symbol': symbol, 'outputsize': 'compact'})
+        return data.get("Time Series (Daily)") or None
+
+    def _series_expiry(self):
+        return next_market_close(datetime.fromtimestamp(self._clock(), MARKET_TIMEZONE)).timestamp()
+
+    def get_quote(self, symbol):
+        """
+        Get the latest quote for a symbol
+
+        Returns:
+            dict: current_price and change_percent, or None if unavailable
+        """
+        return self.quotes.get_or_load(symbol, lambda: self._load_quote(symbol))
+
+    def get_daily_series(self, symbol):
+        """
+        Get the compact daily time series for a symbol, keyed by date
+
+        Returns:
+            dict: Alpha Vantage daily bars, or None if unavailable
+        """
+        return self.daily_series.get_or_load(
+            symbol,
+            lambda: self._load_daily_series(symbol),
+            expires_at=self._series_expiry
+        )
+
+    def fetch_stock_performance(self, tickers):
+        """
+        Fetch stock performance data for the given tickers
+
+        Args:
+            tickers (list): List of ticker symbols
+
+        Returns:
+            dict: Performance data for each ticker
+        """
+        try:
+            performance_data = {}
+
+            for ticker in tickers:
+                quote = self.get_quote(ticker)
+                if not quote:
+                    performance_data[ticker] = {
+                        "error": f"No data available for {ticker}"
+                    }
+                    continue
+
+                current_price = quote["current_price"]
+
+                # Extract weekly high/low if available
+                weekly_high = current_price
+                weekly_low = current_price
+                weekly_volume = 0
+
+                time_series = self.get_daily_series(ticker)
+                if time_series:
+                    # Get the last 5 trading days (approximately a week)
+                    dates = list(time_series.keys())[:5]
+
+                    if dates:
+                        highs = [float(time_series[date]["2. high"]) for date in dates]
+                        lows = [float(time_series[date]["3. low"]) for date in dates]
+                        volumes = [int(float(time_series[date]["6. volume"])) for date in dates]
+
+                        weekly_high = max(highs)
+                        weekly_low = min(lows)
+                        weekly_volume = sum(volumes) // len(volumes)  # Average volume
+
+                performance_data[ticker] = {
+                    "current_price": round(current_price, 2),
+                    "percent_change": round(quote["change_percent"], 2),
+                    "high": round(weekly_high, 2),
+                    "low": round(weekly_low, 2),
+                    "volume_avg": weekly_volume
+                }
+
+            return performance_data
+        except Exception as e:
+            logger.error(f"Error fetching stock performance: {str(e)}")
+            return {}
+
+    def fetch_market_indices(self):
+        """
+        Fetch performance data for major market indices
+
+        Returns:
+            dict: Performance data keyed by index name
+        """
+        try:
+            indices_data = {}
+
+            for symbol, name in MARKET_INDICES.items():
+                quote = self.get_quote(symbol)
+                if not quote:
+                    continue
+
+                indices_data[name] = {
+                    "current_price": round(quote["current_price"], 2),
+                    "percent_change": round(quote["change_percent"], 2)
+                }
+
+            return indices_data
+        except Exception as e:
+            logger.error(f"Error fetching market indices: {str(e)}")
+            return {}
+
+    def cache_stats(self):
+        """Return hit/miss counters for both caches."""
+        return {
+            'quotes': self.quotes.stats(),
+            'daily_series': self.daily_series.stats()
+        }
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from shared.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+NEWS_API_URL = os.environ.get('NEWS_API_URL', "https://newsapi.org/v2")
+
+# Headlines move on a scale of minutes; ticker searches a little slower
+TICKER_NEWS_CACHE_TTL = int(os.environ.get('TICKER_NEWS_CACHE_TTL', 900))
+MARKET_NEWS_CACHE_TTL = int(os.environ.get('MARKET_NEWS_CACHE_TTL', 300))
+NEWS_CACHE_SIZE = int(os.environ.get('NEWS_CACHE_SIZE', 512))
+
+
+def article_key(article):
+    """Return a stable hash identifying an article by URL, or by title if it has none."""
+    identity = article.get('url') or ' '.join((article.get('title') or '').lower().split())
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+def dedupe_articles(articles, seen=None):
+    """
+    Drop repeated articles, keeping the first occurrence
+
+    Args:
+        articles (list): Normalized article dicts
+        seen (set, optional): Keys already used elsewhere; updated in place
+
+    Returns:
+        list: Articles whose key was not seen before
+    """
+    if seen is None:
+        seen = set()
+
+    unique = []
+    for article in articles:
+        key = article.get('id') or article_key(article)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(article)
+    return unique
+
+
+def _normalize_article(article):
+    normalized = {
+        'title': article.get('title'),
+        'description': article.get('description'),
+        'content': article.get('content'),
+        'source': (article.get('source') or {}).get('name'),
+        'published_at': article.get('publishedAt'),
+        'url': article.get('url')
+    }
+    normalized['id'] = article_key(normalized)
+    return normalized
+
+
+class NewsClient:
+    """
+    NewsAPI client with a two-level cache keyed by query
+
+    The first level is an in-process LRU/TTL cache, so a hit is a dict lookup.
+    The second level is an optional shared store (a MongoDB collection with a
+    TTL index on ``expires_at``) that lets the API workers and the scheduler
+    reuse each other's results.
+
+    Args:
+        api_key (str): NewsAPI key
+        store: Collection-like object, or a callable returning one (or None)
+    """
+
+    def __init__(self, api_key, store=None, ticker_ttl=TICKER_NEWS_CACHE_TTL,
+                 market_ttl=MARKET_NEWS_CACHE_TTL, cache_size=NEWS_CACHE_SIZE,
+                 session=None, clock=time.time):
+        self.api_key = api_key
+        self.store = store
+        self.ticker_ttl = ticker_ttl
+        self.market_ttl = market_ttl
+        self.session = session or requests
+        self._clock = clock
+        self.cache = TTLCache(maxsize=cache_size, ttl=market_ttl, clock=clock)
+
+    def _get_store(self):
+        return self.store() if callable(self.store) else self.store
+
+    def _read_store(self, key):
+        store = self._get_store()
+        if store is None:
+            return None
+
+        try:
+            doc = store.find_one({'_id': key})
+        except Exception as e:
+            logger.warning(f"News cache read failed for {key}: {str(e)}")
+            return None
+
+        if not doc:
+            return None
+        expires_at = doc['expires_at']
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at.timestamp() <= self._clock():
+            return None
+        return doc['articles'], expires_at.timestamp()
+
+    def _write_store(self, key, articles, expires_at):
+        store = self._get_store()
+        if store is None:
+            return
+
+        try:
+            store.update_one(
+                {'_id': key},
+                {'$set': {
+                    'articles': articles,
+                    'fetched_at': datetime.fromtimestamp(self._clock(), timezone.utc),
+                    'expires_at': datetime.fromtimestamp(expires_at, timezone.utc)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"News cache write failed for {key}: {str(e)}")
+
+    def _fetch(self, endpoint, params, limit):
+        response = self.session.get(f"{NEWS_API_URL}/{endpoint}", params={**params, 'apiKey': self.api_key})
+        data = response.json()
+
+        if response.status_code != 200 or data.get('status') != 'ok':
+            logger.error(f"Error fetching news from {endpoint}: {data.get('message', 'Unknown error')}")
+            return None
+
+        articles = [_normalize_article(article) for article in data.get('articles', [])]
+        return dedupe_articles(articles)[:limit]
+
+    def _get_articles(self, key, endpoint, params, limit, ttl):
+        if not self.api_key:
+            logger.warning("NEWS_API_KEY not set, skipping news fetch")
+            return []
+
+        # Entries loaded from the shared store keep the store's expiry
+        expiry = {}
+
+        def load():
+            stored = self._read_store(key)
+            if stored is not None:
+                articles, expiry['at'] = stored
+                return articles
+
+            articles = self._fetch(endpoint, params, limit)
+            if articles is not None:
+                expiry['at'] = self._clock() + ttl
+                self._write_store(key, articles, expiry['at'])
+            return articles
+
+        try:
+            return self.cache.get_or_load(key, load, expires_at=lambda: expiry.get('at')) or []
+        except Exception as e:
+            logger.error(f"Exception fetching news for {key}: {str(e)}")
+            return []
+
+    def fetch_news_for_ticker(self, ticker, limit=2):
+        """
+        Fetch news articles for a specific ticker
+
+        Args:
+            ticker (str): Ticker symbol
+            limit (int): Maximum number of articles to return
+
+        Returns:
+            list: List of news articles
+        """
+        ticker = ticker.strip().upper()
+        return self._get_articles(
+            f"ticker:{ticker}:{limit}",
+            'everything',
+            {'q': f"{ticker} stock", 'sortBy': 'publishedAt', 'pageSize': limit},
+            limit,
+            self.ticker_ttl
+        )
+
+    def fetch_market_news(self, limit=4):
+        """
+        Fetch general market news
+
+        Args:
+            limit (int): Maximum number of articles to return
+
+        Returns:
+            list: List of news articles
+        """
+        return self._get_articles(
+            f"market:business:us:{limit}",
+            'top-headlines',
+            {'category': 'business', 'country': 'us', 'pageSize': limit},
+            limit,
+            self.market_ttl
+        )
@@ -0,0 +1,125 @@
+import os
+import time
+
+from shared.market_data import QUOTE_CACHE_TTL
+from shared.ttl_cache import TTLCache
+
+# Rendered fragments are rebuilt once per tick; by default as often as quotes expire
+PROMPT_FRAGMENT_TICK = int(os.environ.get('PROMPT_FRAGMENT_TICK', QUOTE_CACHE_TTL))
+PROMPT_FRAGMENT_CACHE_SIZE = int(os.environ.get('PROMPT_FRAGMENT_CACHE_SIZE', 512))
+
+
+def format_stock_performance(performance_data, indices_data):
+    """Format stock performance data for inclusion in a prompt."""
+    prompt_text = "Weekly Stock Performance:\n\n"
+
+    # Add market indices
+    if indices_data:
+        prompt_text += "Market Indices:\n"
+        for index_name, data in indices_data.items():
+            change_symbol = "↑" if data["percent_change"] >= 0 else "↓"
+            prompt_text += f"{index_name}: {data['current_price']} ({change_symbol}{abs(data['percent_change'])}%)\n"
+        prompt_text += "\n"
+
+    # Add individual stocks
+    if performance_data:
+        prompt_text += "Portfolio Stocks:\n"
+        for ticker, data in performance_data.items():
+            if "error" in data:
+                prompt_text += f"{ticker}: {data['error']}\n"
+                continue
+
+            change_symbol = "↑" if data["percent_change"] >= 0 else "↓"
+            prompt_text += f"{ticker}: ${data['current_price']} ({change_symbol}{abs(data['percent_change'])}%)\n"
+            prompt_text += f"  Weekly Range: ${data['low']} - ${data['high']}\n"
+            prompt_text += f"  Average Volume: {data['volume_avg']:,}\n"
+
+    return prompt_text
+
+
+def format_news_for_prompt(ticker_news, market_news):
+    """Format news articles for inclusion in a prompt."""
+    prompt_text = "Recent Market News:\n\n"
+
+    # Add market news
+    if market_news:
+        for i, article in enumerate(market_news, 1):
+            prompt_text += f"{i}. {article['title']} - {article['source']}\n"
+            if article.get('description'):
+                prompt_text += f"   {article['description']}\n"
+            if article.get('content'):
+                content = article.get('content', '')
+                # Some APIs limit content with a character count and "[+chars]" suffix
+                if "[+" in content:
+                    content = content.split("[+")[0]
+                prompt_text += f"   Content: {content}\n"
+            prompt_text += f"   Published: {article['published_at']}\n\n"
+    else:
+        prompt_text += "No recent market news available.\n\n"
+
+    # Add ticker-specific news
+    if ticker_news:
+        prompt_text += "Recent Stock News:\n"
+        for ticker, articles in ticker_news.items():
+            if articles:
+                prompt_text += f"\n{ticker} News:\n"
+                for i, article in enumerate(articles, 1):
+                    prompt_text += f"{i}. {article['title']} - {article['source']}\n"
+                    if article.get('description'):
+                        prompt_text += f"   {article['description']}\n"
+                    prompt_text += f"   Published: {article['published_at']}\n\n"
+
+    return prompt_text
+
+
+class PromptFragmentCache:
+    """
+    Rendered market and news prompt text shared by all users
+
+    Quotes, indices and news are the same for everyone following the same
+    tickers, so their rendered text is cached by (kind, data version,
+    ticker set) and spliced into prompts as is. The data version is the
+    current tick unless the caller passes one: within a tick a fragment is
+    fetched and rendered once, however many users ask for it.
+
+    Args:
+        tick (int): Seconds per data version
+        maxsize (int): Most fragments kept
+    """
+
+    def __init__(self, tick=PROMPT_FRAGMENT_TICK, maxsize=PROMPT_FRAGMENT_CACHE_SIZE, clock=time.time):
+        self.tick = tick
+        self.fragments = TTLCache(maxsize=maxsize, ttl=tick, clock=clock)
+        self._clock = clock
+
+    def data_version(self):
+        """Return the current tick."""
+        return int(self._clock() // self.tick)
+
+    def get(self, kind, tickers, render, version=None):
+        """
+        Return a rendered fragment, rendering it only once per version and ticker set
+
+        Args:
+            kind (str): What the fragment holds, including any options (e.g. 'news:2')
+            tickers (list): Tickers the fragment covers (order does not matter)
+            render (callable): () -> (text, complete); incomplete text (an
+                upstream failed) is returned but not cached
+            version (optional): Data version; defaults to the current tick
+
+        Returns:
+            str: The rendered fragment
+        """
+        tick = self.data_version()
+        key = f"{kind}:{tick if version is None else version}:{','.join(sorted(set(tickers)))}"
+        # Incomplete text is handed to the requests waiting on this render too, but not kept
+        text, _ = self.fragments.get_or_load(
+            key, render, keep=lambda rendered: rendered[1],
+            # Fragments of the current tick expire when it ends
+            expires_at=(tick + 1) * self.tick if version is None else None
+        )
+        return text
+
+    def stats(self):
+        """Return the size and hit/miss counters of the fragment cache."""
+        return self.fragments.stats()
@@ -0,0 +1,118 @@
+import os
+
+# Values repeated at least this often are replaced by a short alias
+TRANSACTION_ALIAS_MIN_COUNT = int(os.environ.get('TRANSACTION_ALIAS_MIN_COUNT', 2))
+
+COLUMNS = ('date', 'merchant', 'amount', 'category')
+DELIMITER = '|'
+
+# Alias prefixes per aliased column
+_ALIAS_PREFIXES = {'merchant': 'M', 'category': 'C'}
+
+
+def _value(tx, key, default=None):
+    try:
+        value = tx.get(key, default)
+    except AttributeError:
+        value = getattr(tx, key, default)
+    return default if value is None else value
+
+
+def _fields(tx):
+    category = _value(tx, 'category') or ['Uncategorized']
+    if isinstance(category, (list, tuple)):
+        category = '>'.join(str(part) for part in category)
+    return {
+        'date': str(_value(tx, 'date', '')),
+        'merchant': str(_value(tx, 'name', 'Unknown')).replace(DELIMITER, '/'),
+        'amount': f"{float(_value(tx, 'amount', 0)):.2f}",
+        'category': str(category).replace(DELIMITER, '/')
+    }
+
+
+def verbose_transaction_line(tx):
+    """Format a transaction the way prompts used to, with a label per field."""
+    fields = _fields(tx)
+    return (f"Date: {fields['date']}, Merchant: {fields['merchant']}, Amount: ${fields['amount']}, "
+            f"Category: {fields['category'].replace('>', ', ')}")
+
+
+def encode_transactions(transactions, aliases=None, min_count=TRANSACTION_ALIAS_MIN_COUNT):
+    """
+    Encode transactions as a compact table for a prompt
+
+    The table is a header row followed by one delimited row per transaction.
+    Merchants and categories that repeat are replaced by short aliases
+    (M1, C1, ...) defined once in a legend above the table.
+
+    Args:
+        transactions (list): Transactions with date, name, amount and category
+        aliases (dict, optional): Aliases already defined earlier in the same
+            prompt ({'merchant': {value: alias}, 'category': {...}}); they are
+            reused and not repeated in this table's legend
+        min_count (int): Occurrences needed before a value gets an alias
+
+    Returns:
+        dict: 'rows' (list of row strings), 'preamble' (legend and header row,
+            to put before the rows), 'text' (the whole table) and 'aliases'
+            (all aliases in use, including the ones passed in)
+    """
+    rows = [_fields(tx) for tx in transactions]
+    known = {column: dict((aliases or {}).get(column, {})) for column in _ALIAS_PREFIXES}
+    legend = []
+
+    for column, prefix in _ALIAS_PREFIXES.items():
+        counts = {}
+        for row in rows:
+            counts[row[column]] = counts.get(row[column], 0) + 1
+        new = []
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            if value in known[column] or count < min_count:
+                continue
+            alias = f"{prefix}{len(known[column]) + 1}"
+            # Aliasing short values would not save anything
+            if len(alias) >= len(value):
+                continue
+            known[column][value] = alias
+            new.append(f"{alias}={value}")
+        if new:
+            legend.append(f"{column} aliases: {'; '.join(new)}")
+
+    encoded = [
+        DELIMITER.join(known.get(column, {}).get(row[column], row[column]) for column in COLUMNS)
+        for row in rows
+    ]
+    preamble = "\n".join(legend + [DELIMITER.join(COLUMNS)]) + "\n"
+    return {
+        'rows': encoded,
+        'preamble': preamble,
+        'text': preamble + "\n".join(encoded) if encoded else "",
+        'aliases': known
+    }
+
+
+def estimate_tokens(text):
+    """Rough token count (four characters per token) when no tokenizer is at hand."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def token_savings(transactions, table, count_tokens=estimate_tokens):
+    """
+    Compare a table's size to the labelled one-line-per-transaction format
+
+    Args:
+        transactions (list): The encoded transactions
+        table (dict): Result of encode_transactions
+        count_tokens (callable): text -> token count
+
+    Returns:
+        dict: verbose_tokens, compact_tokens, saved_tokens and saved_ratio
+    """
+    verbose = count_tokens("\n".join(verbose_transaction_line(tx) for tx in transactions))
+    compact = count_tokens(table['text'])
+    return {
+        'verbose_tokens': verbose,
+        'compact_tokens': compact,
+        'saved_tokens': verbose - compact,
+        'saved_ratio': round((verbose - compact) / verbose, 4) if verbose else 0.0
+    }
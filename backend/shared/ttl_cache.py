@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Run fn() once for all concurrent callers sharing key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['event'].set()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    Args:
+        maxsize (int): Maximum number of entries kept before the least
+            recently used one is evicted
+        ttl (float): Default lifetime of an entry in seconds
+        clock (callable): Returns the current time in seconds (for tests)
+    """
+
+    def __init__(self, maxsize=256, ttl=60, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, expires_at=None):
+        """Store value under key until expires_at, or for ttl seconds."""
+        if expires_at is None:
+            expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader, ttl=None, expires_at=None, keep=None):
+        """Return the cached value for key, calling loader() on a miss.
+
+        Concurrent misses for the same key share one loader call. A loader
+        result of None, or one keep(result) rejects, is returned but not
+        cached, so failed upstream calls are retried on the next request.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        def load():
+            # Another caller may have filled the entry while we were waiting
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is not None and entry[1] > self._clock():
+                    return entry[0]
+
+            result = loader()
+            if result is not None and (keep is None or keep(result)):
+                deadline = expires_at() if callable(expires_at) else expires_at
+                self.set(key, result, ttl=ttl, expires_at=deadline)
+            return result
+
+        return self._flight.do(key, load)
+
+    def invalidate(self, key):
+        """Remove a single entry."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return a dict with the current size and hit/miss counters."""
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
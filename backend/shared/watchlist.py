@@ -0,0 +1,62 @@
+import os
+import re
+
+# Followed by users who never edited their watchlist
+DEFAULT_TICKERS = ['AMD', 'TSLA', 'NVDA', 'META']
+MAX_WATCHLIST_TICKERS = int(os.environ.get('MAX_WATCHLIST_TICKERS', 20))
+
+_TICKER_RE = re.compile(r"^[A-Z][A-Z0-9.\-]{0,9}$")
+
+
+def normalize_tickers(tickers):
+    """
+    Validate a watchlist and normalize its symbols
+
+    Args:
+        tickers (list): Ticker symbols as entered by the user
+
+    Returns:
+        list: Upper-case symbols without duplicates, in the given order
+
+    Raises:
+        ValueError: If the list or a symbol is invalid, or the list is too long
+    """
+    if not isinstance(tickers, list):
+        raise ValueError('tickers must be a list of symbols')
+
+    normalized = []
+    for ticker in tickers:
+        symbol = ticker.strip().upper() if isinstance(ticker, str) else ''
+        if not _TICKER_RE.match(symbol):
+            raise ValueError(f'Invalid ticker symbol: {ticker!r}')
+        if symbol not in normalized:
+            normalized.append(symbol)
+
+    if len(normalized) > MAX_WATCHLIST_TICKERS:
+        raise ValueError(f'A watchlist can have at most {MAX_WATCHLIST_TICKERS} tickers')
+    return normalized
+
+
+def user_tickers(user):
+    """Return a user's watchlist; users who never set one follow the defaults."""
+    if not user or 'tickers' not in user:
+        return list(DEFAULT_TICKERS)
+    return list(user['tickers'] or [])
+
+
+def build_ticker_index(users, key='phone_number'):
+    """
+    Map each ticker to the users who follow it
+
+    Args:
+        users (iterable): User documents
+        key (str): Field identifying a user in the index
+
+    Returns:
+        dict: Ticker symbol -> list of user identifiers, symbols sorted
+    """
+    index = {}
+    for user in users:
+        for ticker in user_tickers(user):
+            index.setdefault(ticker, []).append(user.get(key))
+    return dict(sorted(index.items()))
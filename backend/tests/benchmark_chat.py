@@ -0,0 +1,289 @@
+"""
+Offline latency and token benchmark for POST /api/chatbot/chat
+
+Starts local stand-ins for OpenAI, Plaid, Alpha Vantage and NewsAPI with
+configurable latency, creates synthetic users with different transaction
+and chat history sizes, and sends a corpus of representative questions at
+several concurrency levels. Reports p50/p95/p99 latency, prompt tokens per
+model call, throughput and the mean time per pipeline stage (from the
+Server-Timing header). Nothing leaves the machine and MongoDB is not used.
+
+Usage:
+    python -m tests.benchmark_chat
+    python -m tests.benchmark_chat --concurrency 1,8,32 --requests 200 --openai-latency 0.8
+    python -m tests.benchmark_chat --json results.json
+
+Run it from the backend directory. Compare runs with the same arguments;
+the absolute numbers depend on the injected latencies.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from tests.fake_openai import FakeOpenAIServer
+from tests.fake_upstreams import FakeAlphaVantageServer, FakeNewsAPIServer, FakePlaidServer
+
+# Representative questions: templated ones the fast path answers, open-ended
+# analysis, and market questions that make the model call tools
+QUESTIONS = [
+    "How much did I spend on food last month?",
+    "How much have I spent on travel this month?",
+    "Am I over budget on shopping?",
+    "What's my checking balance?",
+    "What are my largest expenses?",
+    "What are my recurring subscriptions?",
+    "Why did my spending go up recently?",
+    "Where does most of my food money go?",
+    "Should I cut back on dining out to hit my savings target?",
+    "Can you compare my spending this month to last month and suggest where to save?",
+    "How is NVDA doing this week?",
+    "Is there any news about my stocks?",
+    "How did the market do this week?",
+    "Give me a plan to pay off my credit card faster.",
+    "What did I buy at Amazon recently?",
+    "How much do I spend on coffee in a typical week?",
+]
+
+_STOCK_RE = re.compile(r"\b(stock|stocks|nvda|amd|tsla|meta|shares)\b", re.IGNORECASE)
+_NEWS_RE = re.compile(r"\bnews\b", re.IGNORECASE)
+_MARKET_RE = re.compile(r"\bmarket\b", re.IGNORECASE)
+_SERVER_TIMING_RE = re.compile(r"([\w-]+);dur=([\d.]+)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma-separated concurrency levels")
+    parser.add_argument('--requests', type=int, default=80, help="Requests per concurrency level")
+    parser.add_argument('--users', type=int, default=12, help="Synthetic users")
+    parser.add_argument('--history-sizes', default='50,500,2000', help="Transactions per user, cycled over users")
+    parser.add_argument('--chat-turns', default='0,10,40', help="Earlier chat turns per user, cycled over users")
+    parser.add_argument('--warmup', type=int, default=1, help="Unmeasured requests per user before the first level")
+    parser.add_argument('--openai-latency', type=float, default=0.3, help="Seconds before OpenAI answers")
+    parser.add_argument('--openai-slow-rate', type=float, default=0.02, help="Fraction of slow OpenAI requests")
+    parser.add_argument('--openai-slow-latency', type=float, default=2.0, help="Seconds a slow OpenAI request takes")
+    parser.add_argument('--plaid-latency', type=float, default=0.4, help="Seconds per Plaid transactions page")
+    parser.add_argument('--market-latency', type=float, default=0.1, help="Seconds per Alpha Vantage request")
+    parser.add_argument('--news-latency', type=float, default=0.1, help="Seconds per NewsAPI request")
+    parser.add_argument('--no-cache', action='store_true', help="Skip the response cache")
+    parser.add_argument('--no-fast-path', action='store_true', help="Send every question to the model")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', dest='json_path', help="Also write the results to this file")
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own output")
+    return parser.parse_args(argv)
+
+
+def tool_calls_for(body):
+    """Make the stand-in model call market tools for market questions, once per question."""
+    messages = body.get('messages') or []
+    if not messages or messages[-1].get('role') != 'user':
+        return None
+    question = messages[-1].get('content') or ''
+    calls = []
+    if _STOCK_RE.search(question):
+        calls.append(('get_stock_performance', {'tickers': ['NVDA', 'AMD']}))
+    if _NEWS_RE.search(question):
+        calls.append(('get_ticker_news', {'tickers': ['NVDA', 'AMD'], 'limit': 2}))
+    if _MARKET_RE.search(question):
+        calls.append(('get_market_indices', {}))
+    return calls or None
+
+
+def start_stand_ins(args):
+    """Start the stand-in upstreams and point the app's configuration at them."""
+    servers = {
+        'openai': FakeOpenAIServer(tool_calls=tool_calls_for, default_delay=args.openai_latency,
+                                   slow_rate=args.openai_slow_rate, slow_delay=args.openai_slow_latency,
+                                   seed=args.seed),
+        'plaid': FakePlaidServer(default_delay=args.plaid_latency),
+        'alpha_vantage': FakeAlphaVantageServer(default_delay=args.market_latency),
+        'news': FakeNewsAPIServer(default_delay=args.news_latency),
+    }
+    for server in servers.values():
+        server.start()
+
+    # Read at import time by the app, so this must run before the app is imported
+    os.environ.update({
+        'OPENAI_API_KEY': 'benchmark',
+        'OPENAI_BASE_URL': servers['openai'].url,
+        'PLAID_HOST': servers['plaid'].url,
+        'PLAID_CLIENT_ID': 'benchmark',
+        'PLAID_SECRET': 'benchmark',
+        'ALPHA_VANTAGE_URL': servers['alpha_vantage'].url,
+        'ALPHA_VANTAGE_API_KEY': 'benchmark',
+        'NEWS_API_URL': servers['news'].url,
+        'NEWS_API_KEY': 'benchmark',
+        # In-memory collections instead of MongoDB
+        'MONGO_URI': '',
+        # A few synthetic users send every request; the concurrency limit still applies
+        'CHAT_RATE_LIMIT_PER_MINUTE': '0'
+    })
+    return servers
+
+
+def seed_users(app, args):
+    """Create the synthetic users and their chat histories; return their JWTs."""
+    from flask_jwt_extended import create_access_token
+    from app.database import get_users_collection
+    from app.chat.history import append_chat_turn
+
+    sizes = [int(size) for size in args.history_sizes.split(',')]
+    turns = [int(count) for count in args.chat_turns.split(',')]
+    tokens = []
+    with app.app_context():
+        users = get_users_collection()
+        for i in range(args.users):
+            phone_number = f"+1555{i:07d}"
+            users.insert_one({
+                'phone_number': phone_number,
+                'plaid_access_token': f"access-bench-{sizes[i % len(sizes)]}-{i}",
+                'budgets': {'food': 600, 'shopping': 400, 'entertainment': 150, 'travel': 300,
+                            'target_balance': 10000},
+                'settings': {'model': 'gpt-4o-mini', 'temperature': 0.7}
+            })
+            for turn in range(turns[i % len(turns)]):
+                append_chat_turn(phone_number, QUESTIONS[turn % len(QUESTIONS)], "Earlier answer. " * 20)
+            tokens.append(create_access_token(identity=phone_number))
+    return tokens
+
+
+def send(client, token, question, args):
+    """Send one chat request and return its measurements."""
+    body = {'message': question}
+    if args.no_cache:
+        body['cache'] = False
+    if args.no_fast_path:
+        body['fast_path'] = False
+
+    started = time.perf_counter()
+    response = client.post('/api/chatbot/chat', json=body, headers={'Authorization': f'Bearer {token}'})
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    # A WSGI server closes the response once it is sent, which frees its admission slot
+    response.close()
+    return {
+        'ms': elapsed_ms,
+        'ok': response.status_code == 200,
+        'stages': {name: float(ms) for name, ms in _SERVER_TIMING_RE.findall(response.headers.get('Server-Timing', ''))},
+        'fast_path': 'X-Fast-Path' in response.headers,
+        'cache': response.headers.get('X-Response-Cache')
+    }
+
+
+def run_level(app, tokens, concurrency, args, rng):
+    """Send args.requests requests with the given concurrency and collect measurements."""
+    work = [(rng.choice(tokens), rng.choice(QUESTIONS)) for _ in range(args.requests)]
+    local = threading.local()
+
+    def run(item):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return send(local.client, *item, args)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(run, work))
+    return results, time.perf_counter() - started
+
+
+def prompt_tokens(openai_requests):
+    """Prompt tokens of the first model call of each chat turn."""
+    from app.chat.prompt_budget import MESSAGE_OVERHEAD_TOKENS, count_tokens
+
+    sizes = []
+    for request in openai_requests:
+        body = request['body']
+        messages = body.get('messages') or []
+        # Chat turns offer tools; the first call of a turn ends with the question
+        if not body.get('tools') or not messages or messages[-1].get('role') != 'user':
+            continue
+        sizes.append(sum(count_tokens(message.get('content') or '') + MESSAGE_OVERHEAD_TOKENS for message in messages))
+    return sizes
+
+
+def summarize(concurrency, results, wall_seconds, tokens):
+    """Aggregate the measurements of one concurrency level."""
+    from app.chat.response_cache import HIT
+
+    latencies = np.array([result['ms'] for result in results])
+    stage_totals = {}
+    for result in results:
+        for name, ms in result['stages'].items():
+            stage_totals.setdefault(name, []).append(ms)
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'errors': sum(not result['ok'] for result in results),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 1),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+        'throughput_rps': round(len(results) / wall_seconds, 2),
+        'model_calls': len(tokens),
+        'prompt_tokens_mean': round(float(np.mean(tokens)), 1) if tokens else 0.0,
+        'prompt_tokens_p95': round(float(np.percentile(tokens, 95)), 1) if tokens else 0.0,
+        'fast_path': sum(result['fast_path'] for result in results),
+        'cache_hits': sum(result['cache'] == HIT for result in results),
+        'stages_mean_ms': {name: round(sum(values) / len(values), 1) for name, values in stage_totals.items()}
+    }
+
+
+def print_report(levels):
+    header = f"{'conc':>5} {'reqs':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7} " \
+             f"{'calls':>6} {'tok mean':>9} {'tok p95':>8} {'fast':>5} {'hits':>5}"
+    print(header)
+    print('-' * len(header))
+    for level in levels:
+        print(f"{level['concurrency']:>5} {level['requests']:>5} {level['errors']:>4} {level['p50_ms']:>8} "
+              f"{level['p95_ms']:>8} {level['p99_ms']:>8} {level['throughput_rps']:>7} {level['model_calls']:>6} "
+              f"{level['prompt_tokens_mean']:>9} {level['prompt_tokens_p95']:>8} {level['fast_path']:>5} "
+              f"{level['cache_hits']:>5}")
+    print()
+    for level in levels:
+        stages = ", ".join(f"{name} {ms}" for name, ms in level['stages_mean_ms'].items())
+        print(f"concurrency {level['concurrency']} mean stage ms: {stages}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    servers = start_stand_ins(args)
+    try:
+        levels = []
+        with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w')):
+            # Imported only now that the environment points at the stand-ins
+            from app import create_app
+            app = create_app()
+            app.config['TESTING'] = True
+            tokens = seed_users(app, args)
+
+            if args.warmup:
+                client = app.test_client()
+                for token in tokens:
+                    for _ in range(args.warmup):
+                        send(client, token, rng.choice(QUESTIONS), args)
+
+            for concurrency in [int(level) for level in args.concurrency.split(',')]:
+                seen = len(servers['openai'].requests)
+                results, wall_seconds = run_level(app, tokens, concurrency, args, rng)
+                levels.append(summarize(concurrency, results, wall_seconds,
+                                        prompt_tokens(servers['openai'].requests[seen:])))
+
+        print_report(levels)
+        if args.json_path:
+            with open(args.json_path, 'w') as f:
+                json.dump({'arguments': vars(args), 'levels': levels}, f, indent=2)
+        return 0 if all(level['errors'] == 0 for level in levels) else 1
+    finally:
+        for server in servers.values():
+            server.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
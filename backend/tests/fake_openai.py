@@ -0,0 +1,123 @@
+"""
+Stand-in for the OpenAI chat completions and embeddings API
+
+Serves POST /v1/chat/completions (streaming or not) and /v1/embeddings on a
+local port after an injected delay. Point an OpenAI client at it with
+base_url=server.url, or the app with OPENAI_BASE_URL.
+"""
+import hashlib
+import json
+import time
+
+from tests.fake_upstreams import StandInServer
+
+
+class FakeOpenAIServer(StandInServer):
+    """
+    Local OpenAI server with injected latency
+
+    Args:
+        reply (str): Text of every answer
+        token_delay (float): Seconds between streamed chunks
+        tool_calls (callable, optional): request body -> list of (name, arguments)
+            tool calls to answer with instead of text, or None to answer
+        embedding_dim (int): Length of the embeddings returned
+        **kwargs: Latency injection, as for StandInServer
+    """
+
+    def __init__(self, reply='Stand-in answer from the fake OpenAI server.', token_delay=0.0, tool_calls=None,
+                 embedding_dim=64, **kwargs):
+        super().__init__(**kwargs)
+        self.reply = reply
+        self.token_delay = token_delay
+        self.tool_calls = tool_calls
+        self.embedding_dim = embedding_dim
+        self.disconnects = 0
+
+    @property
+    def url(self):
+        return f"{self.root}/v1"
+
+    def handle(self, handler, method, path, query, body):
+        if path.endswith('/embeddings'):
+            self._embeddings(handler, body)
+            return
+
+        calls = self.tool_calls(body) if self.tool_calls and body.get('tools') else None
+        if body.get('stream'):
+            self._stream(handler, body, calls)
+        else:
+            self._complete(handler, body, calls)
+
+    def _embeddings(self, handler, body):
+        texts = body.get('input') or []
+        texts = [texts] if isinstance(texts, str) else texts
+        handler.send_json({
+            'object': 'list',
+            'model': body.get('model'),
+            'data': [
+                {'object': 'embedding', 'index': i, 'embedding': _embed(text, self.embedding_dim)}
+                for i, text in enumerate(texts)
+            ],
+            'usage': {'prompt_tokens': 0, 'total_tokens': 0}
+        })
+
+    def _complete(self, handler, body, calls):
+        message = {'role': 'assistant', 'content': None if calls else self.reply}
+        if calls:
+            message['tool_calls'] = [
+                {'id': f'call_{i}', 'type': 'function', 'function': {'name': name, 'arguments': json.dumps(arguments)}}
+                for i, (name, arguments) in enumerate(calls)
+            ]
+        handler.send_json({
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model'),
+            'choices': [{'index': 0, 'message': message, 'finish_reason': 'tool_calls' if calls else 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': len(self.reply.split()), 'total_tokens': 0}
+        })
+
+    def _stream(self, handler, body, calls):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.end_headers()
+        if calls:
+            deltas = [{'role': 'assistant', 'tool_calls': [
+                {'index': i, 'id': f'call_{i}', 'type': 'function',
+                 'function': {'name': name, 'arguments': json.dumps(arguments)}}
+                for i, (name, arguments) in enumerate(calls)
+            ]}]
+        else:
+            words = self.reply.split(' ')
+            deltas = [{'role': 'assistant', 'content': ''}]
+            deltas += [{'content': word if i == 0 else f' {word}'} for i, word in enumerate(words)]
+        try:
+            for i, delta in enumerate(deltas):
+                chunk = {
+                    'id': 'chatcmpl-fake',
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': body.get('model'),
+                    'choices': [{
+                        'index': 0,
+                        'delta': delta,
+                        'finish_reason': ('tool_calls' if calls else 'stop') if i == len(deltas) - 1 else None
+                    }]
+                }
+                handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                handler.wfile.flush()
+                time.sleep(self.token_delay)
+            handler.wfile.write(b"data: [DONE]\n\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            with self._lock:
+                self.disconnects += 1
+
+
+def _embed(text, dim):
+    """Deterministic unit vector for a text."""
+    digest = hashlib.sha256(text.encode()).digest()
+    values = [digest[i % len(digest)] / 255 - 0.5 for i in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
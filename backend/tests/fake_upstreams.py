@@ -0,0 +1,295 @@
+"""
+Local stand-ins for the Plaid, Alpha Vantage and NewsAPI endpoints the backend calls
+
+Each stand-in serves synthetic but well-formed responses on a local port
+after an injected delay, so the app can be exercised offline. Point the app
+at them with PLAID_HOST, ALPHA_VANTAGE_URL and NEWS_API_URL.
+"""
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StandInServer:
+    """
+    Local HTTP server answering requests after an injected delay
+
+    Args:
+        delays (list): Seconds to wait before answering, per request in order;
+            later requests wait default_delay
+        default_delay (float): Seconds to wait once delays are used up
+        slow_rate (float): Fraction of requests that wait slow_delay instead
+        slow_delay (float): Seconds a slow request waits
+        seed (int): Seed of the slow request draw
+    """
+
+    def __init__(self, delays=None, default_delay=0.0, slow_rate=0.0, slow_delay=0.0, seed=0):
+        self.delays = list(delays or [])
+        self.default_delay = default_delay
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def root(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_delay(self, request):
+        with self._lock:
+            self.requests.append(request)
+            if self.delays:
+                return self.delays.pop(0)
+            if self.slow_rate and self._random.random() < self.slow_rate:
+                return self.slow_delay
+            return self.default_delay
+
+    def handle(self, handler, method, path, query, body):
+        """Answer one request; subclasses write the response through handler."""
+        raise NotImplementedError
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _dispatch(self, method):
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                time.sleep(server._next_delay({'method': method, 'path': url.path, 'query': query, 'body': body}))
+                server.handle(self, method, url.path, query, body)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def send_json(self, payload, status=200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+MERCHANTS = [
+    ('Whole Foods', ['Food and Drink', 'Groceries'], 20, 180),
+    ('Trader Joes', ['Food and Drink', 'Groceries'], 15, 120),
+    ('Starbucks', ['Food and Drink', 'Restaurants', 'Coffee Shop'], 4, 12),
+    ('Chipotle', ['Food and Drink', 'Restaurants'], 10, 25),
+    ('Uber', ['Travel', 'Taxi'], 8, 45),
+    ('Shell', ['Travel', 'Gas Stations'], 25, 70),
+    ('Amazon', ['Shops', 'Digital Purchase'], 10, 250),
+    ('Target', ['Shops', 'Department Stores'], 15, 200),
+    ('Netflix', ['Service', 'Subscription'], 15, 16),
+    ('Spotify', ['Service', 'Subscription'], 10, 11),
+    ('AMC Theatres', ['Recreation', 'Movie Theatres'], 12, 40),
+    ('Con Edison', ['Service', 'Utilities'], 60, 140),
+    ('CVS Pharmacy', ['Shops', 'Pharmacies'], 5, 60),
+    ('Delta Air Lines', ['Travel', 'Airlines'], 120, 600),
+]
+
+
+class FakePlaidServer(StandInServer):
+    """
+    Plaid stand-in serving /transactions/get
+
+    Transactions are generated deterministically per access token. A token
+    of the form ``access-bench-<count>-<id>`` has <count> transactions;
+    other tokens get default_count.
+    """
+
+    def __init__(self, default_count=200, **kwargs):
+        super().__init__(**kwargs)
+        self.default_count = default_count
+        self._generated = {}
+
+    @property
+    def url(self):
+        return self.root
+
+    def transactions_for(self, access_token):
+        """Return the synthetic transactions of an access token, newest first."""
+        with self._lock:
+            if access_token in self._generated:
+                return self._generated[access_token]
+        parts = access_token.split('-')
+        count = int(parts[2]) if len(parts) >= 3 and parts[:2] == ['access', 'bench'] and parts[2].isdigit() \
+            else self.default_count
+
+        rng = random.Random(access_token)
+        today = date.today()
+        transactions = []
+        for i in range(count):
+            day = today - timedelta(days=int(i * 730 / max(count, 1)))
+            if i % 25 == 0:
+                name, category, amount = 'Payroll Deposit', ['Transfer', 'Payroll'], -round(rng.uniform(1800, 2600), 2)
+            else:
+                name, category, low, high = rng.choice(MERCHANTS)
+                amount = round(rng.uniform(low, high), 2)
+            transactions.append(_transaction(f"{access_token}-tx{i}", day, name, category, amount))
+        with self._lock:
+            self._generated[access_token] = transactions
+        return transactions
+
+    def handle(self, handler, method, path, query, body):
+        if path != '/transactions/get':
+            handler.send_json({'error_type': 'INVALID_REQUEST', 'error_code': 'NOT_FOUND',
+                               'error_message': f'unknown endpoint {path}', 'display_message': None,
+                               'request_id': 'fake'}, status=404)
+            return
+
+        transactions = self.transactions_for(body.get('access_token', ''))
+        options = body.get('options') or {}
+        offset = options.get('offset', 0)
+        count = options.get('count', 100)
+        handler.send_json({
+            'accounts': [_account('checking', 'depository', 'checking', 4250.32),
+                         _account('savings', 'depository', 'savings', 12800.0),
+                         _account('credit', 'credit', 'credit card', 640.18)],
+            'transactions': transactions[offset:offset + count],
+            'total_transactions': len(transactions),
+            'item': {
+                'item_id': 'fake-item',
+                'webhook': None,
+                'error': None,
+                'available_products': [],
+                'billed_products': ['transactions'],
+                'consent_expiration_time': None,
+                'update_type': 'background',
+                'institution_id': 'ins_fake'
+            },
+            'request_id': 'fake-request'
+        })
+
+
+def _account(account_id, account_type, subtype, balance):
+    return {
+        'account_id': account_id,
+        'balances': {'available': balance, 'current': balance, 'limit': None,
+                     'iso_currency_code': 'USD', 'unofficial_currency_code': None},
+        'mask': '0000',
+        'name': f'Fake {subtype.title()}',
+        'official_name': None,
+        'type': account_type,
+        'subtype': subtype
+    }
+
+
+def _transaction(transaction_id, day, name, category, amount):
+    return {
+        'account_id': 'credit' if amount > 0 else 'checking',
+        'account_owner': None,
+        'amount': amount,
+        'iso_currency_code': 'USD',
+        'unofficial_currency_code': None,
+        'category': category,
+        'category_id': '13005000',
+        'check_number': None,
+        'date': day.isoformat(),
+        'datetime': None,
+        'authorized_date': day.isoformat(),
+        'authorized_datetime': None,
+        'location': {'address': None, 'city': None, 'region': None, 'postal_code': None, 'country': None,
+                     'lat': None, 'lon': None, 'store_number': None},
+        'merchant_name': name,
+        'name': name,
+        'payment_channel': 'in store',
+        'payment_meta': {'by_order_of': None, 'payee': None, 'payer': None, 'payment_method': None,
+                         'payment_processor': None, 'ppd_id': None, 'reason': None, 'reference_number': None},
+        'pending': False,
+        'pending_transaction_id': None,
+        'personal_finance_category': None,
+        'transaction_code': None,
+        'transaction_id': transaction_id,
+        'transaction_type': 'place'
+    }
+
+
+class FakeAlphaVantageServer(StandInServer):
+    """Alpha Vantage stand-in serving GLOBAL_QUOTE and TIME_SERIES_DAILY_ADJUSTED per symbol."""
+
+    @property
+    def url(self):
+        return f"{self.root}/query"
+
+    def handle(self, handler, method, path, query, body):
+        symbol = query.get('symbol', '').upper()
+        rng = random.Random(symbol)
+        price = round(rng.uniform(20, 600), 2)
+
+        if query.get('function') == 'GLOBAL_QUOTE':
+            handler.send_json({'Global Quote': {
+                '01. symbol': symbol,
+                '05. price': f'{price:.4f}',
+                '10. change percent': f'{rng.uniform(-3, 3):.4f}%'
+            }})
+            return
+
+        series = {}
+        for i in range(100):
+            close = price * (1 + rng.uniform(-0.02, 0.02))
+            series[(date.today() - timedelta(days=i)).isoformat()] = {
+                '1. open': f'{close:.4f}',
+                '2. high': f'{close * 1.01:.4f}',
+                '3. low': f'{close * 0.99:.4f}',
+                '4. close': f'{close:.4f}',
+                '5. adjusted close': f'{close:.4f}',
+                '6. volume': str(rng.randint(1_000_000, 50_000_000))
+            }
+        handler.send_json({'Meta Data': {'2. Symbol': symbol}, 'Time Series (Daily)': series})
+
+
+class FakeNewsAPIServer(StandInServer):
+    """NewsAPI stand-in serving /v2/everything and /v2/top-headlines."""
+
+    @property
+    def url(self):
+        return f"{self.root}/v2"
+
+    def handle(self, handler, method, path, query, body):
+        topic = query.get('q') or query.get('category') or 'markets'
+        size = int(query.get('pageSize', 5))
+        handler.send_json({
+            'status': 'ok',
+            'totalResults': size,
+            'articles': [
+                {
+                    'source': {'id': None, 'name': 'Fake Wire'},
+                    'title': f'{topic.title()} update {i + 1}',
+                    'description': f'Synthetic coverage of {topic} for offline runs.',
+                    'url': f'https://news.invalid/{topic.replace(" ", "-")}/{i}',
+                    'publishedAt': f'{date.today().isoformat()}T12:00:00Z'
+                }
+                for i in range(size)
+            ]
+        })
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import unittest
+
+from app.chat.admission import RATE_LIMITED, SHED, TIMED_OUT, AdmissionController
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_controller(clock, **kwargs):
+    options = dict(rate_per_minute=60, burst=2, max_concurrent=2, max_queue=1, queue_timeout=1,
+                   lease=30, poll_interval=0.25, clock=clock, sleep=clock.sleep)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_bucket_allows_a_burst_then_refills(self):
+        """Test the burst, the 429 after it with its Retry-After, and the refill."""
+        clock = FakeClock()
+        admission = make_controller(clock, max_concurrent=0)
+
+        self.assertTrue(admission.admit('alice')['admitted'])
+        self.assertTrue(admission.admit('alice')['admitted'])
+        refused = admission.admit('alice')
+        self.assertEqual((refused['status'], refused['reason'], refused['retry_after']), (429, RATE_LIMITED, 1))
+
+        # Other users have their own bucket
+        self.assertTrue(admission.admit('bob')['admitted'])
+
+        clock.now += 1
+        self.assertTrue(admission.admit('alice')['admitted'])
+        self.assertFalse(admission.admit('alice')['admitted'])
+
+
+class TestConcurrencyLimit(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_full_queue_is_shed(self):
+        """Test that requests beyond the slots wait, and beyond the queue are shed."""
+        admission = make_controller(self.clock, rate_per_minute=0)
+        admission.admit('a')
+        admission.admit('b')
+        # Another worker's request is already waiting, so the queue is full
+        with admission._transaction() as db:
+            db.execute('INSERT INTO waiting (id, expires) VALUES (?, ?)', ('waiter', self.clock() + 60))
+        shed = admission.admit('c')
+
+        self.assertEqual((shed['status'], shed['reason']), (503, SHED))
+        self.assertGreaterEqual(shed['retry_after'], 1)
+
+    def test_queued_request_gets_a_released_slot(self):
+        """Test that a waiting request is admitted once a slot is released."""
+        admission = make_controller(self.clock, rate_per_minute=0)
+        first = admission.admit('a')
+        admission.admit('b')
+
+        def sleep(seconds):
+            self.clock.sleep(seconds)
+            admission.release(first['slot'])
+
+        admission._sleep = sleep
+        queued = admission.admit('c')
+
+        self.assertTrue(queued['admitted'])
+        stats = admission.stats()
+        self.assertEqual((stats['active'], stats['waiting'], stats['queued']), (2, 0, 1))
+
+    def test_queued_request_times_out(self):
+        """Test that a request waiting longer than the queue timeout is shed."""
+        admission = make_controller(self.clock, rate_per_minute=0)
+        admission.admit('a')
+        admission.admit('b')
+
+        timed_out = admission.admit('c')
+
+        self.assertEqual((timed_out['status'], timed_out['reason']), (503, TIMED_OUT))
+        self.assertEqual(admission.stats()['waiting'], 0)
+
+    def test_waiting_request_polls_without_the_write_lock(self):
+        """Test that full slots are polled read-only, with the write lock taken only to give up."""
+        admission = make_controller(self.clock, rate_per_minute=0, queue_timeout=10, poll_interval=0.05)
+        admission.admit('a')
+        admission.admit('b')
+        transaction, sleeps = admission._transaction, []
+        admission._transaction = lambda: sleeps.append('write') or transaction()
+        admission._sleep = lambda seconds: sleeps.append(seconds) or self.clock.sleep(seconds)
+
+        self.assertEqual(admission.admit('c')['reason'], TIMED_OUT)
+
+        # One transaction to queue and one to leave the queue
+        self.assertEqual(sleeps.count('write'), 2)
+        waits = [seconds for seconds in sleeps if seconds != 'write']
+        # Far fewer checks than the 200 of a fixed 50 ms interval
+        self.assertLess(len(waits), 40)
+        self.assertLessEqual(max(waits), 0.05 * 16)
+
+    def test_shed_requests_keep_their_token(self):
+        """Test that a request refused for a full queue does not use up the user's rate limit."""
+        admission = make_controller(self.clock, rate_per_minute=60, burst=3, max_queue=0)
+        admission.admit('alice')
+        admission.admit('alice')
+
+        self.assertEqual(admission.admit('alice')['reason'], SHED)
+        self.assertEqual(admission.admit('alice')['reason'], SHED)
+        admission.max_concurrent = 3
+        self.assertTrue(admission.admit('alice')['admitted'])
+        self.assertEqual(admission.admit('alice')['reason'], RATE_LIMITED)
+
+    def test_slots_of_dead_workers_are_reclaimed(self):
+        """Test that unreleased slots free up after their lease."""
+        admission = make_controller(self.clock, rate_per_minute=0)
+        admission.admit('a')
+        admission.admit('b')
+
+        self.clock.now += 31
+        self.assertTrue(admission.admit('c')['admitted'])
+
+    def test_state_is_shared_through_the_database_file(self):
+        """Test that two controllers on one SQLite file, as in two workers, share slots and buckets."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'admission.sqlite')
+            first = make_controller(self.clock, path=path, rate_per_minute=6, burst=3)
+            second = make_controller(self.clock, path=path, rate_per_minute=6, burst=3)
+
+            slot = first.admit('alice')['slot']
+            second.admit('alice')
+            self.assertEqual(second.admit('alice')['reason'], TIMED_OUT)
+
+            first.release(slot)
+            self.assertEqual(second.stats()['active'], 1)
+            # The timed out request left its token in the shared bucket
+            self.assertTrue(first.admit('alice')['admitted'])
+            self.assertEqual(second.admit('alice')['reason'], RATE_LIMITED)
+            first._db.close()
+            second._db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
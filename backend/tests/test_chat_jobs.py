@@ -0,0 +1,66 @@
+import sys
+import unittest
+from app.chat.jobs import ChatJobQueue, QueueFullError, job_status, DONE, ERROR, QUEUED
+
+
+class TestChatJobQueue(unittest.TestCase):
+    def setUp(self):
+        # No worker threads; jobs are run explicitly with run_next
+        self.jobs = ChatJobQueue(workers=0, maxsize=2)
+
+    def test_job_runs_and_reports_result(self):
+        """Test the lifecycle of a successful job."""
+        job = self.jobs.submit('+11234567890', lambda text: {'response': text.upper()}, 'hello')
+        self.assertEqual(self.jobs.get(job['job_id'])['status'], QUEUED)
+
+        self.assertTrue(self.jobs.run_next(timeout=0))
+
+        finished = self.jobs.wait(job['job_id'], timeout=1)
+        self.assertEqual(finished['status'], DONE)
+        self.assertEqual(job_status(finished), {'job_id': job['job_id'], 'status': DONE, 'response': 'HELLO'})
+
+    def test_failed_job_reports_error(self):
+        """Test that handler exceptions end up on the job."""
+        def broken():
+            raise RuntimeError('upstream timeout')
+
+        job = self.jobs.submit('+11234567890', broken)
+        self.jobs.run_next(timeout=0)
+
+        self.assertEqual(job_status(self.jobs.get(job['job_id'])),
+                         {'job_id': job['job_id'], 'status': ERROR, 'error': 'upstream timeout'})
+
+    def test_full_queue_rejects_jobs(self):
+        """Test the queue bound."""
+        self.jobs.submit('+11234567890', dict)
+        self.jobs.submit('+11234567890', dict)
+
+        with self.assertRaises(QueueFullError):
+            self.jobs.submit('+11234567890', dict)
+        # The rejected job is not left behind as queued
+        self.assertEqual(len(self.jobs.jobs), 2)
+
+    def test_unknown_job(self):
+        """Test looking up a job that does not exist."""
+        self.assertIsNone(self.jobs.get('missing'))
+        self.assertIsNone(self.jobs.wait('missing', timeout=0))
+        self.assertFalse(self.jobs.run_next(timeout=0))
+
+
+class TestChatJobWorkers(unittest.TestCase):
+    def test_every_job_finishes(self):
+        """Test that jobs picked up by a worker the moment they are queued are not lost."""
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        jobs = ChatJobQueue(workers=4, maxsize=1000)
+
+        submitted = [jobs.submit('+11234567890', lambda n: {'n': n}, n)['job_id'] for n in range(800)]
+
+        finished = [jobs.wait(job_id, timeout=5) for job_id in submitted]
+        self.assertEqual([job['status'] for job in finished], [DONE] * 800)
+        self.assertEqual([job['result']['n'] for job in finished], list(range(800)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.chat.tools import ToolRegistry, complete_with_tools
+
+
+def tool_call_response(name, arguments='{}'):
+    call = SimpleNamespace(id=f'call_{name}', function=SimpleNamespace(name=name, arguments=arguments))
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[call]))])
+
+
+class TestToolRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = ToolRegistry(workers=4)
+
+        @self.registry.tool('slow', 'Sleeps, then echoes its argument.',
+                            {'type': 'object', 'properties': {'value': {'type': 'string'}}})
+        def slow(value='x'):
+            time.sleep(0.2)
+            return {'value': value}
+
+        @self.registry.tool('broken', 'Always fails.')
+        def broken():
+            raise RuntimeError('upstream down')
+
+    def test_calls_run_concurrently(self):
+        """Test that tool calls from one response overlap."""
+        calls = [{'id': f'call_{i}', 'name': 'slow', 'arguments': json.dumps({'value': str(i)})} for i in range(3)]
+
+        start = time.monotonic()
+        messages = self.registry.run(calls)
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual([msg['tool_call_id'] for msg in messages], ['call_0', 'call_1', 'call_2'])
+        self.assertEqual(json.loads(messages[2]['content']), {'value': '2'})
+
+    def test_errors_are_returned_to_the_model(self):
+        """Test that failing and unknown tools produce error results."""
+        messages = self.registry.run([
+            {'id': 'call_a', 'name': 'broken', 'arguments': ''},
+            {'id': 'call_b', 'name': 'missing', 'arguments': '{}'}
+        ])
+
+        self.assertEqual(json.loads(messages[0]['content']), {'error': 'upstream down'})
+        self.assertEqual(json.loads(messages[1]['content']), {'error': 'Unknown tool missing'})
+
+    def test_tool_rounds_are_capped(self):
+        """Test that the last round forbids further tool calls."""
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [
+            tool_call_response('slow'),
+            SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='Done.', tool_calls=None))])
+        ]
+
+        text, used = complete_with_tools(client, self.registry, [{'role': 'user', 'content': 'Hi'}],
+                                         max_rounds=1, model='gpt-4o-mini')
+
+        self.assertEqual((text, used), ('Done.', ['slow']))
+        self.assertEqual(client.chat.completions.create.call_args.kwargs['tool_choice'], 'none')
+
+
+if __name__ == '__main__':
+    unittest.main()
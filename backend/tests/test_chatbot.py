@@ -0,0 +1,526 @@
+import unittest
+import json
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+from app import create_app
+from app.database import users_db, chat_messages_db
+from app.api.routes.chatbot import context_snapshots, prompt_prefixes
+from app.chat.transaction_index import TransactionRetriever, HashingEmbeddingProvider
+from app.chat.history import append_chat_turn
+from app.chat.memory import ConversationMemory
+from app.chat.response_cache import SemanticResponseCache
+from app.chat.warmup import ContextWarmer
+from app.chat.admission import AdmissionController
+from shared.prompt_fragments import PromptFragmentCache
+from flask_jwt_extended import create_access_token
+
+
+def make_completion(text):
+    """Build an object shaped like a non-streaming chat completion."""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def make_tool_call(call_id, name, arguments):
+    """Build a tool call as returned in a chat completion message."""
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+def make_stream(*parts):
+    """Build chunks shaped like a streaming chat completion."""
+    return iter([
+        SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+        for part in parts
+    ])
+
+
+class ImmediateExecutor:
+    """Runs submitted work on the calling thread."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class TestChatbotRoutes(unittest.TestCase):
+    def setUp(self):
+        """Set up test client, a linked test user and upstream mocks."""
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+        self.test_phone = '+11234567890'
+        users_db.clear()
+        users_db[self.test_phone] = {
+            'phone_number': self.test_phone,
+            'plaid_access_token': 'plaid-access-token',
+            'budgets': {'shopping': 300, 'food': 500, 'entertainment': 200, 'target_balance': 5000}
+        }
+        chat_messages_db.clear()
+        prompt_prefixes.invalidate(self.test_phone)
+        context_snapshots.invalidate(self.test_phone)
+
+        with self.app.app_context():
+            self.access_token = create_access_token(identity=self.test_phone)
+        self.headers = {
+            'Authorization': f'Bearer {self.access_token}',
+            'Content-Type': 'application/json'
+        }
+
+        today = date.today()
+        transactions = {'transactions': [
+            {'transaction_id': 'tx1', 'date': today.isoformat(), 'name': 'Grocery Store', 'amount': 52.10,
+             'category': ['Food and Drink']},
+            {'transaction_id': 'tx2', 'date': (today - timedelta(days=200)).isoformat(), 'name': 'Payroll Deposit',
+             'amount': -1500.0, 'category': ['Transfer']}
+        ]}
+        plaid_patcher = patch('app.api.routes.chatbot.plaid_client.transactions_get', return_value=transactions)
+        self.plaid = plaid_patcher.start()
+        self.addCleanup(plaid_patcher.stop)
+
+        self.upstream = {}
+        for name, value in [('fetch_stock_performance', {}), ('fetch_market_indices', {}),
+                            ('fetch_news_for_ticker', []), ('fetch_market_news', [])]:
+            patcher = patch(f'app.api.routes.chatbot.{name}', return_value=value)
+            self.upstream[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+
+        retriever_patcher = patch('app.api.routes.chatbot.transaction_retriever',
+                                  TransactionRetriever(HashingEmbeddingProvider()))
+        retriever_patcher.start()
+        self.addCleanup(retriever_patcher.stop)
+
+        # The test client never closes responses, so slots are only limited where a test needs it
+        self.admission = AdmissionController(rate_per_minute=60, burst=100, max_concurrent=0, max_queue=0)
+        admission_patcher = patch('app.api.routes.chatbot.chat_admission', self.admission)
+        admission_patcher.start()
+        self.addCleanup(admission_patcher.stop)
+
+        fragments_patcher = patch('app.api.routes.chatbot.prompt_fragments', PromptFragmentCache())
+        fragments_patcher.start()
+        self.addCleanup(fragments_patcher.stop)
+
+        cache_patcher = patch('app.api.routes.chatbot.response_cache',
+                              SemanticResponseCache(HashingEmbeddingProvider()))
+        self.response_cache = cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+        # Summaries are produced synchronously by a stand-in summarizer
+        self.summaries = []
+        memory_patcher = patch('app.api.routes.chatbot.chat_memory', ConversationMemory(
+            lambda previous, messages: self.summaries.append(messages) or f'{len(self.summaries)} summaries',
+            window=4, executor=ImmediateExecutor()
+        ))
+        memory_patcher.start()
+        self.addCleanup(memory_patcher.stop)
+
+        openai_patcher = patch('app.api.routes.chatbot.openai_client')
+        self.openai = openai_patcher.start()
+        self.addCleanup(openai_patcher.stop)
+
+    def tearDown(self):
+        users_db.clear()
+        chat_messages_db.clear()
+
+    def test_chat_returns_response_and_saves_history(self):
+        """Test a regular chat turn."""
+        self.openai.chat.completions.create.return_value = make_completion('You spent $52.10 on food.')
+
+        response = self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Food spend?'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['response'], 'You spent $52.10 on food.')
+        history = chat_messages_db[self.test_phone]
+        self.assertEqual([msg['role'] for msg in history], ['user', 'assistant'])
+        self.assertLess(history[0]['ts'], history[1]['ts'])
+        self.assertNotIn('chat_history', users_db[self.test_phone])
+
+    def test_chat_retry_with_idempotency_key_is_answered_once(self):
+        """Test that a retried request gets the stored answer without a second turn."""
+        self.openai.chat.completions.create.return_value = make_completion('You spent $52.10 on food.')
+        headers = dict(self.headers, **{'Idempotency-Key': 'chat-retry-1'})
+
+        first = self.client.post('/api/chatbot/chat', headers=headers, json={'message': 'Food spend?'})
+        retry = self.client.post('/api/chatbot/chat', headers=headers, json={'message': 'Food spend?'})
+
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry.headers.get('Idempotent-Replayed'), 'true')
+        self.assertNotIn('Idempotent-Replayed', first.headers)
+        self.assertEqual(self.openai.chat.completions.create.call_count, 1)
+        self.assertEqual(len(chat_messages_db[self.test_phone]), 2)
+
+        reused = self.client.post('/api/chatbot/chat', headers=headers, json={'message': 'Rent?'})
+        self.assertEqual(reused.status_code, 422)
+
+    def test_chat_over_the_rate_limit_is_refused(self):
+        """Test that a user past their burst gets 429 with Retry-After."""
+        self.openai.chat.completions.create.return_value = make_completion('Noted.')
+        self.admission.burst = 1
+
+        first = self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Food spend?'})
+        first.close()
+        second = self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Food spend?'})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+        self.assertGreaterEqual(int(second.headers['Retry-After']), 1)
+        self.assertEqual(self.openai.chat.completions.create.call_count, 1)
+        self.assertEqual(self.admission.stats()['active'], 0)
+
+    def test_chat_replay_skips_admission(self):
+        """Test that a retry with the same Idempotency-Key is replayed even past the rate limit."""
+        self.openai.chat.completions.create.return_value = make_completion('Noted.')
+        self.admission.burst = 1
+        self.admission.max_concurrent = 4
+        headers = dict(self.headers, **{'Idempotency-Key': 'chat-retry-2'})
+
+        first = self.client.post('/api/chatbot/chat', headers=headers, json={'message': 'Food spend?'})
+        # The slot is given back once the answer is built, without waiting for the response to close
+        self.assertEqual(self.admission.stats()['active'], 0)
+        retry = self.client.post('/api/chatbot/chat', headers=headers, json={'message': 'Food spend?'})
+
+        self.assertEqual((first.status_code, retry.status_code), (200, 200))
+        self.assertEqual(retry.headers.get('Idempotent-Replayed'), 'true')
+        self.assertEqual(self.admission.stats()['rate_limited'], 0)
+
+    def test_chat_is_shed_when_every_slot_is_taken(self):
+        """Test that requests beyond the concurrency limit and queue are shed with 503."""
+        self.admission.max_concurrent = 4
+        for _ in range(4):
+            self.admission.admit('+19999999999')
+
+        response = self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Food spend?'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.openai.chat.completions.create.assert_not_called()
+
+    def test_chat_prompt_respects_token_budget(self):
+        """Test that older chat history is trimmed to fit the prompt budget."""
+        users_db[self.test_phone]['chat_history'] = [
+            {'role': 'user', 'content': 'an earlier question ' * 600},
+            {'role': 'assistant', 'content': 'an earlier answer'}
+        ]
+        self.openai.chat.completions.create.return_value = make_completion('Noted.')
+
+        with patch('app.api.routes.chatbot.CHAT_PROMPT_TOKEN_BUDGET', 1500):
+            self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Food spend?'})
+
+        messages = self.openai.chat.completions.create.call_args.kwargs['messages']
+        self.assertEqual([msg['role'] for msg in messages], ['system', 'assistant', 'user'])
+        self.assertIn('Grocery Store', messages[0]['content'])
+
+    def test_chat_reuses_stable_prompt_prefix_across_turns(self):
+        """Test that the system prefix is byte-identical until the data changes."""
+        self.openai.chat.completions.create.return_value = make_completion('Noted.')
+        prompt_prefixes.invalidate(self.test_phone)
+        renders = prompt_prefixes.renders
+
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'First?'})
+        first = self.openai.chat.completions.create.call_args.kwargs['messages']
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Second?'})
+        second = self.openai.chat.completions.create.call_args.kwargs['messages']
+
+        self.assertEqual(prompt_prefixes.renders - renders, 1)
+        self.assertIs(first[0]['content'], second[0]['content'])
+        # History follows the prefix; market data is left to tools
+        self.assertEqual([msg['role'] for msg in second], ['system', 'user', 'assistant', 'user'])
+        self.assertIn('The user follows these tickers: AMD', second[0]['content'])
+        self.assertFalse(any(mock.called for mock in self.upstream.values()))
+
+        users_db[self.test_phone]['budgets']['food'] = 650
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Third?'})
+        third = self.openai.chat.completions.create.call_args.kwargs['messages']
+
+        self.assertEqual(prompt_prefixes.renders - renders, 2)
+        self.assertIn('food: spent 52.10 of 650.00', third[0]['content'])
+
+    def test_chat_includes_older_transactions_relevant_to_the_question(self):
+        """Test that retrieved transactions are added next to the question."""
+        self.openai.chat.completions.create.return_value = make_completion('Noted.')
+
+        with patch('app.api.routes.chatbot.CHAT_PREFIX_TRANSACTIONS', 1):
+            self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'When was my last payroll?'})
+
+        messages = self.openai.chat.completions.create.call_args.kwargs['messages']
+        self.assertNotIn('Payroll Deposit', messages[0]['content'])
+        self.assertIn('Payroll Deposit', messages[-2]['content'])
+
+    def test_chat_migrates_legacy_history(self):
+        """Test that an embedded chat_history array moves to chat_messages on first use."""
+        users_db[self.test_phone]['chat_history'] = [
+            {'role': 'user', 'content': 'Old question'},
+            {'role': 'assistant', 'content': 'Old answer'}
+        ]
+        self.openai.chat.completions.create.return_value = make_completion('New answer')
+
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'New question'})
+
+        messages = self.openai.chat.completions.create.call_args.kwargs['messages']
+        self.assertEqual([msg['content'] for msg in messages[1:3]], ['Old question', 'Old answer'])
+        self.assertNotIn('chat_history', users_db[self.test_phone])
+        self.assertEqual([msg['content'] for msg in chat_messages_db[self.test_phone]],
+                         ['Old question', 'Old answer', 'New question', 'New answer'])
+
+    def test_chat_summarizes_turns_older_than_the_window(self):
+        """Test that old turns reach the prompt as a summary instead of verbatim."""
+        for i in range(4):
+            self.openai.chat.completions.create.return_value = make_completion(f'Answer {i}')
+            self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': f'Question {i}'})
+
+        # The fourth prompt sees turns 1-2 verbatim and turn 0 summarized
+        messages = self.openai.chat.completions.create.call_args.kwargs['messages']
+        self.assertEqual([msg['content'] for msg in self.summaries[0]], ['Question 0', 'Answer 0'])
+        self.assertEqual(messages[1], {'role': 'system',
+                                       'content': 'Summary of the earlier conversation:\n1 summaries'})
+        self.assertNotIn('Question 0', [msg['content'] for msg in messages])
+        self.assertIn('Question 1', [msg['content'] for msg in messages])
+
+    def test_history_is_paginated_newest_first(self):
+        """Test paging backwards through the chat history."""
+        for i in range(3):
+            self.openai.chat.completions.create.return_value = make_completion(f'Answer {i}')
+            self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': f'Question {i}'})
+
+        page = json.loads(self.client.get('/api/chatbot/history?limit=4', headers=self.headers).data)
+        self.assertEqual([msg['content'] for msg in page['messages']],
+                         ['Question 1', 'Answer 1', 'Question 2', 'Answer 2'])
+
+        older = json.loads(self.client.get(
+            f"/api/chatbot/history?limit=4&before={page['next_before']}", headers=self.headers
+        ).data)
+        self.assertEqual([msg['content'] for msg in older['messages']], ['Question 0', 'Answer 0'])
+        self.assertIsNone(older['next_before'])
+
+    def test_history_is_trimmed_to_the_newest_messages(self):
+        """Test that saving a turn deletes messages beyond the per-user limit."""
+        with patch('app.chat.history.CHAT_MESSAGES_PER_USER', 4):
+            for i in range(3):
+                append_chat_turn(self.test_phone, f'Question {i}', f'Answer {i}')
+
+        self.assertEqual([msg['content'] for msg in chat_messages_db[self.test_phone]],
+                         ['Question 1', 'Answer 1', 'Question 2', 'Answer 2'])
+
+    def test_async_chat_is_answered_by_a_job(self):
+        """Test queueing a chat request and polling for its result."""
+        self.openai.chat.completions.create.return_value = make_completion('You spent $52.10 on food.')
+
+        response = self.client.post('/api/chatbot/chat', headers=self.headers,
+                                    json={'message': 'Food spend?', 'async': True})
+        self.assertEqual(response.status_code, 202)
+        job = json.loads(response.data)
+
+        status = json.loads(self.client.get(f"{job['status_url']}?wait=5", headers=self.headers).data)
+        self.assertEqual(status, {'job_id': job['job_id'], 'status': 'done', 'response': 'You spent $52.10 on food.'})
+        self.assertEqual(len(chat_messages_db[self.test_phone]), 2)
+
+        with self.app.app_context():
+            other_token = create_access_token(identity='+10987654321')
+        response = self.client.get(job['status_url'], headers={'Authorization': f'Bearer {other_token}'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_repeated_question_is_answered_from_the_response_cache(self):
+        """Test the semantic response cache, its bypass flag and invalidation."""
+        self.openai.chat.completions.create.return_value = make_completion('You spent $52.10 on food.')
+
+        first = self.client.post('/api/chatbot/chat', headers=self.headers,
+                                 json={'message': 'Where does most of my food money go?'})
+        second = self.client.post('/api/chatbot/chat', headers=self.headers,
+                                  json={'message': 'where does most of my food money go'})
+
+        self.assertEqual(first.headers['X-Response-Cache'], 'miss')
+        self.assertEqual(second.headers['X-Response-Cache'], 'hit')
+        self.assertEqual(json.loads(second.data)['response'], 'You spent $52.10 on food.')
+        self.assertEqual(self.openai.chat.completions.create.call_count, 1)
+        self.assertEqual(len(chat_messages_db[self.test_phone]), 4)
+
+        bypass = self.client.post('/api/chatbot/chat', headers=self.headers,
+                                  json={'message': 'Where does most of my food money go?', 'cache': False})
+        self.assertEqual(bypass.headers['X-Response-Cache'], 'bypass')
+
+        # New data means a new data version, so the cached answer no longer applies
+        users_db[self.test_phone]['budgets']['food'] = 650
+        changed = self.client.post('/api/chatbot/chat', headers=self.headers,
+                                   json={'message': 'Where does most of my food money go?'})
+        self.assertEqual(changed.headers['X-Response-Cache'], 'miss')
+        self.assertEqual(self.response_cache.stats()['hits'], 1)
+
+        # A follow-up leans on the conversation, so it is never answered from the cache
+        follow_up = self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Why?'})
+        self.assertEqual(follow_up.headers['X-Response-Cache'], 'bypass')
+
+    def test_model_fetches_market_data_through_concurrent_tool_calls(self):
+        """Test that market questions are answered through tools."""
+        self.upstream['fetch_stock_performance'].return_value = {
+            'TSLA': {'current_price': 250.0, 'percent_change': 3.2, 'high': 255.0, 'low': 240.0, 'volume_avg': 1000}
+        }
+        self.upstream['fetch_market_news'].return_value = [
+            {'id': 'a1', 'title': 'Stocks rally', 'source': 'Wire', 'published_at': '2025-03-01'}
+        ]
+        tool_calls = [
+            make_tool_call('call_1', 'get_stock_performance', {'tickers': ['tsla']}),
+            make_tool_call('call_2', 'get_market_news', {'limit': 2})
+        ]
+        self.openai.chat.completions.create.side_effect = [
+            SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=tool_calls))]),
+            make_completion('TSLA is up 3.2% this week.')
+        ]
+
+        response = self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'How is TSLA doing?'})
+
+        self.assertEqual(json.loads(response.data)['response'], 'TSLA is up 3.2% this week.')
+        self.upstream['fetch_stock_performance'].assert_called_once_with(['TSLA'])
+        self.upstream['fetch_market_news'].assert_called_once_with(limit=2)
+        self.assertFalse(self.upstream['fetch_market_indices'].called)
+
+        first, second = self.openai.chat.completions.create.call_args_list
+        self.assertIn('get_ticker_news', [tool['function']['name'] for tool in first.kwargs['tools']])
+        messages = second.kwargs['messages']
+        self.assertEqual([msg['role'] for msg in messages[-3:]], ['assistant', 'tool', 'tool'])
+        self.assertIn('TSLA: $250.0', messages[-2]['content'])
+        self.assertIn('Stocks rally', messages[-1]['content'])
+
+        # Answers that depend on live market data are not cached
+        self.assertEqual(len(self.response_cache.users), 0)
+
+    def test_model_queries_transactions_locally(self):
+        """Test the query_transactions tool against the user's transactions."""
+        tool_calls = [make_tool_call('call_1', 'query_transactions', {'group_by': 'category'})]
+        self.openai.chat.completions.create.side_effect = [
+            SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=tool_calls))]),
+            make_completion('Food and Drink: $52.10.')
+        ]
+
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Spending by category?'})
+
+        result = json.loads(self.openai.chat.completions.create.call_args.kwargs['messages'][-1]['content'])
+        self.assertEqual(result['groups'], [['Food and Drink', 52.1, 1]])
+        self.assertFalse(any(mock.called for mock in self.upstream.values()))
+        # Local queries depend only on the data version, so the answer is cacheable
+        self.assertEqual(len(self.response_cache.users), 1)
+
+    def test_chat_reads_transactions_from_the_context_snapshot(self):
+        """Test that only the first turn waits for Plaid."""
+        self.openai.chat.completions.create.return_value = make_completion('Noted.')
+
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'First?'})
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Second?'})
+        self.assertEqual(self.plaid.call_count, 1)
+
+        # Relinking the bank account makes the snapshot stale
+        users_db[self.test_phone]['plaid_access_token'] = 'another-access-token'
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Third?'})
+        self.assertEqual(self.plaid.call_count, 2)
+        self.assertEqual(self.plaid.call_args.args[0].access_token, 'another-access-token')
+
+    def test_chat_reports_stage_timings(self):
+        """Test the Server-Timing header, latency histograms and the slow request log."""
+        self.openai.chat.completions.create.return_value = make_completion('Noted.')
+
+        with patch('app.api.routes.chatbot.CHAT_SLOW_REQUEST_MS', 0), \
+                self.assertLogs(self.app.logger, 'WARNING') as logs:
+            response = self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Food spend?'})
+
+        stages = [metric.split(';')[0] for metric in response.headers['Server-Timing'].split(', ')]
+        for stage in ['mongo', 'snapshot', 'prompt', 'openai', 'total']:
+            self.assertIn(stage, stages)
+        self.assertRegex(logs.output[0], r'Slow chat request: \d+ ms, prompt [1-9]\d* tokens \(mongo')
+
+        stats = json.loads(self.client.get('/api/chatbot/latency/stats', headers=self.headers).data)
+        self.assertGreaterEqual(stats['histograms']['chat.openai']['count'], 1)
+
+    def test_templated_question_is_answered_on_the_fast_path(self):
+        """Test that a templated spending question skips the model."""
+        response = self.client.post('/api/chatbot/chat', headers=self.headers,
+                                    json={'message': 'How much did I spend on food this month?'})
+
+        self.assertEqual(response.headers['X-Fast-Path'], 'spending')
+        self.assertIn('$52.10 on food this month', json.loads(response.data)['response'])
+        self.openai.chat.completions.create.assert_not_called()
+        self.assertEqual(len(chat_messages_db[self.test_phone]), 2)
+
+        # Opting out sends the same question to the model
+        self.openai.chat.completions.create.return_value = make_completion('About $52.')
+        response = self.client.post('/api/chatbot/chat', headers=self.headers,
+                                    json={'message': 'How much did I spend on food this month?', 'fast_path': False})
+        self.assertNotIn('X-Fast-Path', response.headers)
+        self.assertEqual(json.loads(response.data)['response'], 'About $52.')
+
+    def test_chat_stream_runs_tool_calls(self):
+        """Test that tool call deltas are assembled and executed while streaming."""
+        def tool_stream():
+            call = SimpleNamespace(index=0, id='call_1', function=SimpleNamespace(name='get_market_indices', arguments=''))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[call]))])
+            more = SimpleNamespace(index=0, id=None, function=SimpleNamespace(name=None, arguments='{}'))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[more]))])
+
+        self.upstream['fetch_market_indices'].return_value = {
+            'S&P 500': {'current_price': 5000.0, 'percent_change': -1.1}
+        }
+        self.openai.chat.completions.create.side_effect = [tool_stream(), make_stream('The S&P 500 ', 'fell 1.1%.')]
+
+        body = self.client.post('/api/chatbot/chat/stream', headers=self.headers,
+                                json={'message': 'How is the market?'}).get_data(as_text=True)
+
+        self.assertIn('event: done\ndata: {"response": "The S&P 500 fell 1.1%."}', body)
+        messages = self.openai.chat.completions.create.call_args.kwargs['messages']
+        self.assertEqual(messages[-2]['tool_calls'][0]['function'], {'name': 'get_market_indices', 'arguments': '{}'})
+        self.assertIn('S&P 500: 5000.0', messages[-1]['content'])
+
+    def test_warm_loads_the_context_before_the_first_message(self):
+        """Test that a warm-up fetches Plaid and market data once and chat reuses it."""
+        from app.api.routes import chatbot
+        with patch.object(chatbot, 'chat_warmer', ContextWarmer(chatbot.warm_chat_context,
+                                                                executor=ImmediateExecutor())):
+            first = self.client.post('/api/chatbot/warm', headers=self.headers)
+            second = self.client.post('/api/chatbot/warm', headers=self.headers)
+
+        self.assertEqual((first.status_code, first.get_json()['status']), (202, 'warming'))
+        self.assertEqual((second.status_code, second.get_json()['status']), (200, 'warm'))
+        self.assertEqual(self.plaid.call_count, 1)
+        self.upstream['fetch_stock_performance'].assert_called_once_with(['AMD', 'TSLA', 'NVDA', 'META'])
+        self.assertEqual(self.upstream['fetch_news_for_ticker'].call_count, 4)
+
+        self.openai.chat.completions.create.return_value = make_completion('Noted.')
+        self.client.post('/api/chatbot/chat', headers=self.headers, json={'message': 'Why is food up?'})
+        self.assertEqual(self.plaid.call_count, 1)
+
+    def test_chat_requires_message(self):
+        """Test a chat request without a message."""
+        response = self.client.post('/api/chatbot/chat', headers=self.headers, json={})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_chat_stream_relays_tokens_and_saves_history(self):
+        """Test the Server-Sent Events variant of chat."""
+        self.openai.chat.completions.create.return_value = make_stream('You spent ', '$52.10', ' on food.')
+
+        response = self.client.post('/api/chatbot/chat/stream', headers=self.headers, json={'message': 'Food spend?'})
+        body = response.get_data(as_text=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith('text/event-stream'))
+        self.assertIn('data: {"delta": "You spent "}', body)
+        self.assertIn('event: done\ndata: {"response": "You spent $52.10 on food."}', body)
+        self.assertTrue(self.openai.chat.completions.create.call_args.kwargs['stream'])
+
+        history = chat_messages_db[self.test_phone]
+        self.assertEqual(history[-1]['content'], 'You spent $52.10 on food.')
+
+    def test_chat_stream_reports_errors_without_saving(self):
+        """Test a stream that fails part-way."""
+        def broken_stream():
+            yield from make_stream('You spent ')
+            raise RuntimeError('connection reset')
+
+        self.openai.chat.completions.create.return_value = broken_stream()
+
+        response = self.client.post('/api/chatbot/chat/stream', headers=self.headers, json={'message': 'Food spend?'})
+        body = response.get_data(as_text=True)
+
+        self.assertIn('event: error', body)
+        self.assertNotIn(self.test_phone, chat_messages_db)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from datetime import date
+from app.chat.fact_sheet import build_fact_sheet, render_fact_sheet
+
+
+TRANSACTIONS = [
+    {'date': '2025-03-02', 'name': 'Grocery Store', 'amount': 40.0, 'category': ['Food and Drink']},
+    {'date': '2025-03-05', 'name': 'Grocery Store', 'amount': 20.0, 'category': ['Food and Drink']},
+    {'date': '2025-03-06', 'name': 'Bookshop', 'amount': 15.0, 'category': ['Shops']},
+    {'date': '2025-02-20', 'name': 'Cinema', 'amount': 12.0, 'category': ['Arts and Entertainment']},
+    {'date': '2025-02-15', 'name': 'Payroll Deposit', 'amount': -1500.0, 'category': ['Transfer']},
+    {'date': '2024-06-01', 'name': 'Old Purchase', 'amount': 99.0, 'category': None}
+]
+
+
+class TestFactSheet(unittest.TestCase):
+    def setUp(self):
+        self.today = date(2025, 3, 10)
+        self.budgets = {'food': 300, 'shopping': 100, 'target_balance': 5000}
+        self.facts = build_fact_sheet(TRANSACTIONS, self.budgets, today=self.today)
+
+    def test_period_totals(self):
+        """Test spend and income per period."""
+        periods = self.facts['periods']
+
+        self.assertEqual(periods['mtd']['spend'], 75.0)
+        self.assertEqual(periods['mtd']['count'], 3)
+        self.assertEqual(periods['last_month']['spend'], 12.0)
+        self.assertEqual(periods['last_month']['income'], 1500.0)
+        self.assertEqual(periods['last_90d']['spend'], 87.0)
+        self.assertEqual(self.facts['transaction_count'], 6)
+
+    def test_category_totals_and_top_merchants(self):
+        """Test per-category spend and merchant ranking."""
+        self.assertEqual(self.facts['categories']['Food and Drink'], {'mtd': 60.0, 'last_30d': 60.0, 'last_90d': 60.0})
+        self.assertNotIn('Uncategorized', self.facts['categories'])
+        self.assertEqual(self.facts['top_merchants'][0], {'name': 'Grocery Store', 'spend': 60.0, 'count': 2})
+        self.assertNotIn('Payroll Deposit', [merchant['name'] for merchant in self.facts['top_merchants']])
+
+    def test_budget_status(self):
+        """Test month-to-date spend against budgets."""
+        food = self.facts['budgets']['food']
+
+        self.assertEqual(food['spent'], 60.0)
+        self.assertEqual(food['remaining'], 240.0)
+        self.assertEqual(food['percent_used'], 20.0)
+        self.assertEqual(food['projected'], 186.0)
+        self.assertNotIn('entertainment', self.facts['budgets'])
+        self.assertEqual(self.facts['target_balance'], 5000.0)
+
+    def test_render(self):
+        """Test the prompt text of a fact sheet."""
+        text = render_fact_sheet(self.facts)
+
+        self.assertIn('- food: spent 60.00 of 300.00 (20% used, 240.00 left, projected 186.00)', text)
+        self.assertIn('Target account balance: 5000.00', text)
+
+    def test_empty(self):
+        """Test a user without transactions or budgets."""
+        text = render_fact_sheet(build_fact_sheet([], today=self.today))
+
+        self.assertIn('No budget information available.', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import time
+import unittest
+from openai import OpenAI
+from app.chat.hedging import RequestHedger
+from tests.fake_openai import FakeOpenAIServer
+
+
+class TestRequestHedger(unittest.TestCase):
+    def start_server(self, **kwargs):
+        server = FakeOpenAIServer(**kwargs).start()
+        self.addCleanup(server.stop)
+        return server, OpenAI(api_key='test', base_url=server.url, max_retries=0)
+
+    def test_slow_request_is_hedged_and_the_hedge_wins(self):
+        """Test that a second request is sent after the delay and answers first."""
+        server, client = self.start_server(delays=[1.0])
+        hedger = RequestHedger(enabled=True, default_delay_ms=100, max_rate=1.0, window=10)
+
+        started = time.perf_counter()
+        completion = hedger.bind(client).chat.completions.create(
+            model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'hi'}]
+        )
+
+        self.assertLess(time.perf_counter() - started, 0.8)
+        self.assertEqual(completion.choices[0].message.content, server.reply)
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual((hedger.hedged, hedger.hedge_wins), (1, 1))
+        # The slow primary is observed too, censored at the time the hedge answered
+        latencies = sorted(hedger._latencies[('gpt-4o-mini', False)])
+        self.assertEqual(len(latencies), 2)
+        self.assertGreaterEqual(latencies[1], 100)
+
+    def test_losing_stream_is_closed(self):
+        """Test that the slower stream's connection is dropped once it answers."""
+        server, client = self.start_server(delays=[0.5], token_delay=0.02,
+                                           reply=' '.join(['word'] * 40))
+        hedger = RequestHedger(enabled=True, default_delay_ms=100, max_rate=1.0, window=10)
+
+        stream = hedger.bind(client).chat.completions.create(
+            model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'hi'}], stream=True
+        )
+        text = ''.join(chunk.choices[0].delta.content or '' for chunk in stream)
+        stream.close()
+
+        self.assertEqual(text, server.reply)
+        deadline = time.time() + 3
+        while server.disconnects < 1 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(server.disconnects, 1)
+        self.assertEqual(hedger.stats()['cancelled'], 1)
+
+    def test_hedge_rate_is_capped(self):
+        """Test that no hedge is sent once the rate cap is used up."""
+        server, client = self.start_server(delays=[0.3] * 3)
+        hedger = RequestHedger(enabled=True, default_delay_ms=50, max_rate=0.1, window=10)
+
+        for _ in range(2):
+            hedger.bind(client).chat.completions.create(model='gpt-4o-mini', messages=[])
+
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual((hedger.hedged, hedger.skipped), (1, 1))
+        self.assertEqual([hedged for hedged, in hedger._recent], [True, False])
+
+    def test_delay_follows_the_latency_percentile(self):
+        """Test the hedge delay before and after enough latencies were observed."""
+        hedger = RequestHedger(enabled=True, percentile=90, default_delay_ms=3000, min_delay_ms=50,
+                               min_samples=10)
+        key = ('gpt-4o-mini', False)
+        self.assertEqual(hedger.delay_ms(key), 3000)
+
+        for ms in range(100, 1100, 100):
+            hedger._observe(key, ms)
+        self.assertEqual(hedger.delay_ms(key), 1000)
+        self.assertEqual(hedger.delay_ms(('gpt-4o', False)), 3000)
+
+    def test_disabled_hedger_returns_the_client(self):
+        """Test that hedging is off unless enabled."""
+        client = object()
+        self.assertIs(RequestHedger(enabled=False).bind(client), client)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import threading
+import unittest
+
+from flask import Flask, jsonify, request
+
+from app.api.idempotency import CONFLICT, FRESH, IN_PROGRESS, REPLAYED, IdempotencyStore, idempotent
+
+
+class TestIdempotencyStore(unittest.TestCase):
+    def setUp(self):
+        self.store = IdempotencyStore(ttl=60, maxsize=16, wait=5)
+        self.calls = 0
+
+    def handler(self, result='done', keep=True):
+        def run():
+            self.calls += 1
+            return f"{result} {self.calls}", keep
+        return run
+
+    def test_repeated_key_is_replayed(self):
+        """Test that a repeated key returns the first result without running again."""
+        self.assertEqual(self.store.run('k', 'body', self.handler()), ('done 1', FRESH))
+        self.assertEqual(self.store.run('k', 'body', self.handler()), ('done 1', REPLAYED))
+        self.assertEqual(self.store.run('other', 'body', self.handler()), ('done 2', FRESH))
+
+    def test_key_reused_for_a_different_request_conflicts(self):
+        """Test that a key sent with another body is refused."""
+        self.store.run('k', 'body', self.handler())
+        self.assertEqual(self.store.run('k', 'other body', self.handler()), (None, CONFLICT))
+        self.assertEqual(self.calls, 1)
+
+    def test_results_not_kept_run_again(self):
+        """Test that a failed result is not replayed to the retry."""
+        self.store.run('k', 'body', self.handler('failed', keep=False))
+        self.assertEqual(self.store.run('k', 'body', self.handler()), ('done 2', FRESH))
+
+    def test_concurrent_duplicate_waits_for_the_running_request(self):
+        """Test that a duplicate arriving mid-request gets the same result without running."""
+        started, release = threading.Event(), threading.Event()
+        results = []
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return self.handler()()
+
+        leader = threading.Thread(target=lambda: results.append(self.store.run('k', 'body', slow)))
+        leader.start()
+        started.wait(5)
+        duplicate = threading.Thread(target=lambda: results.append(self.store.run('k', 'body', self.handler())))
+        duplicate.start()
+        while self.store.stats()['waited'] == 0:
+            threading.Event().wait(0.01)
+        release.set()
+        leader.join(5)
+        duplicate.join(5)
+
+        self.assertEqual(sorted(results, key=lambda result: result[1]), [('done 1', FRESH), ('done 1', REPLAYED)])
+        self.assertEqual(self.calls, 1)
+
+    def test_duplicate_gives_up_after_the_wait(self):
+        """Test that a duplicate is told the request is in progress when it takes too long."""
+        store = IdempotencyStore(ttl=60, maxsize=16, wait=0.05)
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'done', True
+
+        leader = threading.Thread(target=store.run, args=('k', 'body', slow))
+        leader.start()
+        started.wait(5)
+        self.assertEqual(store.run('k', 'body', self.handler()), (None, IN_PROGRESS))
+        release.set()
+        leader.join(5)
+        self.assertEqual(self.calls, 0)
+
+
+class TestIdempotentView(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.calls = 0
+
+        @self.app.route('/orders', methods=['POST'])
+        @idempotent(IdempotencyStore(ttl=60, maxsize=16, wait=5))
+        def orders():
+            self.calls += 1
+            if request.get_json().get('fail'):
+                return jsonify({'error': 'upstream failed'}), 500
+            if request.get_json().get('limited'):
+                return jsonify({'error': 'too many requests'}), 429
+            return jsonify({'order': self.calls}), 201
+
+        @self.app.route('/signup', methods=['POST'])
+        @idempotent(IdempotencyStore(ttl=60, maxsize=16, wait=5), scope=lambda: request.get_json()['phone'])
+        def signup():
+            self.calls += 1
+            return jsonify({'signup': self.calls}), 201
+
+        self.client = self.app.test_client()
+
+    def test_keys_are_scoped(self):
+        """Test that callers in different scopes can use the same key without conflicting."""
+        headers = {'Idempotency-Key': 'signup-1'}
+        first = self.client.post('/signup', headers=headers, json={'phone': '+1555'})
+        other = self.client.post('/signup', headers=headers, json={'phone': '+1666'})
+
+        self.assertEqual((first.status_code, other.status_code), (201, 201))
+        self.assertEqual(other.get_json(), {'signup': 2})
+        self.assertNotIn('Idempotent-Replayed', other.headers)
+
+    def test_view_responses_are_replayed(self):
+        """Test the status, body and replay header of a repeated request."""
+        headers = {'Idempotency-Key': 'order-1'}
+        first = self.client.post('/orders', headers=headers, json={'item': 'a'})
+        retry = self.client.post('/orders', headers=headers, json={'item': 'a'})
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.get_json(), {'order': 1})
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.client.post('/orders', headers=headers, json={'item': 'b'}).status_code, 422)
+
+    def test_requests_without_a_key_and_server_errors_always_run(self):
+        """Test that requests without the header, and retries of a 500 or 429, run again."""
+        self.client.post('/orders', json={'item': 'a'})
+        self.client.post('/orders', json={'item': 'a'})
+        headers = {'Idempotency-Key': 'order-2'}
+        self.client.post('/orders', headers=headers, json={'fail': True})
+        self.client.post('/orders', headers=headers, json={'fail': True})
+        headers = {'Idempotency-Key': 'order-3'}
+        self.client.post('/orders', headers=headers, json={'limited': True})
+        self.client.post('/orders', headers=headers, json={'limited': True})
+
+        self.assertEqual(self.calls, 6)
+        self.assertEqual(self.client.post('/orders', headers={'Idempotency-Key': 'x' * 256}, json={}).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from datetime import date
+from app.chat.fact_sheet import build_fact_sheet
+from app.chat.intents import FastPathMatcher, normalize
+from app.chat.transaction_query import TransactionFrame
+
+
+TODAY = date(2025, 3, 20)
+
+TRANSACTIONS = [
+    {'date': '2025-03-02', 'name': 'Starbucks', 'amount': 5.5, 'category': ['Food and Drink', 'Coffee Shop']},
+    {'date': '2025-03-10', 'name': 'Whole Foods', 'amount': 82.4, 'category': ['Food and Drink', 'Groceries']},
+    {'date': '2025-03-12', 'name': 'Target', 'amount': 40.0, 'category': ['Shops']},
+    {'date': '2025-02-15', 'name': 'Starbucks', 'amount': 6.0, 'category': ['Food and Drink', 'Coffee Shop']},
+    {'date': '2025-02-14', 'name': 'Payroll', 'amount': -2000.0, 'category': ['Transfer', 'Payroll']}
+]
+
+ACCOUNTS = [
+    {'name': 'Checking', 'mask': '0000', 'type': 'depository', 'balances': {'available': 1200.0, 'current': 1250.0}},
+    {'name': 'Savings', 'mask': '1111', 'type': 'depository', 'balances': {'available': None, 'current': 3000.0}},
+    {'name': 'Credit Card', 'mask': '3333', 'type': 'credit', 'balances': {'available': 4500.0, 'current': 500.0}}
+]
+
+
+class TestFastPathMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = FastPathMatcher()
+        self.frame = TransactionFrame(TRANSACTIONS)
+        self.facts = build_fact_sheet(TRANSACTIONS, {'food': 500, 'shopping': 300, 'target_balance': 5000},
+                                      today=TODAY)
+
+    def answer(self, question, accounts=None):
+        return self.matcher.answer(question, self.facts, lambda: self.frame, accounts=accounts, today=TODAY)
+
+    def test_normalize(self):
+        """Test that casing, contractions and filler words are normalized."""
+        self.assertEqual(normalize("Hey Finn, what's my food budget?"), 'what is my food budget')
+
+    def test_spending_by_category_defaults_to_this_month(self):
+        """Test a category spending question without a period."""
+        intent, text = self.answer('How much did I spend on food?')
+        self.assertEqual(intent, 'spending')
+        self.assertIn('$87.90 on food this month', text)
+        self.assertIn('2 transactions', text)
+
+    def test_spending_by_merchant_and_period(self):
+        """Test merchant and subcategory questions over explicit periods."""
+        intent, text = self.answer('How much did I spend at Starbucks last month?')
+        self.assertIn('$6.00 on Starbucks last month', text)
+
+        intent, text = self.answer('How much did I spend on groceries this month?')
+        self.assertIn('$82.40 on groceries', text)
+
+    def test_total_spending(self):
+        """Test a total spending question."""
+        intent, text = self.answer("What's my total spending this month?")
+        self.assertIn('$127.90 in total this month', text)
+
+    def test_budget(self):
+        """Test single and all-budget questions."""
+        intent, text = self.answer('How much is left in my food budget?')
+        self.assertEqual(intent, 'budget')
+        self.assertIn('Food: $87.90 of $500.00 spent this month ($412.10 left', text)
+
+        intent, text = self.answer('How are my budgets doing?')
+        self.assertEqual(len(text.splitlines()), 2)
+
+    def test_balance(self):
+        """Test that balances are listed and cash is compared to the target."""
+        intent, text = self.answer("What's my balance?", accounts=ACCOUNTS)
+        self.assertEqual(intent, 'balance')
+        self.assertIn('Checking (…0000): $1,200.00 available', text)
+        self.assertIn('Cash across checking and savings: $4,200.00', text)
+        self.assertIn('$800.00 below your $5,000.00 target', text)
+
+    def test_falls_back_to_the_model(self):
+        """Test that open-ended and unknown questions are not answered."""
+        self.assertIsNone(self.answer('Should I cut back on coffee?'))
+        self.assertIsNone(self.answer('How much did I spend on yachts this month?'))
+        self.assertIsNone(self.answer('How much did I spend on food compared to last month?'))
+        self.assertIsNone(self.answer("What's my travel budget?"))
+        self.assertIsNone(self.answer("What's my balance?"))
+
+        stats = self.matcher.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from shared.market_data import MarketDataClient, MARKET_TIMEZONE, next_market_close
+from shared.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeAlphaVantage:
+    """Stand-in for requests that records calls and serves canned payloads."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None):
+        self.calls.append((params['function'], params['symbol']))
+        if params['function'] == 'GLOBAL_QUOTE':
+            return FakeResponse({'Global Quote': {'05. price': '100.5', '10. change percent': '-1.25%'}})
+        return FakeResponse({'Time Series (Daily)': {
+            '2025-03-07': {'2. high': '105', '3. low': '98', '6. volume': '1000'},
+            '2025-03-06': {'2. high': '103', '3. low': '97', '6. volume': '3000'}
+        }})
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=4, ttl=10, clock=clock)
+        cache.set('AMD', 1)
+        self.assertEqual(cache.get('AMD'), 1)
+
+        clock.now += 11
+        self.assertIsNone(cache.get('AMD'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('AMD', 1)
+        cache.set('TSLA', 2)
+        cache.get('AMD')
+        cache.set('NVDA', 3)
+
+        self.assertEqual(cache.get('AMD'), 1)
+        self.assertIsNone(cache.get('TSLA'))
+        self.assertEqual(len(cache), 2)
+
+    def test_concurrent_misses_load_once(self):
+        cache = TTLCache(maxsize=4, ttl=10)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'quote'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_load('AMD', loader)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['quote'] * 8)
+
+    def test_none_results_are_not_cached(self):
+        cache = TTLCache(maxsize=4, ttl=10)
+        self.assertIsNone(cache.get_or_load('AMD', lambda: None))
+        self.assertEqual(cache.get_or_load('AMD', lambda: 'quote'), 'quote')
+
+
+class TestMarketDataClient(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeAlphaVantage()
+        self.clock = FakeClock(datetime(2025, 3, 10, 10, 0, tzinfo=MARKET_TIMEZONE).timestamp())
+        self.client = MarketDataClient('demo', quote_ttl=60, request_delay=0,
+                                       session=self.upstream, clock=self.clock)
+
+    def test_stock_performance_uses_cached_quotes_and_series(self):
+        first = self.client.fetch_stock_performance(['AMD'])
+        second = self.client.fetch_stock_performance(['AMD'])
+
+        self.assertEqual(first, second)
+        self.assertEqual(first['AMD'], {
+            'current_price': 100.5,
+            'percent_change': -1.25,
+            'high': 105.0,
+            'low': 97.0,
+            'volume_avg': 2000
+        })
+        self.assertEqual(len(self.upstream.calls), 2)
+
+    def test_quotes_refresh_after_ttl_but_series_waits_for_close(self):
+        self.client.fetch_stock_performance(['AMD'])
+        self.clock.now += 120
+        self.client.fetch_stock_performance(['AMD'])
+
+        functions = [function for function, _ in self.upstream.calls]
+        self.assertEqual(functions.count('GLOBAL_QUOTE'), 2)
+        self.assertEqual(functions.count('TIME_SERIES_DAILY_ADJUSTED'), 1)
+
+    def test_market_indices_share_the_quote_cache(self):
+        self.client.fetch_market_indices()
+        self.client.fetch_stock_performance(['SPY'])
+
+        self.assertEqual(self.upstream.calls.count(('GLOBAL_QUOTE', 'SPY')), 1)
+
+    def test_next_market_close_skips_weekends(self):
+        friday_evening = datetime(2025, 3, 7, 18, 0, tzinfo=MARKET_TIMEZONE)
+        close = next_market_close(friday_evening)
+
+        self.assertEqual(close.weekday(), 0)
+        self.assertEqual((close.hour, close.minute), (16, 15))
+
+
+if __name__ == '__main__':
+    unittest.main()
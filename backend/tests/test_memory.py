@@ -0,0 +1,107 @@
+import unittest
+from datetime import datetime, timedelta
+from app.database import users_db, chat_messages_db
+from app.chat.memory import ConversationMemory
+
+
+class ImmediateExecutor:
+    """Runs submitted work on the calling thread."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class TestConversationMemory(unittest.TestCase):
+    def setUp(self):
+        self.phone = '+11234567890'
+        users_db.clear()
+        chat_messages_db.clear()
+        users_db[self.phone] = {'phone_number': self.phone}
+
+        self.calls = []
+
+        def summarize(previous, messages):
+            self.calls.append((previous, [msg['content'] for msg in messages]))
+            return f"{previous} + {len(messages)} messages".strip(' +')
+
+        self.memory = ConversationMemory(summarize, window=4, batch=3, executor=ImmediateExecutor())
+
+    def tearDown(self):
+        users_db.clear()
+        chat_messages_db.clear()
+
+    def add_messages(self, count):
+        messages = chat_messages_db.setdefault(self.phone, [])
+        base = len(messages)
+        start = datetime(2025, 3, 1, 12, 0, 0)
+        messages.extend(
+            {'phone_number': self.phone, 'role': 'user' if i % 2 == 0 else 'assistant',
+             'content': f'm{i}', 'ts': start + timedelta(seconds=i)}
+            for i in range(base, base + count)
+        )
+
+    def test_nothing_to_summarize_within_window(self):
+        """Test that short conversations are left alone."""
+        self.add_messages(4)
+
+        self.assertEqual(self.memory.update(self.phone), 0)
+        self.assertEqual(self.calls, [])
+        self.assertNotIn('chat_summary', users_db[self.phone])
+
+    def test_older_messages_are_folded_into_summary_in_batches(self):
+        """Test incremental summarization of messages that left the window."""
+        self.add_messages(9)
+
+        self.assertEqual(self.memory.update(self.phone), 3)
+        self.assertEqual(self.calls[-1], ('', ['m0', 'm1', 'm2']))
+        self.assertEqual(self.memory.update(self.phone), 2)
+        self.assertEqual(self.calls[-1], ('3 messages', ['m3', 'm4']))
+        self.assertEqual(self.memory.update(self.phone), 0)
+
+        summary = users_db[self.phone]['chat_summary']
+        self.assertEqual(summary['messages'], 5)
+        self.assertEqual(summary['text'], '3 messages + 2 messages')
+
+    def test_context_returns_summary_and_unsummarized_messages(self):
+        """Test what the prompt gets after a summary exists."""
+        self.add_messages(6)
+        self.memory.schedule_update(self.phone)
+
+        summary, messages = self.memory.context(self.phone, users_db[self.phone])
+
+        self.assertEqual(summary, '2 messages')
+        self.assertEqual([msg['content'] for msg in messages], ['m2', 'm3', 'm4', 'm5'])
+
+    def test_context_keeps_messages_the_summary_has_not_caught_up_with(self):
+        """Test that messages past the window are kept while the summary lags behind."""
+        self.add_messages(6)
+        self.memory.update(self.phone)
+        # More turns arrive before the next update
+        self.add_messages(3)
+
+        summary, messages = self.memory.context(self.phone, users_db[self.phone])
+
+        self.assertEqual(summary, '2 messages')
+        self.assertEqual([msg['content'] for msg in messages], [f'm{i}' for i in range(2, 9)])
+
+        # Beyond a batch past the window, the oldest unsummarized messages are left to the next update
+        self.add_messages(4)
+        _, messages = self.memory.context(self.phone, users_db[self.phone])
+        self.assertEqual([msg['content'] for msg in messages], [f'm{i}' for i in range(6, 13)])
+
+    def test_failed_update_keeps_previous_summary(self):
+        """Test that summarizer errors are contained in the background task."""
+        def broken(previous, messages):
+            raise RuntimeError('rate limited')
+
+        memory = ConversationMemory(broken, window=2, executor=ImmediateExecutor())
+        self.add_messages(4)
+
+        memory.schedule_update(self.phone)
+
+        self.assertNotIn('chat_summary', users_db[self.phone])
+        self.assertEqual(memory._in_flight, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
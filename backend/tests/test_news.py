@@ -0,0 +1,112 @@
+import unittest
+
+from shared.news import NewsClient, dedupe_articles
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeNewsAPI:
+    """Stand-in for requests that returns a syndicated duplicate in every response."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, params=None):
+        self.calls += 1
+        article = {'title': 'Chips rally', 'source': {'name': 'Wire'}, 'url': 'https://example.com/chips',
+                   'publishedAt': '2025-03-07T12:00:00Z'}
+        return FakeResponse({'status': 'ok', 'articles': [
+            article,
+            dict(article, source={'name': 'Reprint'}),
+            {'title': 'Fed holds rates', 'source': {'name': 'Wire'}, 'url': 'https://example.com/fed',
+             'publishedAt': '2025-03-07T11:00:00Z'}
+        ]})
+
+
+class FakeStore:
+    """Minimal collection with the find_one/update_one calls the cache uses."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query):
+        return self.docs.get(query['_id'])
+
+    def update_one(self, query, update, upsert=False):
+        self.docs[query['_id']] = {'_id': query['_id'], **update['$set']}
+
+
+class TestNewsClient(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = FakeStore()
+        self.upstream = FakeNewsAPI()
+
+    def make_client(self, session=None):
+        return NewsClient('key', store=self.store, ticker_ttl=600, market_ttl=60,
+                          session=session or self.upstream, clock=self.clock)
+
+    def test_repeated_queries_hit_the_cache(self):
+        client = self.make_client()
+        first = client.fetch_news_for_ticker('AMD', limit=3)
+        second = client.fetch_news_for_ticker('amd ', limit=3)
+
+        self.assertEqual(self.upstream.calls, 1)
+        self.assertIs(first, second)
+
+    def test_duplicate_articles_are_removed(self):
+        articles = self.make_client().fetch_market_news(limit=3)
+
+        self.assertEqual([article['title'] for article in articles], ['Chips rally', 'Fed holds rates'])
+
+    def test_market_news_uses_its_own_ttl(self):
+        client = self.make_client()
+        client.fetch_market_news()
+        client.fetch_news_for_ticker('AMD')
+
+        self.clock.now += 120
+        client.fetch_market_news()
+        client.fetch_news_for_ticker('AMD')
+
+        self.assertEqual(self.upstream.calls, 3)
+
+    def test_other_processes_reuse_the_shared_store(self):
+        self.make_client().fetch_market_news()
+
+        other_upstream = FakeNewsAPI()
+        articles = self.make_client(session=other_upstream).fetch_market_news()
+
+        self.assertEqual(other_upstream.calls, 0)
+        self.assertEqual(len(articles), 2)
+
+    def test_dedupe_against_seen_keys(self):
+        market = self.make_client().fetch_market_news()
+        seen = {article['id'] for article in market}
+
+        self.assertEqual(dedupe_articles(market, seen), [])
+
+    def test_missing_api_key_skips_fetch(self):
+        client = NewsClient(None, session=self.upstream)
+
+        self.assertEqual(client.fetch_market_news(), [])
+        self.assertEqual(self.upstream.calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from app.chat.prompt_budget import KEEP, KEEP_HEAD, KEEP_TAIL, DROP, PromptSection, fit_prompt
+
+
+def count_words(text):
+    """Deterministic stand-in for tiktoken: one token per word."""
+    return len(text.split())
+
+
+class TestFitPrompt(unittest.TestCase):
+    def make_sections(self):
+        return [
+            PromptSection('instructions', ['be brief and accurate'], priority=0, policy=KEEP),
+            PromptSection('transactions', ['tx one', 'tx two', 'tx three', 'tx four'], priority=2, policy=KEEP_HEAD),
+            PromptSection('history', ['old turn', 'mid turn', 'new turn'], priority=3, policy=KEEP_TAIL),
+            PromptSection('news', ['headline one', 'headline two'], priority=4, policy=DROP)
+        ]
+
+    def test_everything_fits_within_budget(self):
+        plan = fit_prompt(self.make_sections(), budget=100, counter=count_words)
+
+        self.assertEqual(plan.total_tokens, 4 + 8 + 6 + 4)
+        self.assertFalse(any(entry['truncated'] for entry in plan.report.values()))
+
+    def test_lowest_priority_sections_are_trimmed_first(self):
+        plan = fit_prompt(self.make_sections(), budget=16, counter=count_words)
+
+        self.assertEqual(plan.kept('news'), [])
+        self.assertEqual(plan.kept('history'), ['mid turn', 'new turn'])
+        self.assertEqual(plan.kept('transactions'), ['tx one', 'tx two', 'tx three', 'tx four'])
+        self.assertLessEqual(plan.total_tokens, 16)
+
+    def test_head_policy_keeps_the_first_items(self):
+        plan = fit_prompt(self.make_sections(), budget=8, counter=count_words)
+
+        self.assertEqual(plan.kept('history'), [])
+        self.assertEqual(plan.kept('transactions'), ['tx one', 'tx two'])
+        self.assertEqual(plan.report['transactions'], {
+            'tokens': 4, 'original_tokens': 8, 'items': 2, 'original_items': 4, 'truncated': True
+        })
+
+    def test_keep_sections_are_never_truncated(self):
+        plan = fit_prompt(self.make_sections(), budget=1, counter=count_words)
+
+        self.assertEqual(plan.kept('instructions'), ['be brief and accurate'])
+        self.assertEqual(plan.total_tokens, 4)
+
+    def test_render_includes_header(self):
+        section = PromptSection.from_text('transactions', 'tx one\ntx two\n', header='Transactions:\n')
+        plan = fit_prompt([section], budget=100, counter=count_words)
+
+        self.assertEqual(plan.render('transactions'), 'Transactions:\ntx one\ntx two')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import threading
+import unittest
+
+from shared.prompt_fragments import PromptFragmentCache, format_news_for_prompt, format_stock_performance
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CountingRenderer:
+    def __init__(self, text='fragment', complete=True):
+        self.text = text
+        self.complete = complete
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"{self.text} {self.calls}", self.complete
+
+
+class TestPromptFragmentCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.fragments = PromptFragmentCache(tick=300, maxsize=16, clock=self.clock)
+
+    def test_rendered_once_per_tick_and_ticker_set(self):
+        """Test that the same ticker set in any order reuses the fragment until the tick ends."""
+        render = CountingRenderer()
+
+        self.assertEqual(self.fragments.get('performance', ['AAPL', 'MSFT'], render), 'fragment 1')
+        self.assertEqual(self.fragments.get('performance', ['MSFT', 'AAPL', 'AAPL'], render), 'fragment 1')
+        self.assertEqual(render.calls, 1)
+
+        self.fragments.get('performance', ['AAPL'], render)
+        self.assertEqual(render.calls, 2)
+
+        # The next tick is a new data version
+        self.clock.now = (self.fragments.data_version() + 1) * 300
+        self.assertEqual(self.fragments.get('performance', ['AAPL', 'MSFT'], render), 'fragment 3')
+
+    def test_kinds_and_explicit_versions_are_separate(self):
+        """Test that kinds and passed data versions key separate fragments."""
+        render = CountingRenderer()
+
+        self.fragments.get('news:2', ['AAPL'], render)
+        self.fragments.get('news:4', ['AAPL'], render)
+        self.fragments.get('news:2', ['AAPL'], render, version='v1')
+        self.fragments.get('news:2', ['AAPL'], render, version='v1')
+        self.assertEqual(render.calls, 3)
+        self.assertEqual(self.fragments.stats()['hits'], 1)
+
+    def test_incomplete_fragments_are_returned_but_not_cached(self):
+        """Test that text rendered after an upstream failure is used once and rendered again next time."""
+        render = CountingRenderer(complete=False)
+
+        self.assertEqual(self.fragments.get('indices', [], render), 'fragment 1')
+        self.assertEqual(self.fragments.get('indices', [], render), 'fragment 2')
+
+    def test_waiting_requests_share_an_incomplete_render(self):
+        """Test that requests arriving mid-render get its text even when it is not cached."""
+        started, release = threading.Event(), threading.Event()
+        render = CountingRenderer(complete=False)
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return render()
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(self.fragments.get('indices', [], slow)))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(self.fragments.get('indices', [], render)))
+        follower.start()
+        follower.join(0.1)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(results, ['fragment 1', 'fragment 1'])
+        self.assertEqual(render.calls, 1)
+
+
+class TestFormatters(unittest.TestCase):
+    def test_stock_performance(self):
+        """Test indices, stocks and tickers that failed to load."""
+        text = format_stock_performance(
+            {
+                'AAPL': {'current_price': 190.5, 'percent_change': -1.2, 'low': 185.0, 'high': 195.0, 'volume_avg': 5000000},
+                'XYZ': {'error': 'No data available'}
+            },
+            {'S&P 500': {'current_price': 5100.25, 'percent_change': 0.8}}
+        )
+
+        self.assertIn("S&P 500: 5100.25 (↑0.8%)", text)
+        self.assertIn("AAPL: $190.5 (↓1.2%)\n  Weekly Range: $185.0 - $195.0\n  Average Volume: 5,000,000", text)
+        self.assertIn("XYZ: No data available", text)
+
+    def test_news(self):
+        """Test market headlines, truncated content and ticker news."""
+        article = {'title': 'Stocks rally', 'source': 'Wire', 'description': 'Up', 'published_at': '2026-10-01',
+                   'content': 'Markets rose [+120 chars]'}
+        text = format_news_for_prompt({'AAPL': [article], 'MSFT': []}, [article])
+
+        self.assertIn("1. Stocks rally - Wire\n   Up\n   Content: Markets rose \n", text)
+        self.assertIn("\nAAPL News:\n", text)
+        self.assertNotIn("MSFT News", text)
+        self.assertIn("No recent market news available.", format_news_for_prompt({}, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from app.chat.response_cache import (
+    SemanticResponseCache, embed_question, is_follow_up, normalize_question, question_qualifiers
+)
+from app.chat.transaction_index import HashingEmbeddingProvider
+
+
+class TestSemanticResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticResponseCache(HashingEmbeddingProvider(), threshold=0.9, per_user=2)
+        self.key = SemanticResponseCache.cache_key('v1', 'gpt-4o-mini', {'temperature': 0.7})
+
+    def remember(self, question, response, key=None, user='+11234567890'):
+        _, vector = self.cache.lookup(user, question, key or self.key)
+        self.cache.store(user, question, vector, response, key or self.key)
+
+    def test_normalize_question(self):
+        """Test that case, punctuation and spacing are ignored."""
+        self.assertEqual(normalize_question('  How much did I spend on FOOD?! '), 'how much did i spend on food')
+        self.assertEqual(normalize_question('Spend over $50.25?'), 'spend over $50.25')
+
+    def test_similar_question_hits(self):
+        """Test a hit for a rephrased question and a miss for a different one."""
+        self.remember('How much did I spend on food this month?', 'About $300.')
+
+        self.assertEqual(self.cache.lookup('+11234567890', 'how much did I spend on food this month', self.key)[0],
+                         'About $300.')
+        self.assertIsNone(self.cache.lookup('+11234567890', 'What is my biggest subscription?', self.key)[0])
+        self.assertIsNone(self.cache.lookup('+10987654321', 'How much did I spend on food this month?', self.key)[0])
+
+    def test_questions_about_other_periods_miss(self):
+        """Test that near-identical questions with different numbers or periods never share an answer."""
+        cache = SemanticResponseCache(HashingEmbeddingProvider(), threshold=0.5)
+        question = 'How much did I spend on groceries over the past 30 days?'
+        _, vector = cache.lookup('+11234567890', question, self.key)
+        cache.store('+11234567890', question, vector, '$210.', self.key)
+
+        self.assertIsNone(cache.lookup('+11234567890', question.replace('30', '90'), self.key)[0])
+        self.assertIsNone(cache.lookup('+11234567890', 'How much did I spend on groceries in March?', self.key)[0])
+        self.assertEqual(cache.lookup('+11234567890', 'how much did i spend on groceries over the past 30 days',
+                                      self.key)[0], '$210.')
+        self.assertEqual(question_qualifiers(question), ('past', '30', 'days'))
+
+    def test_lookup_reuses_a_given_embedding(self):
+        """Test that a question embedded for retrieval is not embedded again."""
+        provider = HashingEmbeddingProvider()
+        vector = embed_question(provider, 'Any refunds?')
+        provider.embed = None
+
+        cache = SemanticResponseCache(provider)
+        self.assertEqual(cache.lookup('+11234567890', 'Any refunds?', self.key, vector=vector), (None, vector))
+
+    def test_follow_ups(self):
+        """Test which questions depend on the conversation before them."""
+        self.assertTrue(is_follow_up('Why?'))
+        self.assertTrue(is_follow_up('And last month?'))
+        self.assertTrue(is_follow_up('How much was that in total?'))
+        self.assertFalse(is_follow_up('How much did I spend on food this month?'))
+
+    def test_new_key_drops_old_answers(self):
+        """Test that answers for an older data version are never served."""
+        self.remember('How much did I spend on food this month?', 'About $300.')
+        new_key = SemanticResponseCache.cache_key('v2', 'gpt-4o-mini', {'temperature': 0.7})
+
+        self.assertIsNone(self.cache.lookup('+11234567890', 'How much did I spend on food this month?', new_key)[0])
+        self.remember('Any refunds?', 'One refund.', key=new_key)
+        self.assertIsNone(self.cache.lookup('+11234567890', 'How much did I spend on food this month?', self.key)[0])
+
+    def test_per_user_limit_and_stats(self):
+        """Test eviction of the oldest answers and the hit rate."""
+        self.remember('How much did I spend on food this month?', 'About $300.')
+        self.remember('What is my biggest subscription?', 'Netflix.')
+        self.remember('Did I get paid this week?', 'Yes.')
+
+        self.assertIsNone(self.cache.lookup('+11234567890', 'How much did I spend on food this month?', self.key)[0])
+        self.assertEqual(self.cache.lookup('+11234567890', 'Did I get paid this week?', self.key)[0], 'Yes.')
+        self.cache.record_bypass()
+
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['bypasses']), (1, 4, 1))
+        self.assertEqual(stats['hit_rate'], 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from app.chat.router import COMPLEX, MODERATE, SIMPLE, ModelRouter, classify_message
+
+
+class TestClassifyMessage(unittest.TestCase):
+    def test_classes(self):
+        """Test that wording and prompt size raise the complexity."""
+        self.assertEqual(classify_message('Thanks!')[0], SIMPLE)
+        self.assertEqual(classify_message('What did I buy yesterday?')[0], SIMPLE)
+        self.assertEqual(classify_message('Should I cut back on dining out?')[0], MODERATE)
+        self.assertEqual(classify_message(
+            'Can you analyze my spending trend and recommend a plan to pay off my debt? What should I reduce first?'
+        )[0], COMPLEX)
+        self.assertEqual(classify_message('Why is food up?', prompt_tokens=5000)[0], MODERATE)
+
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = ModelRouter(tiers=['gpt-4o-mini', 'gpt-4o'], slo_ms=20000)
+
+    def test_user_setting_is_the_ceiling(self):
+        """Test tier selection below the user's model setting."""
+        complex_question = 'Compare my spending trend and recommend a strategy to invest more?'
+
+        route = self.router.route('What did I buy yesterday?', 1000, ceiling='gpt-4o')
+        self.assertEqual((route['model'], route['max_tokens']), ('gpt-4o-mini', 200))
+
+        self.assertEqual(self.router.route(complex_question, 1000, ceiling='gpt-4o')['model'], 'gpt-4o')
+        self.assertEqual(self.router.route(complex_question, 1000, ceiling='gpt-4o-mini')['model'], 'gpt-4o-mini')
+        # Models outside the tiers are kept as configured
+        self.assertEqual(self.router.route(complex_question, 1000, ceiling='gpt-4-turbo')['model'], 'gpt-4-turbo')
+
+    def test_slo_steps_down_a_tier_then_shortens_answers(self):
+        """Test that the latency SLO limits the tier and then max_tokens."""
+        complex_question = 'Compare my spending trend and recommend a strategy to invest more?'
+        self.router.slo_ms = 10000
+        route = self.router.route(complex_question, 1000, ceiling='gpt-4o')
+        self.assertEqual((route['model'], route['max_tokens']), ('gpt-4o-mini', 700))
+
+        self.router.slo_ms = 3000
+        route = self.router.route(complex_question, 1000, ceiling='gpt-4o')
+        self.assertEqual(route['model'], 'gpt-4o-mini')
+        self.assertLess(route['max_tokens'], 700)
+        self.assertLessEqual(route['estimated_ms'], 3000)
+
+    def test_observed_latency_updates_estimates_and_stats(self):
+        """Test that recorded latencies scale later estimates."""
+        route = self.router.route('What did I buy yesterday?', 1000, ceiling='gpt-4o')
+        before = self.router.estimate_ms('gpt-4o-mini', 1000, 200)
+
+        self.router.record(route, observed_ms=2 * before, completion_tokens=200)
+
+        self.assertAlmostEqual(self.router.estimate_ms('gpt-4o-mini', 1000, 200), 2 * before)
+        stats = self.router.stats()
+        self.assertEqual(stats['models']['gpt-4o-mini']['requests'], 1)
+        self.assertEqual(stats['complexity'], {SIMPLE: 1})
+        self.assertEqual(stats['recent'][0]['observed_ms'], round(2 * before))
+
+
+if __name__ == '__main__':
+    unittest.main()
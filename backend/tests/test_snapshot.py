@@ -0,0 +1,96 @@
+import unittest
+from app.chat.snapshot import ContextSnapshots
+
+
+class ImmediateExecutor:
+    """Runs submitted work on the calling thread."""
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+class RecordingExecutor:
+    """Holds submitted work until run_all is called."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+    def run_all(self):
+        for fn, args in self.submitted:
+            fn(*args)
+        self.submitted = []
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestContextSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.loads = []
+        self.snapshots = ContextSnapshots(self.load, max_age=60, active_window=3600, refresh_interval=0,
+                                          executor=ImmediateExecutor(), clock=self.clock)
+
+    def load(self, phone_number):
+        self.loads.append(phone_number)
+        return {'version': len(self.loads), 'transactions': []}
+
+    def test_snapshot_is_loaded_once_and_served(self):
+        """Test that only the first read waits for the loader."""
+        first = self.snapshots.get('+1555')
+        second = self.snapshots.get('+1555')
+
+        self.assertIs(first, second)
+        self.assertEqual(self.loads, ['+1555'])
+        self.assertEqual(self.snapshots.stats()['hits'], 1)
+
+    def test_old_snapshot_is_served_then_refreshed(self):
+        """Test that an old snapshot is still used while it is refreshed."""
+        self.snapshots.get('+1555')
+        self.clock.now += 61
+        self.snapshots.executor = RecordingExecutor()
+
+        served = self.snapshots.get('+1555')
+
+        self.assertEqual(served['version'], 1)
+        self.assertEqual(len(self.snapshots.executor.submitted), 1)
+        self.snapshots.executor.run_all()
+        self.assertEqual(self.snapshots.get('+1555')['version'], 2)
+
+    def test_rejected_snapshot_is_reloaded(self):
+        """Test that a snapshot failing is_current is not used."""
+        self.snapshots.get('+1555')
+        snapshot = self.snapshots.get('+1555', is_current=lambda snapshot: snapshot['version'] > 1)
+        self.assertEqual(snapshot['version'], 2)
+
+    def test_refresh_active_skips_idle_users(self):
+        """Test the periodic refresh of recently active users."""
+        self.snapshots.get('+1555')
+        self.clock.now += 3000
+        self.snapshots.get('+1666')
+        self.clock.now += 1000
+
+        self.assertEqual(self.snapshots.refresh_active(), 1)
+        self.assertEqual(self.loads, ['+1555', '+1666', '+1666'])
+
+    def test_failed_refresh_keeps_the_previous_snapshot(self):
+        """Test that a loader error does not drop the snapshot."""
+        self.snapshots.get('+1555')
+        self.snapshots.load = lambda phone_number: 1 / 0
+
+        self.snapshots.schedule_refresh('+1555')
+
+        self.assertEqual(self.snapshots.get('+1555')['version'], 1)
+        self.assertEqual(self.snapshots.stats()['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from app.chat.timing import LatencyHistograms, StageTimer, timed
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStageTimer(unittest.TestCase):
+    def test_stages_accumulate_and_format_as_server_timing(self):
+        """Test repeated stages and the Server-Timing header value."""
+        clock = FakeClock()
+        timer = StageTimer(clock=clock)
+
+        with timer.stage('plaid'):
+            clock.now += 0.2
+        for _ in range(2):
+            with timer.stage('openai'):
+                clock.now += 0.5
+        timer.add('alpha vantage', 0.05)
+
+        self.assertEqual(timer.breakdown(), {'plaid': 200.0, 'openai': 1000.0, 'alpha vantage': 50.0})
+        self.assertEqual(timer.server_timing(),
+                         'plaid;dur=200.0, openai;dur=1000.0, alpha_vantage;dur=50.0, total;dur=1200.0')
+
+    def test_stage_is_recorded_when_the_block_raises(self):
+        """Test that a failing stage still counts."""
+        clock = FakeClock()
+        timer = StageTimer(clock=clock)
+        with self.assertRaises(ValueError):
+            with timed(timer, 'mongo'):
+                clock.now += 0.01
+                raise ValueError('down')
+        self.assertEqual(timer.breakdown(), {'mongo': 10.0})
+
+        with timed(None, 'mongo'):
+            pass
+
+
+class TestLatencyHistograms(unittest.TestCase):
+    def test_percentiles_use_bucket_bounds(self):
+        """Test counts, mean and bucketed percentiles."""
+        histograms = LatencyHistograms(buckets=(10, 100, 1000))
+        for ms in [5] * 90 + [50] * 8 + [500, 5000]:
+            histograms.observe('chat.openai', ms)
+
+        stats = histograms.snapshot()['chat.openai']
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual((stats['p50_ms'], stats['p95_ms'], stats['p99_ms']), (10, 100, 1000))
+        self.assertEqual(stats['max_ms'], 5000)
+        self.assertEqual(stats['mean_ms'], round((450 + 400 + 500 + 5000) / 100, 1))
+
+    def test_observe_timer_records_total_and_stages(self):
+        """Test that a finished request feeds one histogram per stage."""
+        clock = FakeClock()
+        timer = StageTimer(clock=clock)
+        with timer.stage('plaid'):
+            clock.now += 0.3
+
+        histograms = LatencyHistograms()
+        histograms.observe_timer('chat', timer)
+
+        self.assertEqual(sorted(histograms.snapshot()), ['chat.plaid', 'chat.total'])
+
+
+if __name__ == '__main__':
+    unittest.main()
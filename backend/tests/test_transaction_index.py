@@ -0,0 +1,124 @@
+import unittest
+from datetime import date
+
+import numpy as np
+
+from app.chat.transaction_index import (
+    HashingEmbeddingProvider, TransactionIndex, TransactionRetriever, infer_filters
+)
+
+
+class CountingProvider(HashingEmbeddingProvider):
+    """Local provider that records how many texts it embedded."""
+
+    def __init__(self):
+        super().__init__(dim=128)
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+TRANSACTIONS = [
+    {'transaction_id': 'tx1', 'date': '2025-03-05', 'name': 'Whole Foods Market', 'amount': 82.4,
+     'category': ['Food and Drink', 'Groceries']},
+    {'transaction_id': 'tx2', 'date': '2025-02-14', 'name': 'Uber Trip', 'amount': 23.1,
+     'category': ['Travel', 'Taxi']},
+    {'transaction_id': 'tx3', 'date': '2024-11-20', 'name': 'Whole Foods Market', 'amount': 64.0,
+     'category': ['Food and Drink', 'Groceries']},
+    {'transaction_id': 'tx4', 'date': '2025-03-01', 'name': 'Netflix', 'amount': 15.99,
+     'category': ['Service', 'Subscription']}
+]
+
+
+class TestTransactionIndex(unittest.TestCase):
+    def setUp(self):
+        self.provider = CountingProvider()
+        self.index = TransactionIndex()
+        self.index.add(TRANSACTIONS, self.provider)
+
+    def test_matrix_is_contiguous_normalized_float32(self):
+        self.assertEqual(self.index.matrix.dtype, np.float32)
+        self.assertTrue(self.index.matrix.flags['C_CONTIGUOUS'])
+        np.testing.assert_allclose(np.linalg.norm(self.index.matrix, axis=1), 1.0, rtol=1e-5)
+
+    def test_transactions_are_embedded_once(self):
+        added = self.index.add(TRANSACTIONS + [
+            {'transaction_id': 'tx5', 'date': '2025-03-06', 'name': 'Shell', 'amount': 40.0, 'category': ['Travel']}
+        ], self.provider)
+
+        self.assertEqual(added, 1)
+        self.assertEqual(self.provider.embedded, 5)
+        self.assertEqual(self.index.matrix.shape[0], 5)
+
+    def test_sync_drops_transactions_that_are_gone(self):
+        """Test that removed transactions, and pending ones re-issued on posting, leave the index."""
+        posted = {**TRANSACTIONS[1], 'transaction_id': 'tx2-posted'}
+        added = self.index.sync([TRANSACTIONS[0], posted, TRANSACTIONS[3]], self.provider, version='v2')
+
+        self.assertEqual(added, 1)
+        self.assertEqual([tx['transaction_id'] for tx in self.index.transactions], ['tx1', 'tx4', 'tx2-posted'])
+        self.assertEqual(self.index.matrix.shape[0], 3)
+        self.assertEqual(len(self.index.dates), 3)
+        query = self.provider.embed(['uber trip'])[0]
+        self.assertEqual(self.index.search(query, k=1)[0][0]['transaction_id'], 'tx2-posted')
+        self.assertNotIn('tx2-posted', [tx['transaction_id'] for tx, _ in
+                                        self.index.search(query, k=3, exclude_ids={'tx2-posted'})])
+
+        # The same version is not synced again
+        self.assertEqual(self.index.sync([], self.provider, version='v2'), 0)
+        self.assertEqual(len(self.index), 3)
+
+    def test_search_ranks_by_similarity(self):
+        query = self.provider.embed(['whole foods groceries'])[0]
+        results = self.index.search(query, k=2)
+
+        self.assertEqual({tx['transaction_id'] for tx, _ in results}, {'tx1', 'tx3'})
+
+    def test_search_applies_prefilters(self):
+        query = self.provider.embed(['whole foods groceries'])[0]
+
+        by_date = self.index.search(query, k=5, start_date=date(2025, 1, 1))
+        self.assertNotIn('tx3', [tx['transaction_id'] for tx, _ in by_date])
+
+        by_category = self.index.search(query, k=5, categories=['Travel'])
+        self.assertEqual([tx['transaction_id'] for tx, _ in by_category], ['tx2'])
+
+        excluded = self.index.search(query, k=5, exclude_ids={'tx1'})
+        self.assertNotIn('tx1', [tx['transaction_id'] for tx, _ in excluded])
+
+
+class TestInferFilters(unittest.TestCase):
+    today = date(2025, 3, 10)
+
+    def test_relative_periods(self):
+        self.assertEqual(infer_filters('spend this month?', [], self.today)['start_date'], date(2025, 3, 1))
+        last_month = infer_filters('what about last month', [], self.today)
+        self.assertEqual((last_month['start_date'], last_month['end_date']), (date(2025, 2, 1), date(2025, 2, 28)))
+        self.assertEqual(infer_filters('past 30 days', [], self.today)['start_date'], date(2025, 2, 8))
+
+    def test_month_names_resolve_to_most_recent_occurrence(self):
+        filters = infer_filters('What did I buy in November?', [], self.today)
+
+        self.assertEqual((filters['start_date'], filters['end_date']), (date(2024, 11, 1), date(2024, 11, 30)))
+        self.assertIsNone(infer_filters('May I see my spending?', [], self.today)['start_date'])
+
+    def test_categories_are_matched_by_word(self):
+        filters = infer_filters('How much on food?', ['Food and Drink', 'Travel'], self.today)
+
+        self.assertEqual(filters['categories'], ['Food and Drink'])
+
+
+class TestTransactionRetriever(unittest.TestCase):
+    def test_falls_back_to_unfiltered_search(self):
+        retriever = TransactionRetriever(HashingEmbeddingProvider())
+        retriever.ingest('+11234567890', TRANSACTIONS)
+
+        results = retriever.retrieve('+11234567890', 'uber rides in december', k=1, today=date(2025, 3, 10))
+
+        self.assertEqual([tx['transaction_id'] for tx in results], ['tx2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
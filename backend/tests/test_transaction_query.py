@@ -0,0 +1,75 @@
+import unittest
+from app.chat.transaction_query import TransactionFrame
+
+
+TRANSACTIONS = [
+    {'date': '2025-01-06', 'name': 'Starbucks', 'amount': 5.5, 'category': ['Food and Drink', 'Coffee Shop']},
+    {'date': '2025-01-08', 'name': 'Starbucks', 'amount': 6.0, 'category': ['Food and Drink', 'Coffee Shop']},
+    {'date': '2025-01-20', 'name': 'Whole Foods', 'amount': 82.4, 'category': ['Food and Drink', 'Groceries']},
+    {'date': '2025-02-03', 'name': 'Uber', 'amount': 23.1, 'category': ['Travel', 'Taxi']},
+    {'date': '2025-02-14', 'name': 'Payroll', 'amount': -2000.0, 'category': ['Transfer', 'Payroll']},
+    {'date': '2025-02-15', 'name': 'Amazon Refund', 'amount': -15.0, 'category': ['Shops']},
+    {'date': '2025-02-20', 'name': 'STARBUCKS #123', 'amount': 7.25, 'category': None}
+]
+
+
+class TestTransactionFrame(unittest.TestCase):
+    def setUp(self):
+        self.frame = TransactionFrame(TRANSACTIONS)
+
+    def test_spending_total_with_filters(self):
+        """Test date and merchant filters on spending."""
+        result = self.frame.query(merchants=['starbucks'])
+        self.assertEqual((result['count'], result['total']), (3, 18.75))
+
+        result = self.frame.query(merchants=['starbucks'], start_date='2025-01-07', end_date='2025-01-31')
+        self.assertEqual((result['count'], result['total']), (1, 6.0))
+        self.assertEqual((result['first_date'], result['last_date']), ('2025-01-08', '2025-01-08'))
+
+    def test_category_matches_any_level(self):
+        """Test filtering by primary category or subcategory."""
+        self.assertEqual(self.frame.query(categories=['food and drink'])['total'], 93.9)
+        self.assertEqual(self.frame.query(categories=['Coffee Shop'])['count'], 2)
+        self.assertEqual(self.frame.query(categories=['Coffee'])['count'], 0)
+
+    def test_income_and_net(self):
+        """Test the sign conventions of each kind."""
+        self.assertEqual(self.frame.query(kind='income')['total'], 2015.0)
+        self.assertEqual(self.frame.query(kind='net')['total'], round(93.9 + 23.1 + 7.25 - 2015.0, 2))
+        self.assertEqual(self.frame.query(kind='income', min_amount=100)['count'], 1)
+
+    def test_group_by_category_and_month(self):
+        """Test grouped aggregates."""
+        by_category = self.frame.query(group_by='category')
+        self.assertEqual(by_category['group_columns'], ['category', 'sum', 'count'])
+        self.assertEqual(by_category['groups'][0], ['Food and Drink', 93.9, 3])
+        self.assertEqual(by_category['other_groups'], 0)
+
+        by_month = self.frame.query(group_by='month', aggregate='max')
+        self.assertEqual(by_month['groups'], [['2025-01', 82.4, 3], ['2025-02', 23.1, 2]])
+
+        by_week = self.frame.query(group_by='week', aggregate='count', merchants=['starbucks'])
+        self.assertEqual(by_week['groups'], [['2025-01-06', 2, 2], ['2025-02-17', 1, 1]])
+
+    def test_limit_and_transactions(self):
+        """Test group limits and returned rows."""
+        result = self.frame.query(group_by='merchant', limit=2, include_transactions=2)
+
+        self.assertEqual([group[0] for group in result['groups']], ['Whole Foods', 'Uber'])
+        self.assertEqual(result['other_groups'], 2)
+        self.assertEqual(result['transactions'][0], ['2025-01-20', 'Whole Foods', 82.4, 'Food and Drink > Groceries'])
+
+    def test_invalid_arguments(self):
+        """Test that bad arguments raise errors the model can read."""
+        with self.assertRaises(ValueError):
+            self.frame.query(group_by='year')
+        with self.assertRaises(ValueError):
+            self.frame.query(start_date='last month')
+
+    def test_empty(self):
+        """Test a user without transactions."""
+        self.assertEqual(TransactionFrame([]).query(group_by='category'), {'kind': 'spending', 'count': 0, 'total': 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from shared.transaction_table import encode_transactions, token_savings, verbose_transaction_line
+
+
+def make_transactions():
+    return [
+        {'date': '2026-10-03', 'name': 'Whole Foods', 'amount': 84.2, 'category': ['Food and Drink', 'Groceries']},
+        {'date': '2026-10-02', 'name': 'Starbucks', 'amount': 5.75, 'category': ['Food and Drink', 'Coffee Shop']},
+        {'date': '2026-10-01', 'name': 'Whole Foods', 'amount': 61.0, 'category': ['Food and Drink', 'Groceries']},
+        {'date': '2026-09-30', 'name': 'Payroll Deposit', 'amount': -1500.0, 'category': None},
+    ]
+
+
+class TestEncodeTransactions(unittest.TestCase):
+    def test_rows_and_aliases(self):
+        """Test the header row, the delimited rows and aliases for repeated values."""
+        table = encode_transactions(make_transactions())
+
+        self.assertEqual(table['preamble'], "merchant aliases: M1=Whole Foods\n"
+                                            "category aliases: C1=Food and Drink>Groceries\n"
+                                            "date|merchant|amount|category\n")
+        self.assertEqual(table['rows'], [
+            '2026-10-03|M1|84.20|C1',
+            '2026-10-02|Starbucks|5.75|Food and Drink>Coffee Shop',
+            '2026-10-01|M1|61.00|C1',
+            '2026-09-30|Payroll Deposit|-1500.00|Uncategorized',
+        ])
+        self.assertEqual(table['text'], table['preamble'] + "\n".join(table['rows']))
+
+    def test_aliases_of_an_earlier_table_are_reused(self):
+        """Test that a second table reuses known aliases and numbers new ones after them."""
+        first = encode_transactions(make_transactions())
+        second = encode_transactions([
+            {'date': '2026-08-01', 'name': 'Whole Foods', 'amount': 10, 'category': ['Food and Drink', 'Groceries']},
+            {'date': '2026-08-02', 'name': 'Shell', 'amount': 40, 'category': ['Travel', 'Gas Stations']},
+            {'date': '2026-08-09', 'name': 'Shell', 'amount': 35, 'category': ['Travel', 'Gas Stations']},
+        ], aliases=first['aliases'])
+
+        self.assertEqual(second['rows'][0], '2026-08-01|M1|10.00|C1')
+        self.assertEqual(second['rows'][1], '2026-08-02|M2|40.00|C2')
+        self.assertNotIn('Whole Foods', second['preamble'])
+        self.assertIn('M2=Shell', second['preamble'])
+
+    def test_empty_and_delimiter_in_values(self):
+        """Test an empty table and merchant names containing the delimiter."""
+        self.assertEqual(encode_transactions([])['text'], "")
+        table = encode_transactions([{'date': '2026-10-01', 'name': 'A|B', 'amount': 1, 'category': ['X']}])
+        self.assertEqual(table['rows'], ['2026-10-01|A/B|1.00|X'])
+
+    def test_savings_against_labelled_lines(self):
+        """Test that the table is smaller than the labelled format it replaces."""
+        transactions = make_transactions() * 10
+        savings = token_savings(transactions, encode_transactions(transactions))
+
+        self.assertGreater(savings['saved_tokens'], 0)
+        self.assertGreater(savings['saved_ratio'], 0.4)
+        self.assertEqual(verbose_transaction_line(transactions[0]),
+                         'Date: 2026-10-03, Merchant: Whole Foods, Amount: $84.20, Category: Food and Drink, Groceries')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from app.chat.warmup import WARM, WARMING, ContextWarmer
+
+
+class RecordingExecutor:
+    """Holds submitted work until run_all is called."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+    def run_all(self):
+        for fn, args in self.submitted:
+            fn(*args)
+        self.submitted = []
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestContextWarmer(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.executor = RecordingExecutor()
+        self.warmed = []
+        self.warmer = ContextWarmer(lambda key, source: self.warmed.append((key, source)), ttl=300,
+                                    executor=self.executor, clock=self.clock)
+
+    def test_repeated_requests_start_one_warm_up(self):
+        """Test that requests while warming or shortly after do nothing."""
+        self.assertEqual(self.warmer.request('+1555', 'page'), WARMING)
+        self.assertEqual(self.warmer.request('+1555', 'page'), WARMING)
+        self.executor.run_all()
+        self.assertEqual(self.warmer.request('+1555', 'page'), WARM)
+
+        self.assertEqual(self.warmed, [('+1555', 'page')])
+        self.assertEqual(self.warmer.stats()['started'], 1)
+
+        # Once the warm-up is older than the TTL, the next request warms again
+        self.clock.now += 301
+        self.assertEqual(self.warmer.request('+1555', 'page'), WARMING)
+        self.executor.run_all()
+        self.assertEqual(len(self.warmed), 2)
+
+    def test_failed_warm_up_is_retried(self):
+        """Test that a failure is counted and does not mark the user warm."""
+        def fail(key):
+            raise RuntimeError('plaid down')
+
+        warmer = ContextWarmer(fail, executor=self.executor, clock=self.clock)
+        warmer.request('+1555')
+        self.executor.run_all()
+
+        self.assertEqual(warmer.stats()['errors'], 1)
+        self.assertEqual(warmer.request('+1555'), WARMING)
+
+    def test_invalidate_allows_a_new_warm_up(self):
+        """Test that invalidating a user makes the next request warm again."""
+        self.warmer.request('+1555', 'page')
+        self.executor.run_all()
+        self.warmer.invalidate('+1555')
+
+        self.assertEqual(self.warmer.request('+1555', 'page'), WARMING)
+
+
+if __name__ == '__main__':
+    unittest.main()
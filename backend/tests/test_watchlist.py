@@ -0,0 +1,72 @@
+import unittest
+import json
+from app import create_app
+from app.database import users_db
+from shared.watchlist import DEFAULT_TICKERS, build_ticker_index, normalize_tickers, user_tickers
+from flask_jwt_extended import create_access_token
+
+
+class TestWatchlist(unittest.TestCase):
+    def test_normalize_tickers(self):
+        """Test symbol normalization, deduplication and validation."""
+        self.assertEqual(normalize_tickers([' aapl', 'BRK.B', 'AAPL']), ['AAPL', 'BRK.B'])
+        for invalid in [['AAPL; DROP'], [''], [42], 'AAPL']:
+            with self.assertRaises(ValueError):
+                normalize_tickers(invalid)
+        with self.assertRaises(ValueError):
+            normalize_tickers([f'T{i}' for i in range(21)])
+
+    def test_user_tickers_default_only_when_never_set(self):
+        """Test that an explicitly empty watchlist stays empty."""
+        self.assertEqual(user_tickers({}), DEFAULT_TICKERS)
+        self.assertEqual(user_tickers({'tickers': []}), [])
+        self.assertEqual(user_tickers({'tickers': ['SPY']}), ['SPY'])
+
+    def test_build_ticker_index(self):
+        """Test the ticker to users reverse index."""
+        users = [
+            {'_id': 'a', 'tickers': ['AAPL', 'MSFT']},
+            {'_id': 'b', 'tickers': ['MSFT']},
+            {'_id': 'c', 'tickers': []}
+        ]
+        self.assertEqual(build_ticker_index(users, key='_id'), {'AAPL': ['a'], 'MSFT': ['a', 'b']})
+
+
+class TestWatchlistRoutes(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+        self.test_phone = '+11234567890'
+        users_db.clear()
+        users_db[self.test_phone] = {'phone_number': self.test_phone}
+
+        with self.app.app_context():
+            access_token = create_access_token(identity=self.test_phone)
+        self.headers = {'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'}
+
+    def tearDown(self):
+        users_db.clear()
+
+    def test_update_and_get_tickers(self):
+        """Test editing the watchlist through the settings endpoints."""
+        response = self.client.get('/api/settings/tickers', headers=self.headers)
+        self.assertEqual(json.loads(response.data)['tickers'], DEFAULT_TICKERS)
+
+        response = self.client.post('/api/settings/tickers', headers=self.headers, json={'tickers': ['spy', 'qqq']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(users_db[self.test_phone]['tickers'], ['SPY', 'QQQ'])
+
+        response = self.client.get('/api/settings/get', headers=self.headers)
+        self.assertEqual(json.loads(response.data)['tickers'], ['SPY', 'QQQ'])
+
+    def test_invalid_tickers_are_rejected(self):
+        """Test that an invalid watchlist is not saved."""
+        response = self.client.post('/api/settings/tickers', headers=self.headers, json={'tickers': ['not a ticker']})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('tickers', users_db[self.test_phone])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,6 @@
 import { useState, useRef, useEffect } from 'react'
 import { FcCancel } from 'react-icons/fc'
-import { sendMessage } from '../services/chatService'
+import { streamMessage, warmChat } from '../services/chatService'
 import ReactMarkdown from 'react-markdown'
 
 interface Message {
@@ -87,6 +87,13 @@ const Chat = () => {
     setPromptSuggestions(getRandomPrompts());
   }, []);
 
+  useEffect(() => {
+    // Load transactions and market data on the backend while the user is still typing
+    if (token) {
+      warmChat(token);
+    }
+  }, [token]);
+
   useEffect(() => {
     if (!hasInteracted) {
       const text = questions[currentQuestionIndex]
@@ -164,18 +171,19 @@ const Chat = () => {
       // Send message to chatbot API
       if (token) {
         console.log('Sending message to chatbot service:', userMessage.text);
-        const response = await sendMessage(userMessage.text, token);
+        let streamedText = '';
+        const response = await streamMessage(userMessage.text, token, (delta) => {
+          // Replace the "thinking" message with the text received so far
+          streamedText += delta;
+          setMessages(prev => 
+            prev.map(msg => 
+              msg.id === thinkingMessage.id 
+                ? { ...msg, text: streamedText } 
+                : msg
+            )
+          );
+        });
         console.log('Received response from chatbot service:', response);
-        
-        // Replace the "thinking" message with the actual response
-        setMessages(prev => 
-          prev.map(msg => 
-            msg.id === thinkingMessage.id 
-              ? { ...msg, text: response.response } 
-              : msg
-          )
-        );
-        console.log('Updated messages with response:', response.response);
       } else {
         // If no token, replace with error message
         console.log('No token available, showing error message');
@@ -41,4 +41,97 @@ export const sendMessage = async (message: string, token: string) => {
     console.error('Error sending message to chatbot:', error);
     throw error;
   }
-}; 
\ No newline at end of file
+}; 
+
+/**
+ * Send a message to the chatbot and receive the reply as it is generated
+ * @param message The user's message
+ * @param token JWT token for authentication
+ * @param onDelta Called with each chunk of text as it arrives
+ * @returns The full response once the stream completes
+ */
+export const streamMessage = async (
+  message: string,
+  token: string,
+  onDelta: (delta: string) => void
+): Promise<string> => {
+  const response = await fetch(`${API_URL}/chatbot/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${token}`,
+    },
+    body: JSON.stringify({
+      message,
+    }),
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json();
+    console.error('Error response from chatbot stream API:', errorData);
+    throw new Error(errorData.error || 'Failed to send message to chatbot');
+  }
+
+  // Users without a linked bank account get a plain JSON reply
+  if (!response.headers.get('Content-Type')?.startsWith('text/event-stream') || !response.body) {
+    const responseData = await response.json();
+    onDelta(responseData.response);
+    return responseData.response;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let fullResponse = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    const events = buffer.split('\n\n');
+    buffer = events.pop() || '';
+
+    for (const rawEvent of events) {
+      let eventType = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event: ')) eventType = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (eventType === 'error') {
+        throw new Error(payload.error || 'Chatbot stream failed');
+      }
+      if (eventType === 'done') {
+        return payload.response;
+      }
+      fullResponse += payload.delta;
+      onDelta(payload.delta);
+    }
+  }
+
+  return fullResponse;
+};
+
+/**
+ * Ask the backend to load the user's chat context before the first message
+ * @param token JWT token for authentication
+ */
+export const warmChat = async (token: string) => {
+  try {
+    await fetch(`${API_URL}/chatbot/warm`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+  } catch (error) {
+    // Warming is only an optimization; the first message still works without it
+    console.warn('Could not warm chat context:', error);
+  }
+};